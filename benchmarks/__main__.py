@@ -0,0 +1,199 @@
+import json
+import os
+import sys
+import tempfile
+import click
+from sdkops import emitter, generator
+from sdkops.cache import input_hashes
+from sdkops.openapi import load, parse
+from sdkops.profiler import Profiler
+from benchmarks.synthetic import SCENARIOS, Scenario, synthetic_spec
+
+BASELINES_PATH = os.path.join(os.path.dirname(__file__), "baselines.json")
+PHASES = ["parse", "load", "hash inputs", "generate ast", "format"]
+
+
+def run_phases(schema_dict: dict, path: str, profiler: Profiler):
+    with profiler.measure("phase", "parse"):
+        parse(schema_dict)
+    with profiler.measure("phase", "load"):
+        _success, spec = load(path)
+    with profiler.measure("phase", "hash inputs"):
+        refs = list(generator.collect_component_class_names(spec.schema_dict, "bench"))
+        input_hashes(spec, {}, refs)
+    with profiler.measure("phase", "generate ast"):
+        root = generator.to_ast(spec, "bench", "http://localhost")
+    with profiler.measure("phase", "format"):
+        emitter.format_module(root)
+
+
+def run_scenario(scenario: Scenario, repeat: int) -> dict[str, dict[str, float]]:
+    """
+    Runs the phases of a generation on the synthetic schema of the scenario. Times
+    are the best of the repeats, peak memory is traced in a run of its own since
+    tracing slows the phases down.
+
+    :return: Dictionary of the phases and their wall time, cpu time and peak memory
+    """
+    schema_dict = synthetic_spec(scenario)
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "schema.json")
+        with open(path, "w") as f:
+            json.dump(schema_dict, f)
+
+        results = {
+            phase: {"wall_time": float("inf"), "cpu_time": float("inf")}
+            for phase in PHASES
+        }
+        for _ in range(repeat):
+            profiler = Profiler()
+            run_phases(schema_dict, path, profiler)
+            for phase in PHASES:
+                measurement = profiler.measurements[("phase", phase)]
+                result = results[phase]
+                result["wall_time"] = min(result["wall_time"], measurement.wall_time)
+                result["cpu_time"] = min(result["cpu_time"], measurement.cpu_time)
+
+        profiler = Profiler()
+        profiler.start()
+        try:
+            run_phases(schema_dict, path, profiler)
+        finally:
+            profiler.stop()
+        for phase in PHASES:
+            results[phase]["peak_memory"] = profiler.measurements[
+                ("phase", phase)
+            ].peak_memory
+    return {
+        phase: {key: round(value, 6) for key, value in result.items()}
+        for phase, result in results.items()
+    }
+
+
+def compare(
+    results: dict[str, dict],
+    baselines: dict[str, dict],
+    tolerance: float,
+    memory_tolerance: float,
+) -> list[str]:
+    """
+    Compares the results of the scenarios with their baselines.
+
+    :param tolerance: Share of the baseline wall time a phase may take more
+    :param memory_tolerance: Share of the baseline peak memory a phase may take more
+    :return: Messages of the phases that regressed
+    """
+    regressions = []
+    for scenario_name, phases in results.items():
+        for phase, result in phases.items():
+            baseline = baselines.get(scenario_name, {}).get(phase)
+            if baseline is None:
+                continue
+            limits = [
+                ("wall_time", tolerance, "s"),
+                ("peak_memory", memory_tolerance, " bytes"),
+            ]
+            for key, share, unit in limits:
+                if result[key] > baseline[key] * (1 + share):
+                    regressions.append(
+                        f"{scenario_name} {phase}: {key} {result[key]}{unit} is more "
+                        f"than {share:.0%} over the baseline {baseline[key]}{unit}"
+                    )
+    return regressions
+
+
+@click.command(
+    "benchmarks", short_help="benchmarks the generator on synthetic schemas."
+)
+@click.option(
+    "-s",
+    "--scenario",
+    "scenario_names",
+    multiple=True,
+    type=click.Choice(list(SCENARIOS)),
+    help="scenario to run, can be given more than once. all of them by default.",
+)
+@click.option(
+    "--repeat",
+    type=click.IntRange(min=1),
+    default=3,
+    help="runs per scenario to take the best time of. 3 by default.",
+)
+@click.option(
+    "--baselines",
+    "baselines_path",
+    default=BASELINES_PATH,
+    help="json file of the baselines to compare with.",
+)
+@click.option(
+    "--update",
+    is_flag=True,
+    help="save the results as the baselines instead of comparing with them.",
+)
+@click.option(
+    "--tolerance",
+    type=float,
+    default=0.25,
+    help="share of the baseline time a phase may take more. 0.25 by default.",
+)
+@click.option(
+    "--memory-tolerance",
+    type=float,
+    default=0.1,
+    help="share of the baseline peak memory a phase may take more. 0.1 by default.",
+)
+@click.option(
+    "-o", "--output", required=False, help="save the results as json to the given path."
+)
+def benchmarks(
+    scenario_names: tuple[str, ...],
+    repeat: int = 3,
+    baselines_path: str = BASELINES_PATH,
+    update: bool = False,
+    tolerance: float = 0.25,
+    memory_tolerance: float = 0.1,
+    output: str = None,
+):
+    """
+    Times the phases of a generation and traces their peak memory on synthetic
+    schemas, then compares them with the baselines.
+    """
+    results: dict[str, dict] = {}
+    for name in scenario_names or SCENARIOS:
+        scenario = SCENARIOS[name]
+        click.echo(f"running {name}...")
+        results[name] = run_scenario(scenario, repeat)
+        for phase, result in results[name].items():
+            click.echo(
+                f"    {phase}: {result['wall_time']:.3f}s wall, "
+                f"{result['cpu_time']:.3f}s cpu, {result['peak_memory'] / 1e6:.1f}MB peak."
+            )
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    baselines = {}
+    if os.path.isfile(baselines_path):
+        with open(baselines_path) as f:
+            baselines = json.load(f)
+
+    if update:
+        baselines.update(results)
+        with open(baselines_path, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        click.echo(f'the baselines have been saved into "{baselines_path}".')
+        return
+
+    regressions = compare(results, baselines, tolerance, memory_tolerance)
+    for regression in regressions:
+        click.echo(f"    {regression}.")
+    if regressions:
+        click.echo(f"{len(regressions)} phases regressed.")
+        sys.exit(1)
+    click.echo("no phases regressed.")
+
+
+if __name__ == "__main__":
+    benchmarks()
@@ -0,0 +1,186 @@
+import json
+import time
+import types
+from typing import Any, Callable
+import click
+import httpx
+from sdkops.api import generate_sources
+
+RECORD_SCHEMAS = {
+    "Address": {
+        "type": "object",
+        "properties": {
+            "street": {"type": "string"},
+            "city": {"type": "string"},
+            "zip_code": {"type": "string"},
+        },
+        "required": ["street", "city"],
+    },
+    "Tag": {
+        "type": "object",
+        "properties": {"name": {"type": "string"}, "weight": {"type": "integer"}},
+        "required": ["name"],
+    },
+    "Record": {
+        "type": "object",
+        "properties": {
+            "id": {"type": "integer"},
+            "name": {"type": "string"},
+            "active": {"type": "boolean"},
+            "address": {"$ref": "#/components/schemas/Address"},
+            "tags": {"type": "array", "items": {"$ref": "#/components/schemas/Tag"}},
+        },
+        "required": ["id", "name"],
+    },
+}
+
+
+def records_spec() -> dict[str, Any]:
+    """
+    :return: Openapi schema of an endpoint that lists records with nested models
+    """
+    return {
+        "openapi": "3.1.0",
+        "info": {"title": "records", "version": "1.0.0"},
+        "servers": [{"url": "http://localhost", "description": ""}],
+        "paths": {
+            "/records": {
+                "get": {
+                    "operationId": "list_records",
+                    "responses": {
+                        "200": {
+                            "description": "",
+                            "content": {
+                                "application/json": {
+                                    "schema": {
+                                        "type": "array",
+                                        "items": {
+                                            "$ref": "#/components/schemas/Record"
+                                        },
+                                    }
+                                }
+                            },
+                        }
+                    },
+                }
+            }
+        },
+        "components": {"schemas": RECORD_SCHEMAS},
+    }
+
+
+def records_payload(items: int) -> bytes:
+    return json.dumps(
+        [
+            {
+                "id": i,
+                "name": f"record {i}",
+                "active": i % 2 == 0,
+                "address": {"street": f"{i} main st", "city": "springfield"},
+                "tags": [{"name": f"tag{j}", "weight": j} for j in range(3)],
+            }
+            for i in range(items)
+        ]
+    ).encode()
+
+
+def sdk_module(models: str) -> types.ModuleType:
+    """
+    Generates the sdk of the records endpoint and imports it.
+
+    :param models: Either "dict" or "slots", see generate_sources
+    """
+    (source,) = generate_sources(
+        records_spec(), "bench", "http://localhost", models=models
+    ).values()
+    module = types.ModuleType("bench")
+    exec(compile(source, "bench.py", "exec"), module.__dict__)
+    return module
+
+
+def json_backends() -> dict[str, Callable[[bytes], Any]]:
+    backends = {"json": json.loads}
+    try:
+        import orjson
+
+        backends["orjson"] = orjson.loads
+    except ImportError:
+        pass
+    return backends
+
+
+def best_time(call: Callable[[], Any], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run_decoding(
+    items: int, repeat: int, models: tuple[str, ...] = ("dict", "slots")
+) -> dict[str, dict[str, float]]:
+    """
+    Times a response of the given number of records decoded by response.json()
+    and by the generated sdk into its models, with each json backend installed.
+    The response is served from memory, so only the decoding is timed.
+
+    :return: Dictionary of the decoders and their wall time and items per second
+    """
+    payload = records_payload(items)
+    transport = httpx.MockTransport(
+        lambda request: httpx.Response(
+            200, content=payload, headers={"content-type": "application/json"}
+        )
+    )
+    decoders: dict[str, Callable[[], Any]] = {}
+    client = httpx.Client(base_url="http://localhost", transport=transport)
+    decoders["response.json()"] = lambda: client.get("/records").json()
+    for model in models:
+        module = sdk_module(model)
+        for backend, loads in json_backends().items():
+            sdk = module.Bench(transport=transport, json_loads=loads)
+            decoders[f"{model} models, {backend}"] = sdk.list_records
+
+    results = {}
+    for name, decode in decoders.items():
+        wall_time = best_time(decode, repeat)
+        results[name] = {
+            "wall_time": round(wall_time, 6),
+            "items_per_second": round(items / wall_time),
+        }
+    return results
+
+
+@click.command(
+    "decoding",
+    short_help="benchmarks decoding responses into models against response.json().",
+)
+@click.option(
+    "--items",
+    type=click.IntRange(min=1),
+    default=100_000,
+    help="number of records in the response. 100000 by default.",
+)
+@click.option(
+    "--repeat",
+    type=click.IntRange(min=1),
+    default=3,
+    help="runs per decoder to take the best time of. 3 by default.",
+)
+def decoding(items: int = 100_000, repeat: int = 3):
+    """
+    Times decoding a large list of records by response.json() and by a generated
+    sdk into its dict and slotted models, with the json and orjson backends.
+    """
+    click.echo(f"decoding {items} records...")
+    for name, result in run_decoding(items, repeat).items():
+        click.echo(
+            f"    {name}: {result['wall_time']:.3f}s wall, "
+            f"{result['items_per_second']} items per second."
+        )
+
+
+if __name__ == "__main__":
+    decoding()
@@ -0,0 +1,139 @@
+import random
+from dataclasses import dataclass
+from typing import Any
+
+PRIMITIVES = [
+    {"type": "string"},
+    {"type": "integer"},
+    {"type": "boolean"},
+    {"type": "array", "items": {"type": "string"}},
+]
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    paths: int
+    components: int
+    # levels of inline objects in each schema
+    depth: int = 2
+    # number of schemas in each anyOf, 0 for no anyOf
+    any_of: int = 0
+    # share of the properties that refer to a component
+    ref_density: float = 0.2
+    properties: int = 6
+    seed: int = 0
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in [
+        Scenario("small", paths=50, components=20),
+        Scenario("wide", paths=500, components=100),
+        Scenario("deep", paths=20, components=10, depth=6),
+        Scenario("any_of", paths=200, components=60, any_of=6),
+        Scenario("ref_dense", paths=300, components=300, ref_density=0.8),
+    ]
+}
+
+
+class SpecBuilder:
+    def __init__(self, scenario: Scenario):
+        self.scenario = scenario
+        self.random = random.Random(scenario.seed)
+
+    def component_ref(self) -> dict[str, Any]:
+        index = self.random.randrange(self.scenario.components)
+        return {"$ref": f"#/components/schemas/Component{index}"}
+
+    def object_schema(self, depth: int) -> dict[str, Any]:
+        properties = {}
+        for i in range(self.scenario.properties):
+            properties[f"field_{i}"] = self.property_schema(depth)
+        required = [name for name in properties if self.random.random() < 0.5]
+        return {"type": "object", "properties": properties, "required": required}
+
+    def property_schema(self, depth: int) -> dict[str, Any]:
+        roll = self.random.random()
+        if self.scenario.components and roll < self.scenario.ref_density:
+            return self.component_ref()
+        if (
+            depth > 0
+            and self.scenario.any_of
+            and roll < self.scenario.ref_density + 0.1
+        ):
+            return {
+                "anyOf": [
+                    self.component_ref() if i % 2 else self.object_schema(depth - 1)
+                    for i in range(self.scenario.any_of)
+                ]
+            }
+        if depth > 0 and roll < self.scenario.ref_density + 0.3:
+            return self.object_schema(depth - 1)
+        return dict(self.random.choice(PRIMITIVES))
+
+    def operation(self, operation_id: str, tag: str, body: bool) -> dict[str, Any]:
+        operation = {
+            "operationId": operation_id,
+            "tags": [tag],
+            "parameters": [
+                {
+                    "name": "item_id",
+                    "in": "path",
+                    "required": True,
+                    "schema": {"type": "string"},
+                },
+                {"name": "limit", "in": "query", "schema": {"type": "integer"}},
+            ],
+            "responses": {
+                "200": {
+                    "description": "",
+                    "content": {
+                        "application/json": {
+                            "schema": self.object_schema(self.scenario.depth)
+                        }
+                    },
+                }
+            },
+        }
+        if body:
+            operation["requestBody"] = {
+                "required": True,
+                "content": {
+                    "application/json": {
+                        "schema": self.object_schema(self.scenario.depth)
+                    }
+                },
+            }
+        return operation
+
+    def build(self) -> dict[str, Any]:
+        schemas = {
+            f"Component{i}": self.object_schema(self.scenario.depth)
+            for i in range(self.scenario.components)
+        }
+        paths = {}
+        for i in range(self.scenario.paths):
+            tag = f"resource{i % 10}"
+            paths[f"/resource{i}/{{item_id}}"] = {
+                "get": self.operation(f"get_resource_{i}", tag, False),
+                "post": self.operation(f"update_resource_{i}", tag, True),
+            }
+        return {
+            "openapi": "3.1.0",
+            "info": {"title": self.scenario.name, "version": "1.0.0"},
+            "servers": [{"url": "http://localhost", "description": ""}],
+            "paths": paths,
+            "components": {"schemas": schemas},
+        }
+
+
+def synthetic_spec(scenario: Scenario) -> dict[str, Any]:
+    """
+    Generates an openapi schema of the given size and shape. The same scenario
+    generates the same schema.
+
+    :param scenario: Number of paths, components and the shape of the schemas
+    :return: Openapi schema dictionary
+    """
+    return SpecBuilder(scenario).build()
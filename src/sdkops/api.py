@@ -0,0 +1,438 @@
+import ast
+import contextlib
+import os
+from typing import Any, Callable, Iterable
+from sdkops.cache import (
+    GenerationCache,
+    cache_path,
+    file_hash,
+    input_hashes,
+    write_if_changed,
+)
+from sdkops.documents import DocumentLoader
+from sdkops.emitter import format_module
+from sdkops.generator import collect_component_class_names, to_ast, to_package_ast
+from sdkops.json_schema import ClassRegistry
+from sdkops.openapi import APISpec, APISpecPathItem, load, parse
+from sdkops.parallel import WorkerPool
+from sdkops.profiler import Profiler, profile
+from sdkops.remote import SpecCache, default_cache_dir, fetch_spec
+
+
+class GenerationResult:
+    def __init__(self, name: str):
+        self.name = name
+        self.stale_reasons: list[str] = []
+        # generated file paths, relative to the destination, and their hashes
+        self.files: dict[str, str] = {}
+        self.written = 0
+        self.reused = 0
+        self.merged_classes = 0
+
+    @property
+    def up_to_date(self) -> bool:
+        return not self.stale_reasons
+
+
+def verify_sdk_name(name: str):
+    if not all(char in set("abcdefghijklmnopqrstuvwxyz0123456789_") for char in name):
+        raise Exception(
+            f"the name should be in snake case format. allowed characters are a-z_"
+        )
+
+
+def read_spec(
+    schema: APISpec | dict[str, Any] | str,
+    path_items: dict[tuple[str, str], APISpecPathItem] | None = None,
+    loader: DocumentLoader | None = None,
+) -> APISpec:
+    """
+    :param schema: Parsed schema, schema dictionary or path of a schema file
+    :param path_items: Path items of an earlier load of the file to reuse, see load
+    :param loader: Loader of the documents refs point to, see DocumentLoader
+    :return: Parsed schema
+    """
+    if isinstance(schema, APISpec):
+        return schema
+    if isinstance(schema, dict):
+        success, spec = parse(schema, loader=loader)
+    else:
+        success, spec = load(schema, path_items=path_items, loader=loader)
+    if not success:
+        raise ValueError(f"couldn't parse the schema. {spec}")
+    return spec
+
+
+def select_operations(
+    spec: APISpec,
+    operation_ids: Iterable[str] = (),
+    tags: Iterable[str] = (),
+    path_prefixes: Iterable[str] = (),
+) -> APISpec:
+    """
+    :param operation_ids: Ids of the operations to generate
+    :param tags: Tags of the operations to generate
+    :param path_prefixes: Path prefixes of the operations to generate, like "/users"
+    :return: Spec of the operations that match any of the filters and the components
+        they refer to, the spec itself if there aren't any filters
+    """
+    operation_ids, tags, path_prefixes = (
+        list(operation_ids),
+        list(tags),
+        list(path_prefixes),
+    )
+    if not operation_ids and not tags and not path_prefixes:
+        return spec
+    unknown = [
+        operation_id
+        for operation_id in operation_ids
+        if spec.find_operation(operation_id) is None
+    ]
+    if unknown:
+        raise ValueError(f"there are no operations with the ids {', '.join(unknown)}.")
+    selected = spec.find_operation_ids(operation_ids, tags, path_prefixes)
+    if not selected:
+        raise ValueError("no operations match the filters.")
+    return spec.subset(selected)
+
+
+def verify_base_url(spec: APISpec, base_url: str | None) -> str:
+    success, message, verified_base_url = spec.find_base_url(
+        base_url=base_url, servers=spec.servers
+    )
+    if not success:
+        raise ValueError(message)
+    return verified_base_url
+
+
+def worker_pool(spec: APISpec, jobs: int):
+    return WorkerPool(spec, jobs) if jobs > 1 else contextlib.nullcontext()
+
+
+def generate_modules(
+    spec: APISpec,
+    name: str,
+    base_url: str,
+    package: bool = False,
+    group_by: str = "tag",
+    class_registry: ClassRegistry | None = None,
+    pool: WorkerPool | None = None,
+    profiler: Profiler | None = None,
+    asynchronous: bool = False,
+    models: str = "dict",
+) -> dict[str, ast.Module]:
+    """
+    Generates the ast of the sdk modules, a single module or the modules of a package.
+
+    :param asynchronous: Whether to generate the client on httpx.AsyncClient
+    :param models: Either "dict" for model classes that subclass dict or "slots" for
+        slotted ones
+
+    :return: Dictionary of the module file paths, relative to the destination
+        directory, and their ast
+    """
+    if package:
+        modules = to_package_ast(
+            spec,
+            name,
+            base_url=base_url,
+            group_by=group_by,
+            class_registry=class_registry,
+            pool=pool,
+            profiler=profiler,
+            asynchronous=asynchronous,
+            models=models,
+        )
+        return {
+            os.path.join(name, f"{module_name}.py"): root
+            for module_name, root in modules.items()
+        }
+    root = to_ast(
+        spec,
+        name,
+        base_url=base_url,
+        class_registry=class_registry,
+        pool=pool,
+        profiler=profiler,
+        asynchronous=asynchronous,
+        models=models,
+    )
+    return {f"{name}.py": root}
+
+
+def generate_sources(
+    schema: APISpec | dict[str, Any] | str,
+    name: str,
+    base_url: str | None = None,
+    package: bool = False,
+    group_by: str = "tag",
+    jobs: int = 1,
+    operation_ids: Iterable[str] = (),
+    tags: Iterable[str] = (),
+    path_prefixes: Iterable[str] = (),
+    asynchronous: bool = False,
+    models: str = "dict",
+) -> dict[str, str]:
+    """
+    Generates the source of an sdk in memory, without writing any files or caches.
+
+    :param schema: Parsed schema, schema dictionary or path of a schema file
+    :param name: Sdk name in snake case
+    :param base_url: Base url of the endpoints, chosen from the servers of the
+        schema by default
+    :param package: Whether to generate a package with a module per operation group
+    :param jobs: Number of worker processes to generate the operations and classes with
+    :param operation_ids: Generates only these operations, along with the ones of the
+        tags and path prefixes, see select_operations
+    :param asynchronous: Whether to generate the client on httpx.AsyncClient, with
+        async operation methods
+    :param models: Either "dict" for model classes that subclass dict or "slots" for
+        slotted ones
+    :return: Dictionary of the module file paths, relative to the destination
+        directory, and their source
+    """
+    verify_sdk_name(name)
+    spec = select_operations(read_spec(schema), operation_ids, tags, path_prefixes)
+    base_url = verify_base_url(spec, base_url)
+    with worker_pool(spec, jobs) as pool:
+        modules = generate_modules(
+            spec,
+            name,
+            base_url,
+            package,
+            group_by,
+            pool=pool,
+            asynchronous=asynchronous,
+            models=models,
+        )
+    return {path: format_module(root) for path, root in modules.items()}
+
+
+def check_last_generation(
+    spec: APISpec,
+    name: str,
+    base_url: str,
+    package: bool,
+    group_by: str,
+    dest: str,
+    last_cache: GenerationCache | None = None,
+    asynchronous: bool = False,
+    models: str = "dict",
+) -> tuple[dict[str, Any], GenerationCache, list[str]]:
+    """
+    Compares the inputs of this generation with the ones of the last generation in
+    the destination directory.
+
+    :param last_cache: Cache of the last generation if it's in memory, it's read from
+        the destination directory otherwise
+    :return: Input hashes, cache of the last generation and the reasons the sdk is
+        out of date, if it is
+    """
+    settings = {
+        "name": name,
+        "base_url": base_url,
+        "package": package,
+        "group_by": group_by,
+        "asynchronous": asynchronous,
+        "models": models,
+    }
+    component_refs = list(collect_component_class_names(spec.schema_dict, name))
+    inputs = input_hashes(spec, settings, component_refs)
+    if last_cache is not None:
+        cache = last_cache.renew(inputs["operations"])
+    else:
+        cache = GenerationCache.load(cache_path(dest, name), inputs["operations"])
+    return inputs, cache, cache.stale_reasons(inputs, dest)
+
+
+def write_modules(
+    modules: dict[str, ast.Module],
+    dest: str,
+    cache: GenerationCache,
+    profiler: Profiler | None = None,
+    verify_format: bool = False,
+) -> tuple[dict[str, str], int]:
+    """
+    Writes the modules that have changed, reusing the definitions in the cache, and
+    removes the files of the last generation that are no longer generated.
+
+    :param verify_format: Whether to check that black leaves every module as it is,
+        before it's written. It needs black to be installed
+    :return: Dictionary of the file paths, relative to dest, and their hashes, and
+        the number of files written
+    """
+    if verify_format:
+        try:
+            import black
+        except ImportError:
+            raise ValueError("black needs to be installed to verify the format.")
+    files: dict[str, str] = {}
+    written = 0
+    with profile(profiler, "phase", "format and save"):
+        for file_name, root in modules.items():
+            path = os.path.join(dest, file_name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            source = format_module(root, cache, cache.fragment_key)
+            if verify_format and black.format_str(source, mode=black.Mode()) != source:
+                raise ValueError(f"black formats {file_name} differently.")
+            if write_if_changed(path, source):
+                written += 1
+            files[file_name] = file_hash(path)
+    # files of the last generation that are no longer generated, unless edited by hand
+    for file_name, digest in cache.files.items():
+        path = os.path.join(dest, file_name)
+        if file_name not in files and file_hash(path) == digest:
+            os.remove(path)
+    return files, written
+
+
+@contextlib.contextmanager
+def echo_phase(echo: Callable[[str], None], message: str):
+    """
+    Echoes the start of a phase and whether it's done or failed.
+    """
+    echo(f"{message}...")
+    try:
+        yield
+    except Exception:
+        echo(f"{message}... failed.")
+        raise
+    echo(f"{message}... done.")
+
+
+def generate_sdk(
+    schema: str,
+    name: str,
+    dest: str,
+    base_url: str | None = None,
+    package: bool = False,
+    group_by: str = "tag",
+    jobs: int = 1,
+    check: bool = False,
+    cache_dir: str | None = None,
+    operation_ids: Iterable[str] = (),
+    tags: Iterable[str] = (),
+    path_prefixes: Iterable[str] = (),
+    asynchronous: bool = False,
+    models: str = "dict",
+    profiler: Profiler | None = None,
+    echo: Callable[[str], None] = lambda message: None,
+    show_spec: Callable[[APISpec], None] | None = None,
+    verify_format: bool = False,
+) -> GenerationResult:
+    """
+    Generates an sdk into a directory, the generate command runs it with its output.
+    Only what has changed since the last generation is generated again.
+
+    :param schema: Path of a schema file or a url to fetch it from
+    :param check: Only find out if the sdk is out of date, without generating it
+    :param cache_dir: Directory to cache the schemas fetched from urls in, see
+        default_cache_dir
+    :param operation_ids: Generates only these operations, along with the ones of the
+        tags and path prefixes, see select_operations
+    :param asynchronous: Whether to generate the client on httpx.AsyncClient
+    :param models: Either "dict" for model classes that subclass dict or "slots" for
+        slotted ones
+    :param profiler: Profiler to measure the phases, schemas and operations with
+    :param echo: Function to report the progress of the phases with
+    :param show_spec: Function to show the spec to generate with, once it's read
+    :param verify_format: Whether to check that black leaves the generated modules as
+        they are, see write_modules
+    :return: What has changed and been written
+    """
+    with echo_phase(echo, "verifying sdk package name"):
+        verify_sdk_name(name)
+    with echo_phase(echo, "verifying destination directory"):
+        if not os.path.isdir(dest):
+            raise Exception(f"directory {dest} does not exist.")
+    with echo_phase(echo, "verifying openapi schema file"):
+        if not schema.startswith("http") and not os.path.isfile(schema):
+            raise Exception(f"file {schema} does not exist.")
+
+    if schema.startswith("http"):
+        with echo_phase(echo, "fetching schema"):
+            with profile(profiler, "phase", "fetch schema"):
+                spec, source = fetch_spec(
+                    schema, SpecCache(cache_dir or default_cache_dir())
+                )
+            if source == "cache":
+                echo("    the cached schema is fresh, it's not fetched again.")
+            elif source == "not modified":
+                echo("    the schema hasn't been modified, the cached one is used.")
+    else:
+        with echo_phase(echo, "parsing schema"):
+            with profile(profiler, "phase", "load schema"):
+                spec = read_spec(schema)
+
+    if operation_ids or tags or path_prefixes:
+        with echo_phase(echo, "selecting operations"):
+            with profile(profiler, "phase", "select operations"):
+                spec = select_operations(spec, operation_ids, tags, path_prefixes)
+            schemas = spec.schema_dict.get("components", {}).get("schemas", {})
+            echo(
+                f"    {sum(len(x.operations) for x in spec.paths)} operations and "
+                f"{len(schemas)} component schemas are selected."
+            )
+
+    if show_spec is not None:
+        with profile(profiler, "phase", "print spec tree"):
+            show_spec(spec)
+
+    with echo_phase(echo, "finding out the base url"):
+        base_url = verify_base_url(spec, base_url)
+
+    result = GenerationResult(name)
+    with echo_phase(echo, "checking the last generation"):
+        with profile(profiler, "phase", "check last generation"):
+            inputs, cache, result.stale_reasons = check_last_generation(
+                spec,
+                name,
+                base_url,
+                package,
+                group_by,
+                dest,
+                asynchronous=asynchronous,
+                models=models,
+            )
+        for reason in result.stale_reasons:
+            echo(f"    {reason}.")
+    if check or result.up_to_date:
+        return result
+
+    class_registry = ClassRegistry()
+    with echo_phase(echo, "generating ast"):
+        if jobs > 1:
+            echo(f"    using {jobs} worker processes.")
+        with profile(profiler, "phase", "generate ast"), worker_pool(
+            spec, jobs
+        ) as pool:
+            modules = generate_modules(
+                spec,
+                name,
+                base_url,
+                package,
+                group_by,
+                class_registry,
+                pool,
+                profiler,
+                asynchronous=asynchronous,
+                models=models,
+            )
+        result.merged_classes = len(class_registry.aliases)
+        if result.merged_classes:
+            echo(
+                f"    {result.merged_classes} classes are left out as aliases of "
+                "identical ones."
+            )
+
+    with echo_phase(echo, "saving ast output"):
+        result.files, result.written = write_modules(
+            modules, dest, cache, profiler, verify_format
+        )
+        result.reused = cache.hits
+        echo(
+            f"    {result.written} of {len(result.files)} files changed, "
+            f"{result.reused} definitions are reused from the last generation."
+        )
+    cache.save(inputs, result.files)
+    return result
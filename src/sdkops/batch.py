@@ -0,0 +1,195 @@
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+import click
+from sdkops.api import generate_sdk
+from sdkops.parallel import default_jobs
+
+MANIFEST_KEYS = {
+    "spec",
+    "name",
+    "dest",
+    "url",
+    "package",
+    "group_by",
+    "async",
+    "models",
+}
+
+
+def read_manifest(path: str) -> list[dict[str, Any]]:
+    """
+    Reads a json manifest of the sdks to generate, either a list of entries or an
+    object with the list under "sdks". Each entry has the "spec", "name" and "dest"
+    of an sdk, and optionally its "url", "package", "group_by", "async" and "models"
+    options like the generate command. Relative paths are relative to the manifest.
+
+    :return: List of the entries
+    """
+    with open(path) as f:
+        manifest = json.load(f)
+    entries = manifest["sdks"] if isinstance(manifest, dict) else manifest
+    root = os.path.dirname(os.path.abspath(path))
+    result = []
+    for index, entry in enumerate(entries):
+        missing = {"spec", "name", "dest"} - set(entry)
+        if missing:
+            raise ValueError(
+                f"entry {index} of the manifest has no {', '.join(sorted(missing))}."
+            )
+        unknown = set(entry) - MANIFEST_KEYS
+        if unknown:
+            raise ValueError(
+                f"entry {index} of the manifest has unknown keys {', '.join(sorted(unknown))}."
+            )
+        entry = dict(entry)
+        if not entry["spec"].startswith("http"):
+            entry["spec"] = os.path.join(root, entry["spec"])
+        entry["dest"] = os.path.join(root, entry["dest"])
+        result.append(entry)
+    return result
+
+
+def run_entry(entry: dict[str, Any], check: bool = False) -> dict[str, Any]:
+    """
+    Generates the sdk of a manifest entry. Errors are reported in the result instead
+    of being raised, so that the other entries are generated.
+
+    :return: Dictionary of the sdk name, its status, timings and what has changed
+    """
+    start_wall = time.perf_counter()
+    start_cpu = time.process_time()
+    result: dict[str, Any] = {"name": entry["name"], "spec": entry["spec"]}
+    try:
+        generation = generate_sdk(
+            entry["spec"],
+            entry["name"],
+            entry["dest"],
+            base_url=entry.get("url"),
+            package=entry.get("package", False),
+            group_by=entry.get("group_by", "tag"),
+            check=check,
+            asynchronous=entry.get("async", False),
+            models=entry.get("models", "dict"),
+        )
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = str(e) or e.__class__.__name__
+    else:
+        if generation.up_to_date:
+            result["status"] = "up to date"
+        elif check:
+            result["status"] = "out of date"
+        else:
+            result["status"] = "generated"
+        result["stale_reasons"] = generation.stale_reasons
+        result["files"] = len(generation.files)
+        result["written"] = generation.written
+        result["reused"] = generation.reused
+    result["wall_time"] = round(time.perf_counter() - start_wall, 6)
+    result["cpu_time"] = round(time.process_time() - start_cpu, 6)
+    return result
+
+
+def run_batch(
+    entries: list[dict[str, Any]], jobs: int = 1, check: bool = False
+) -> list[dict[str, Any]]:
+    """
+    Generates the sdks of the entries in this process, or in worker processes that
+    each generate a share of them. Entries whose worker process dies are failed.
+
+    :return: Results of the entries in their order, see run_entry
+    """
+    if jobs <= 1:
+        return [run_entry(entry, check) for entry in entries]
+    results = []
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(run_entry, entry, check) for entry in entries]
+        for entry, future in zip(entries, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                # a worker that dies, like out of memory, breaks the pool and fails
+                # the entries it hasn't finished, the others are still reported
+                results.append(
+                    {
+                        "name": entry["name"],
+                        "spec": entry["spec"],
+                        "status": "failed",
+                        "error": str(e) or e.__class__.__name__,
+                        "wall_time": 0.0,
+                        "cpu_time": 0.0,
+                    }
+                )
+    return results
+
+
+@click.command("batch", short_help="generates many sdks from a manifest.")
+@click.argument("manifest", nargs=1)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=0),
+    default=1,
+    help="number of worker processes to generate the sdks with. 0 for one per cpu, 1 by default.",
+)
+@click.option(
+    "--check",
+    is_flag=True,
+    help="exit with status 1 if any sdk is out of date, without regenerating them.",
+)
+@click.option(
+    "--report",
+    "report_path",
+    required=False,
+    help="save a json report of the status and timings of each sdk to the given path.",
+)
+def batch(manifest: str, jobs: int = 1, check: bool = False, report_path: str = None):
+    """
+    MANIFEST is a json file of the sdks to generate. Each sdk is generated like the
+    generate command would, in a single process that imports everything once.
+    Failed sdks don't stop the others.
+    """
+    entries = read_manifest(manifest)
+    jobs = min(jobs or default_jobs(), len(entries) or 1)
+    click.echo(f"generating {len(entries)} sdks...")
+    start_wall = time.perf_counter()
+    results = run_batch(entries, jobs, check)
+    wall_time = time.perf_counter() - start_wall
+
+    for result in results:
+        message = (
+            f"    {result['name']}: {result['status']} in {result['wall_time']:.3f}s"
+        )
+        if result["status"] == "failed":
+            message += f". {result['error']}"
+        elif result["status"] == "generated":
+            message += (
+                f", {result['written']} of {result['files']} files changed, "
+                f"{result['reused']} definitions reused"
+            )
+        click.echo(f"{message}.")
+    failed = [result for result in results if result["status"] == "failed"]
+    stale = [result for result in results if result["status"] == "out of date"]
+    click.echo(
+        f"generating {len(entries)} sdks... done in {wall_time:.3f}s, "
+        f"{len(failed)} failed."
+    )
+
+    if report_path:
+        with open(report_path, "w") as f:
+            json.dump(
+                {"jobs": jobs, "wall_time": round(wall_time, 6), "sdks": results},
+                f,
+                indent=2,
+            )
+
+    if failed or stale:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    batch()
@@ -0,0 +1,303 @@
+import ast
+import hashlib
+import json
+import os
+from typing import Any
+from sdkops.openapi import APISpec
+from sdkops.json_schema import RefResolver, content_hash, schema_collect_refs
+from sdkops.emitter import Preformatted, definition_digest
+
+# bump when the generated code changes for the same inputs, invalidates old caches
+CACHE_VERSION = 15
+
+
+def cache_path(dest: str, sdk_name: str) -> str:
+    return os.path.join(dest, f".{sdk_name}.sdkops-cache.json")
+
+
+def ref_closure_hashes(resolver: RefResolver, refs: list[str]) -> dict[str, str]:
+    """
+    Hashes each ref with its resolved value and the values of the refs reachable
+    from it. Refs that refer to each other, directly or through others, are hashed
+    together, so that each value is hashed once however long the chains of refs are.
+
+    :param resolver: Resolver of the openapi schema
+    :param refs: Refs to hash, the ones reachable from them are hashed too
+    :return: Dictionary of the refs and their hashes
+    """
+    values: dict[str, Any] = {}
+    deps: dict[str, list[str]] = {}
+    result: dict[str, str] = {}
+    # tarjan's strongly connected components, without recursion for long chains.
+    # a component is complete after the components it refers to.
+    index: dict[str, int] = {}
+    lowlink: dict[str, int] = {}
+    component_stack: list[str] = []
+    on_stack: set[str] = set()
+    for root_ref in refs:
+        if root_ref in index:
+            continue
+        work = [(root_ref, 0)]
+        while work:
+            ref, position = work.pop()
+            if position == 0:
+                index[ref] = lowlink[ref] = len(index)
+                component_stack.append(ref)
+                on_stack.add(ref)
+                values[ref], _trace = resolver.resolve(ref)
+                deps[ref] = sorted(set(schema_collect_refs(values[ref])))
+            if position > 0:
+                dep = deps[ref][position - 1]
+                lowlink[ref] = min(lowlink[ref], lowlink[dep])
+            for next_position in range(position, len(deps[ref])):
+                dep = deps[ref][next_position]
+                if dep not in index:
+                    work.append((ref, next_position + 1))
+                    work.append((dep, 0))
+                    break
+                if dep in on_stack:
+                    lowlink[ref] = min(lowlink[ref], index[dep])
+            else:
+                if lowlink[ref] == index[ref]:
+                    members: list[str] = []
+                    while True:
+                        member = component_stack.pop()
+                        on_stack.discard(member)
+                        members.append(member)
+                        if member == ref:
+                            break
+                    member_set = set(members)
+                    digest = content_hash(
+                        [
+                            sorted([member, values[member]] for member in members),
+                            sorted(
+                                {
+                                    result[dep]
+                                    for member in members
+                                    for dep in deps[member]
+                                    if dep not in member_set
+                                }
+                            ),
+                        ]
+                    )
+                    for member in members:
+                        result[member] = digest
+    return result
+
+
+def input_hashes(
+    spec: APISpec, settings: dict[str, Any], component_refs: list[str]
+) -> dict[str, Any]:
+    """
+    Hashes everything the generated code depends on. Each operation is hashed with
+    the digest of its schema subtree and the hashes of its refs, each component
+    class with the hash of its own ref, see ref_closure_hashes.
+
+    :param spec: Parsed openapi schema
+    :param settings: Generation options that change the generated code
+    :param component_refs: Refs of the component schemas that become classes
+    :return: Dictionary of the settings hash and the hashes of operations and components
+    """
+    settings_hash = content_hash({"version": CACHE_VERSION, **settings})
+    ref_hashes = ref_closure_hashes(
+        spec.resolver,
+        [
+            *component_refs,
+            *(
+                ref
+                for path_item in spec.paths
+                for operation in path_item.operations
+                for ref in operation.refs
+            ),
+        ],
+    )
+    operations: dict[str, str] = {}
+    for path_item in spec.paths:
+        for operation in path_item.operations:
+            operations[operation.operation_id] = content_hash(
+                [
+                    settings_hash,
+                    path_item.pattern,
+                    operation.method,
+                    operation.digest,
+                    {ref: ref_hashes[ref] for ref in operation.refs},
+                ]
+            )
+    components: dict[str, str] = {}
+    for ref in component_refs:
+        components[ref] = content_hash([settings_hash, ref, ref_hashes[ref]])
+    return {
+        "settings": settings_hash,
+        "operations": operations,
+        "components": components,
+    }
+
+
+def file_hash(path: str) -> str | None:
+    if not os.path.isfile(path):
+        return None
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+class GenerationCache:
+    """
+    Hashes of the inputs and outputs of the last generation, and the formatted source
+    of its class and function definitions. Definitions of unchanged operations and
+    classes are reused verbatim instead of being laid out again.
+    """
+
+    def __init__(self, path: str, operation_hashes: dict[str, str] | None = None):
+        self.path = path
+        self.inputs: dict[str, Any] = {}
+        self.files: dict[str, str] = {}
+        self.fragments: dict[str, list] = {}
+        self.operation_hashes = operation_hashes or {}
+        self.used: dict[str, list] = {}
+        self.hits = 0
+
+    @classmethod
+    def load(
+        cls, path: str, operation_hashes: dict[str, str] | None = None
+    ) -> "GenerationCache":
+        """
+        Loads the cache of the last generation, an empty one if there is none or it is
+        of an older version.
+
+        :param path: Path of the cache file
+        :param operation_hashes: Hashes of the operations, keys of their methods
+        """
+        cache = cls(path, operation_hashes)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cache
+        if data.get("version") != CACHE_VERSION:
+            return cache
+        cache.inputs = data.get("inputs", {})
+        cache.files = data.get("files", {})
+        cache.fragments = data.get("fragments", {})
+        return cache
+
+    def record(self, inputs: dict[str, Any], files: dict[str, str]):
+        """
+        Keeps the hashes of this generation with the fragments it used in memory, for
+        the cache renewed from this one. Fragments of definitions that no longer exist
+        are dropped.
+        """
+        self.inputs = inputs
+        self.files = files
+        self.fragments = self.used
+
+    def save(self, inputs: dict[str, Any], files: dict[str, str]):
+        """
+        Saves the hashes of this generation with the fragments it used, see record.
+        """
+        self.record(inputs, files)
+        data = {
+            "version": CACHE_VERSION,
+            "inputs": inputs,
+            "files": files,
+            "fragments": self.used,
+        }
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(temp_path, self.path)
+
+    def renew(self, operation_hashes: dict[str, str]) -> "GenerationCache":
+        """
+        Creates the cache of the next generation from the last one this cache loaded
+        or recorded, without reading the file again.
+
+        :param operation_hashes: Hashes of the operations, keys of their methods
+        """
+        cache = GenerationCache(self.path, operation_hashes)
+        cache.inputs = self.inputs
+        cache.files = self.files
+        cache.fragments = self.fragments
+        return cache
+
+    def stale_reasons(self, inputs: dict[str, Any], root: str) -> list[str]:
+        """
+        Compares the inputs with the ones of the last generation and the output files
+        with the ones it wrote.
+
+        :param inputs: Hashes returned by input_hashes
+        :param root: Directory the output file paths are relative to
+        :return: List of the reasons the output is out of date, empty if it is up to date
+        """
+        if not self.inputs:
+            return ["there is no previous generation"]
+        reasons: list[str] = []
+        if self.inputs.get("settings") != inputs["settings"]:
+            reasons.append("generation options have changed")
+        for kind in ("operations", "components") if not reasons else ():
+            previous = self.inputs.get(kind, {})
+            current = inputs[kind]
+            changed = sorted(
+                key
+                for key in previous.keys() | current.keys()
+                if previous.get(key) != current.get(key)
+            )
+            if changed:
+                reasons.append(f"{kind} have changed: {', '.join(changed)}")
+        for name, digest in self.files.items():
+            if file_hash(os.path.join(root, name)) != digest:
+                reasons.append(f"{name} is missing or modified")
+        return reasons
+
+    def fragment_key(self, node: ast.AST) -> str | None:
+        """
+        Keys operation methods by the hash of their operation and model classes by the
+        hash of their structure. Classes of the operations aren't keyed, so that their
+        methods are looked up one by one.
+        """
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            return self.operation_method_key(node.name)
+        if isinstance(node, Preformatted):
+            return self.operation_method_key(node.name) or node.digest
+        if isinstance(node, ast.ClassDef) and not any(
+            isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, Preformatted))
+            and child.name in self.operation_hashes
+            for child in node.body
+        ):
+            return definition_digest(node)
+        return None
+
+    def operation_method_key(self, name: str) -> str | None:
+        if name in self.operation_hashes:
+            return self.operation_hashes[name]
+        # iter_ methods stream the response of the operation they are named after
+        if name.startswith("iter_") and name[5:] in self.operation_hashes:
+            return f"{self.operation_hashes[name[5:]]}:iter"
+        return None
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.used or key in self.fragments
+
+    def __getitem__(self, key: str) -> list:
+        if key not in self.used:
+            self.used[key] = self.fragments[key]
+            self.hits += 1
+        return self.used[key]
+
+    def __setitem__(self, key: str, entries: list):
+        self.used[key] = entries
+
+
+def write_if_changed(path: str, source: str) -> bool:
+    """
+    Writes the source into the file unless the file already has it, leaving its
+    modification time as it is.
+
+    :return: True if the file is written
+    """
+    if os.path.isfile(path):
+        with open(path) as f:
+            if f.read() == source:
+                return False
+    with open(path, "w") as f:
+        f.write(source)
+    return True
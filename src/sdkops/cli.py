@@ -1,17 +1,14 @@
 #!/usr/bin/env python3
 
-import httpx
 import click
-import rich
-import rich.tree
-import tempfile
-import os
 import sys
-import json
-import ast
-import black
-from sdkops.openapi import parse
-from sdkops.generator import to_ast
+from typing import TYPE_CHECKING
+from sdkops.profiler import Profiler
+
+# httpx, rich and the generator are imported where they are used, so that --help,
+# argument errors and up to date checks don't wait for what they don't need
+if TYPE_CHECKING:
+    from sdkops.openapi import APISpec
 
 
 @click.command("generate", short_help="generates a python sdk from openapi schema.")
@@ -24,56 +21,163 @@ from sdkops.generator import to_ast
     required=False,
     help="base url for the sdk endpoints. chosen from servers section of the schema by default.",
 )
-def generate(file: str, name: str, dest: str, url: str = None):
+@click.option(
+    "-p",
+    "--package",
+    is_flag=True,
+    help="save the sdk as a package with a module per operation group, imported on first access.",
+)
+@click.option(
+    "--group-by",
+    type=click.Choice(["tag", "path"]),
+    default="tag",
+    help="how operations are grouped into modules of the package. tag by default.",
+)
+@click.option(
+    "--async",
+    "asynchronous",
+    is_flag=True,
+    help="generate an sdk on httpx.AsyncClient, with async operation methods.",
+)
+@click.option(
+    "--models",
+    type=click.Choice(["dict", "slots"]),
+    default="dict",
+    help="how model classes are generated, dict subclasses or slotted classes with to_dict. dict by default.",
+)
+@click.option(
+    "--check",
+    is_flag=True,
+    help="exit with status 1 if the sdk in the destination is out of date, without regenerating it.",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    type=click.IntRange(min=0),
+    default=1,
+    help="number of worker processes to generate the operations and classes with. 0 for one per cpu, 1 by default.",
+)
+@click.option(
+    "--profile",
+    "profile_path",
+    required=False,
+    help="save a json report of the time and memory each phase, schema and operation takes to the given path.",
+)
+@click.option(
+    "--cache-dir",
+    required=False,
+    help="directory to cache the schemas fetched from urls in. $SDKOPS_CACHE_DIR or ~/.cache/sdkops by default.",
+)
+@click.option(
+    "--tag",
+    "tags",
+    multiple=True,
+    help="generate only the operations with the tag. may be repeated.",
+)
+@click.option(
+    "--path-prefix",
+    "path_prefixes",
+    multiple=True,
+    help="generate only the operations under the path, like /users. may be repeated.",
+)
+@click.option(
+    "--operation-id",
+    "operation_ids",
+    multiple=True,
+    help="generate only the operation with the id. may be repeated.",
+)
+@click.option(
+    "--verify-format",
+    is_flag=True,
+    help="fail if black would format the generated modules differently. black needs to be installed.",
+)
+def generate(
+    file: str,
+    name: str,
+    dest: str,
+    url: str = None,
+    package: bool = False,
+    group_by: str = "tag",
+    asynchronous: bool = False,
+    models: str = "dict",
+    check: bool = False,
+    jobs: int = 1,
+    profile_path: str = None,
+    cache_dir: str = None,
+    tags: tuple[str, ...] = (),
+    path_prefixes: tuple[str, ...] = (),
+    operation_ids: tuple[str, ...] = (),
+    verify_format: bool = False,
+):
     """
     FILE is an open api schema file path or a url endpoint to fetch the schema.
     """
-    click.echo("verifying sdk package name...")
-    if not all(char in set("abcdefghijklmnopqrstuvwxyz0123456789_") for char in name):
-        raise Exception(
-            f"the name should be in snake case format. allowed characters are a-z_"
+    from sdkops.api import generate_sdk
+    from sdkops.parallel import default_jobs
+
+    profiler = None
+    if profile_path is not None:
+        profiler = Profiler()
+        profiler.start()
+
+    try:
+        result = generate_sdk(
+            file,
+            name,
+            dest,
+            url,
+            package,
+            group_by,
+            jobs or default_jobs(),
+            check,
+            cache_dir,
+            operation_ids,
+            tags,
+            path_prefixes,
+            asynchronous,
+            models,
+            profiler,
+            click.echo,
+            print_spec_tree,
+            verify_format,
         )
-    click.echo("verifying sdk package name... done.")
+    except ValueError as e:
+        click.echo(str(e))
+        sys.exit(1)
 
-    click.echo("verifying destination directory...")
-    if not os.path.isdir(dest):
-        raise Exception(f"directory {dest} does not exist.")
-    click.echo("verifying destination directory... done.")
+    if check:
+        if result.up_to_date:
+            click.echo("the sdk is up to date.")
+        else:
+            click.echo("the sdk is out of date.")
+    elif result.up_to_date:
+        click.echo("the sdk is up to date, nothing to regenerate.")
 
-    click.echo("verifying openapi schema file...")
-    if not file.startswith("http") and not os.path.isfile(file):
-        raise Exception(f"file {file} does not exist.")
-    temp_file = None
-    if file.startswith("http"):
-        click.echo("    preparing to fetch it from an http endpoint.")
-        r = httpx.get(file)
-        if r.status_code < 200 or r.status_code >= 300:
-            raise Exception(
-                f'couldn\'t fetch the schema from "{file}". http request failed with status code {r.status_code}.'
+    if profiler is not None:
+        profiler.stop()
+        profiler.save(
+            profile_path,
+            schema=file,
+            name=name,
+            jobs=jobs or default_jobs(),
+        )
+        click.echo(f'the profile report has been saved into "{profile_path}".')
+        for phase in profiler.ranked("phase"):
+            click.echo(
+                f"    {phase.name}: {phase.wall_time:.3f}s wall, "
+                f"{phase.cpu_time:.3f}s cpu, {phase.peak_memory / 1e6:.1f}MB peak."
             )
-        try:
-            json.loads(r.text)
-        except:
-            raise Exception(f'the schema fetched from "{file}" is not a json.')
-        with tempfile.NamedTemporaryFile(
-            mode="w", delete=False, delete_on_close=False
-        ) as fp:
-            fp.write(r.text)
-            temp_file = fp.name
-            file = fp.name
-            click.echo(f'    the schema has been fetched and saved into "{file}".')
-    schema_dict = None
-    with open(file) as f:
-        data = f.read()
-        schema_dict = json.loads(data)
-    click.echo("verifying openapi schema file... done.")
 
-    click.echo("parsing schema...")
-    success, spec = parse(schema_dict)
-    if not success:
-        click.echo(f"parsing schema... failed. {spec}")
+    if check and not result.up_to_date:
         sys.exit(1)
-    click.echo("parsing schema... done.")
+
+
+def print_spec_tree(spec: "APISpec"):
+    """
+    Prints the paths, operations, requests and responses of the spec as a tree.
+    """
+    import rich
+    import rich.tree
 
     tree = rich.tree.Tree("spec")
     for _path in spec.paths:
@@ -94,31 +198,6 @@ def generate(file: str, name: str, dest: str, url: str = None):
                 )
     rich.print(tree)
 
-    click.echo("finding out the base url...")
-    success, message, verified_base_url = spec.find_base_url(
-        base_url=url, servers=spec.servers
-    )
-    if not success:
-        click.echo(f"finding out the base url... failed. {message}")
-        sys.exit(1)
-    click.echo("finding out the base url... done.")
-
-    click.echo("generating ast...")
-    root = to_ast(spec, name, base_url=verified_base_url)
-    click.echo("generating ast... done.")
-
-    click.echo("saving ast output...")
-    code = ast.unparse(root)
-    code_formatted = black.format_str(code, mode=black.FileMode())
-    with open(os.path.join(dest, f"{name}.py"), "w") as f:
-        f.write(code_formatted)
-    click.echo("saving ast output... done.")
-
-    click.echo("cleaning up...")
-    if temp_file is not None:
-        os.remove(temp_file)
-    click.echo("cleaning up... done.")
-
 
 if __name__ == "__main__":
     generate()
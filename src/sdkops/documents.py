@@ -0,0 +1,181 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable
+from urllib.parse import urljoin
+from sdkops.json_schema import DocumentIndex
+
+
+def is_url(location: str) -> bool:
+    return location.startswith(("http://", "https://"))
+
+
+class DocumentLoader:
+    """
+    Loads the documents the external refs of a schema point to, local files or urls,
+    and the documents those refer to in turn. The documents found in each round are
+    read concurrently, then parsed and indexed once. Their refs are rebased on the
+    way, so that every document refers to the others by the same keys: their paths
+    relative to the directory of the schema, or their urls.
+
+    Indexed documents are kept by their key and the hash of their content, a
+    document that hasn't changed since the last load isn't parsed or indexed again.
+    """
+
+    def __init__(self, jobs: int = 8):
+        """
+        :param jobs: Number of documents read at a time
+        """
+        self.jobs = jobs
+        self.indexes: dict[tuple[str, str], DocumentIndex] = {}
+        # documents of the last load that are reused, and their locations by key
+        self.hits = 0
+        self.locations: dict[str, str] = {}
+        self.client = None
+
+    @staticmethod
+    def root_directory(root: str | None) -> str:
+        if root is None:
+            return os.getcwd()
+        return root if is_url(root) else os.path.dirname(os.path.abspath(root))
+
+    def locate(self, root: str | None, location: str | None, ref_document: str) -> str:
+        """
+        :param root: Location of the schema, None if it isn't a file
+        :param location: Location of the document the ref is in, None for the schema
+        :param ref_document: Part of the ref before the "#"
+        :return: Location of the document the ref points to
+        """
+        if is_url(ref_document):
+            return ref_document
+        base = location or root
+        if base is not None and is_url(base):
+            return urljoin(base, ref_document)
+        directory = self.root_directory(base)
+        return os.path.normpath(os.path.join(directory, ref_document))
+
+    def key(self, root: str | None, location: str) -> str:
+        """
+        :return: Key of the document at the location, empty for the schema itself
+        """
+        if root is not None and location in (root, os.path.abspath(root)):
+            return ""
+        if is_url(location):
+            return location
+        relative = os.path.relpath(location, self.root_directory(root))
+        return relative.replace(os.sep, "/")
+
+    def load(
+        self, root: str | None, refs: Iterable[str]
+    ) -> tuple[dict[str, DocumentIndex], dict[str, str]]:
+        """
+        Loads the documents the refs of the schema point to, and the ones they
+        refer to, until every document is loaded.
+
+        :param root: Path or url of the schema, None if it isn't a file, refs are
+            relative to the working directory then
+        :param refs: Refs in the schema
+        :return: Indexes of the documents by their keys, and the keys of the documents
+            by how the schema refers to them
+        """
+        aliases: dict[str, str] = {}
+        self.locations = {}
+        pending: list[str] = []
+        for ref in refs:
+            ref_document = ref.partition("#")[0]
+            if not ref_document or ref_document in aliases:
+                continue
+            location = self.locate(root, None, ref_document)
+            key = self.key(root, location)
+            aliases[ref_document] = key
+            if key and key not in self.locations:
+                self.locations[key] = location
+                pending.append(key)
+
+        documents: dict[str, DocumentIndex] = {}
+        used: dict[tuple[str, str], DocumentIndex] = {}
+        self.hits = 0
+        try:
+            with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+                while pending:
+                    locations = [self.locations[key] for key in pending]
+                    if self.client is None and any(map(is_url, locations)):
+                        import httpx
+
+                        self.client = httpx.Client()
+                    contents = list(executor.map(self.read, locations))
+                    found: list[str] = []
+                    for key, content in zip(pending, contents):
+                        index = self.index(root, key, content, used)
+                        documents[key] = index
+                        for ref in index.refs:
+                            ref_key = ref.partition("#")[0]
+                            if ref_key and ref_key not in documents:
+                                if ref_key not in found and ref_key not in pending:
+                                    found.append(ref_key)
+                    pending = found
+        finally:
+            if self.client is not None:
+                self.client.close()
+                self.client = None
+        # documents that are no longer referred to are dropped
+        self.indexes = used
+        return documents, {
+            ref_document: key
+            for ref_document, key in aliases.items()
+            if ref_document != key
+        }
+
+    def index(
+        self,
+        root: str | None,
+        key: str,
+        content: bytes,
+        used: dict[tuple[str, str], DocumentIndex],
+    ) -> DocumentIndex:
+        location = self.locations[key]
+        cache_key = (key, hashlib.sha256(content).hexdigest())
+        if cache_key in self.indexes:
+            self.hits += 1
+            index = self.indexes[cache_key]
+        else:
+            try:
+                document = json.loads(content)
+            except ValueError:
+                raise Exception(f'the document "{location}" is not a json.')
+
+            def rebase_ref(ref: str) -> str:
+                ref_document, _, pointer = ref.partition("#")
+                if not ref_document:
+                    return f"{key}#{pointer}"
+                ref_location = self.locate(root, location, ref_document)
+                ref_key = self.key(root, ref_location)
+                self.locations.setdefault(ref_key, ref_location)
+                return f"{ref_key}#{pointer}"
+
+            index = DocumentIndex(key, document, rebase_ref)
+        # the locations of the documents a cached index refers to aren't found
+        # again by rebasing its refs
+        for ref in index.refs:
+            ref_key = ref.partition("#")[0]
+            if ref_key and ref_key not in self.locations:
+                self.locations[ref_key] = self.locate(root, None, ref_key)
+        used[cache_key] = index
+        return index
+
+    def read(self, location: str) -> bytes:
+        if is_url(location):
+            r = self.client.get(location)
+            if r.status_code < 200 or r.status_code >= 300:
+                raise Exception(
+                    f'couldn\'t fetch the document "{location}" the schema refers to. http request failed with status code {r.status_code}.'
+                )
+            return r.content
+        try:
+            with open(location, "rb") as f:
+                return f.read()
+        except OSError:
+            raise Exception(
+                f'couldn\'t read the document "{location}" the schema refers to.'
+            )
@@ -0,0 +1,2506 @@
+# The line splitting and empty line rules of this module are adapted from the
+# linegen, brackets and lines modules of black, https://github.com/psf/black,
+# distributed under the following license:
+#
+# The MIT License (MIT)
+#
+# Copyright (c) 2018 Łukasz Langa
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+
+import ast
+import hashlib
+import re
+import sys
+import unicodedata
+from typing import Callable, Iterator, NamedTuple, Optional
+
+LINE_LENGTH = 88
+
+# split priorities of the delimiters, the highest one present is split first
+COMPREHENSION_PRIORITY = 20
+COMMA_PRIORITY = 18
+TERNARY_PRIORITY = 16
+LOGIC_PRIORITY = 14
+STRING_PRIORITY = 12
+COMPARATOR_PRIORITY = 10
+MATH_PRIORITIES = {
+    "|": 9,
+    "^": 8,
+    "&": 7,
+    "<<": 6,
+    ">>": 6,
+    "+": 5,
+    "-": 5,
+    "*": 4,
+    "/": 4,
+    "//": 4,
+    "%": 4,
+    "@": 4,
+    "**": 2,
+}
+DOT_PRIORITY = 1
+
+OPENING_BRACKETS = frozenset("([{")
+CLOSING_BRACKETS = frozenset(")]}")
+BRACKET = {"(": ")", "[": "]", "{": "}"}
+
+TRAILING_COMMA_FEATURES = frozenset(("trailing_comma_in_call", "trailing_comma_in_def"))
+
+_INFSTR = "1e" + repr(sys.float_info.max_10_exp + 1)
+_STRING_PREFIX_CHARS = "furbFURB"
+_STRING_PREFIX_RE = re.compile(r"^([" + _STRING_PREFIX_CHARS + r"]*)(.*)$", re.DOTALL)
+
+
+class _CannotSplit(Exception):
+    pass
+
+
+class _Leaf:
+    """
+    A token of the output with the metadata line splitting decisions depend on.
+    """
+
+    __slots__ = (
+        "type",
+        "value",
+        "prefix",
+        "ws",
+        "sticky",
+        "priority",
+        "needs_parent",
+        "attached",
+        "explode",
+        "trailer",
+        "arglist",
+        "attr_dot",
+        "annotation",
+        "vararg",
+        "docstring",
+        "import_kw",
+        "opening_bracket",
+        "bracket_depth",
+    )
+
+    def __init__(self, type_: str, value: str, ws: str = ""):
+        self.type = type_
+        self.value = value
+        self.ws = ws
+        self.prefix = ws
+        self.sticky = False
+        self.priority = 0
+        self.needs_parent = False
+        self.attached = True
+        self.explode = False
+        self.trailer = False
+        self.arglist = False
+        self.attr_dot = False
+        self.annotation = None
+        self.vararg = None
+        self.docstring = False
+        self.import_kw = False
+        self.opening_bracket = None
+        self.bracket_depth = 0
+
+    def copy(self) -> "_Leaf":
+        leaf = _Leaf(self.type, self.value, self.ws)
+        for name in (
+            "sticky",
+            "priority",
+            "needs_parent",
+            "explode",
+            "trailer",
+            "arglist",
+            "attr_dot",
+            "annotation",
+            "vararg",
+            "docstring",
+            "import_kw",
+        ):
+            setattr(leaf, name, getattr(self, name))
+        return leaf
+
+    def __str__(self) -> str:
+        return self.prefix + self.value
+
+
+def _is_multiline_string(leaf: _Leaf) -> bool:
+    return (
+        leaf.type == "string"
+        and leaf.value.lstrip(_STRING_PREFIX_CHARS)[:3] in ('"""', "'''")
+        and "\n" in leaf.value
+    )
+
+
+def _split_before_priority(leaf: _Leaf, previous: Optional[_Leaf]) -> int:
+    if leaf.type == ".":
+        if (
+            leaf.attr_dot
+            and leaf.attached
+            and (previous is None or previous.type in CLOSING_BRACKETS)
+        ):
+            return DOT_PRIORITY
+        return 0
+    if leaf.needs_parent and not leaf.attached:
+        return 0
+    return leaf.priority
+
+
+class _BracketTracker:
+    __slots__ = (
+        "depth",
+        "bracket_match",
+        "delimiters",
+        "previous",
+        "for_loop_depths",
+        "lambda_argument_depths",
+        "invisible",
+    )
+
+    def __init__(self):
+        self.depth = 0
+        self.bracket_match = {}
+        self.delimiters = {}
+        self.previous = None
+        self.for_loop_depths = []
+        self.lambda_argument_depths = []
+        self.invisible = []
+
+    def mark(self, leaf: _Leaf):
+        if (
+            self.depth == 0
+            and leaf.type in CLOSING_BRACKETS
+            and (self.depth, leaf.type) not in self.bracket_match
+        ):
+            return
+        if (
+            self.for_loop_depths
+            and self.for_loop_depths[-1] == self.depth
+            and leaf.type == "name"
+            and leaf.value == "in"
+        ):
+            self.depth -= 1
+            self.for_loop_depths.pop()
+        if (
+            self.lambda_argument_depths
+            and self.lambda_argument_depths[-1] == self.depth
+            and leaf.type == ":"
+        ):
+            self.depth -= 1
+            self.lambda_argument_depths.pop()
+        if leaf.type in CLOSING_BRACKETS:
+            self.depth -= 1
+            leaf.opening_bracket = self.bracket_match.pop((self.depth, leaf.type))
+            if not leaf.value:
+                self.invisible.append(leaf)
+        leaf.bracket_depth = self.depth
+        if self.depth == 0:
+            priority = _split_before_priority(leaf, self.previous)
+            if priority and self.previous is not None:
+                self.delimiters[id(self.previous)] = priority
+            elif leaf.type == ",":
+                self.delimiters[id(leaf)] = COMMA_PRIORITY
+        if leaf.type in OPENING_BRACKETS:
+            self.bracket_match[self.depth, BRACKET[leaf.type]] = leaf
+            self.depth += 1
+            if not leaf.value:
+                self.invisible.append(leaf)
+        self.previous = leaf
+        if leaf.type == "name" and leaf.value == "lambda":
+            self.depth += 1
+            self.lambda_argument_depths.append(self.depth)
+        if leaf.type == "name" and leaf.value == "for":
+            self.depth += 1
+            self.for_loop_depths.append(self.depth)
+
+    def max_delimiter_priority(self, exclude: frozenset = frozenset()) -> int:
+        return max(v for k, v in self.delimiters.items() if k not in exclude)
+
+    def delimiter_count_with_priority(self, priority: int) -> int:
+        return sum(1 for p in self.delimiters.values() if p == priority)
+
+
+def _is_one_sequence_between(
+    opening: _Leaf, closing: _Leaf, leaves: list, brackets: tuple = ("(", ")")
+) -> bool:
+    if (opening.type, closing.type) != brackets:
+        return False
+    depth = closing.bracket_depth + 1
+    for index, leaf in enumerate(leaves):
+        if leaf is opening:
+            break
+    else:
+        raise LookupError("opening bracket is not found in the leaves")
+    commas = 0
+    for leaf in leaves[index + 1 :]:
+        if leaf is closing:
+            break
+        if leaf.bracket_depth == depth and leaf.type == ",":
+            commas += 1
+            if leaf.attached and leaf.arglist:
+                commas += 1
+                break
+    return commas < 2
+
+
+class _Line:
+    """
+    A logical line of the output, the unit the line splitting works on.
+    """
+
+    __slots__ = (
+        "depth",
+        "leaves",
+        "inside_brackets",
+        "should_split_rhs",
+        "magic_trailing_comma",
+        "tracker",
+    )
+
+    def __init__(self, depth: int = 0, inside_brackets: bool = False):
+        self.depth = depth
+        self.leaves = []
+        self.inside_brackets = inside_brackets
+        self.should_split_rhs = False
+        self.magic_trailing_comma = None
+        self.tracker = _BracketTracker()
+
+    def append(self, leaf: _Leaf, preformatted: bool = False, track: bool = False):
+        if self.inside_brackets or not preformatted or track:
+            self.tracker.mark(leaf)
+            if self.has_magic_trailing_comma(leaf):
+                self.magic_trailing_comma = leaf
+        self.leaves.append(leaf)
+
+    def has_magic_trailing_comma(self, closing: _Leaf) -> bool:
+        if not (
+            closing.type in CLOSING_BRACKETS
+            and self.leaves
+            and self.leaves[-1].type == ","
+        ):
+            return False
+        if closing.type == "}":
+            return True
+        if closing.type == "]":
+            return not (
+                closing.attached
+                and closing.trailer
+                and closing.opening_bracket is not None
+                and _is_one_sequence_between(
+                    closing.opening_bracket, closing, self.leaves, ("[", "]")
+                )
+            )
+        if self.is_import:
+            return True
+        return closing.opening_bracket is not None and not _is_one_sequence_between(
+            closing.opening_bracket, closing, self.leaves
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self.leaves)
+
+    def __str__(self) -> str:
+        first = self.leaves[0]
+        return (
+            first.prefix
+            + "    " * self.depth
+            + first.value
+            + "".join(leaf.prefix + leaf.value for leaf in self.leaves[1:])
+        )
+
+    @property
+    def is_decorator(self) -> bool:
+        return bool(self.leaves) and self.leaves[0].type == "@"
+
+    @property
+    def is_import(self) -> bool:
+        return bool(self.leaves) and self.leaves[0].import_kw
+
+    @property
+    def is_with_stmt(self) -> bool:
+        if not self.leaves:
+            return False
+        first = self.leaves[0]
+        if first.type == "async":
+            return len(self.leaves) > 1 and self.leaves[1].value == "with"
+        return first.type == "name" and first.value == "with"
+
+    @property
+    def is_class(self) -> bool:
+        return (
+            bool(self.leaves)
+            and self.leaves[0].type == "name"
+            and self.leaves[0].value == "class"
+        )
+
+    @property
+    def is_def(self) -> bool:
+        if not self.leaves:
+            return False
+        first = self.leaves[0]
+        if first.type == "name" and first.value == "def":
+            return True
+        return (
+            first.type == "async"
+            and len(self.leaves) > 1
+            and self.leaves[1].type == "name"
+            and self.leaves[1].value == "def"
+        )
+
+    @property
+    def is_stub_def(self) -> bool:
+        return self.is_def and [(x.type, x.value) for x in self.leaves[-4:]] == [
+            (":", ":"),
+            (".", "."),
+            (".", "."),
+            (".", "."),
+        ]
+
+    @property
+    def is_docstring(self) -> bool:
+        return bool(self.leaves) and self.leaves[0].docstring
+
+    @property
+    def is_chained_assignment(self) -> bool:
+        return [leaf.type for leaf in self.leaves].count("=") > 1
+
+    @property
+    def opens_block(self) -> bool:
+        return bool(self.leaves) and self.leaves[-1].type == ":"
+
+    def contains_multiline_strings(self) -> bool:
+        return any(_is_multiline_string(leaf) for leaf in self.leaves)
+
+    def enumerate_with_length(self, is_reversed: bool = False):
+        indexes = range(len(self.leaves))
+        if is_reversed:
+            indexes = reversed(indexes)
+        for index in indexes:
+            leaf = self.leaves[index]
+            if "\n" in leaf.value:
+                return
+            yield index, leaf, len(leaf.prefix) + len(leaf.value)
+
+    def clone(self) -> "_Line":
+        line = _Line(self.depth, self.inside_brackets)
+        line.should_split_rhs = self.should_split_rhs
+        line.magic_trailing_comma = self.magic_trailing_comma
+        return line
+
+    def summary(self) -> "_LineSummary":
+        return _LineSummary(
+            self.depth,
+            self.is_decorator,
+            self.is_def,
+            self.is_class,
+            self.is_stub_def,
+            self.is_import,
+            self.is_docstring,
+            self.opens_block,
+            self.leaves[0].value,
+            len(self.leaves),
+        )
+
+
+class _LineSummary(NamedTuple):
+    # what deciding the empty lines needs to know about a line
+    depth: int
+    is_decorator: bool
+    is_def: bool
+    is_class: bool
+    is_stub_def: bool
+    is_import: bool
+    is_docstring: bool
+    opens_block: bool
+    first_value: str
+    leaf_count: int
+
+
+def _str_width(text: str) -> int:
+    if text.isascii():
+        return len(text)
+    width = 0
+    for char in text:
+        if unicodedata.combining(char):
+            continue
+        width += 2 if unicodedata.east_asian_width(char) in ("W", "F") else 1
+    return width
+
+
+def _is_line_short_enough(line: _Line, line_length: int = LINE_LENGTH) -> bool:
+    line_str = str(line)
+    return _str_width(line_str) <= line_length and "\n" not in line_str
+
+
+def _can_be_split(line: _Line) -> bool:
+    leaves = line.leaves
+    if len(leaves) < 2:
+        return False
+    if leaves[0].type == "string" and leaves[1].type == ".":
+        call_count = 0
+        dot_count = 0
+        next_leaf = leaves[-1]
+        for leaf in leaves[-2::-1]:
+            if leaf.type in OPENING_BRACKETS:
+                if next_leaf.type not in CLOSING_BRACKETS:
+                    return False
+                call_count += 1
+            elif leaf.type == ".":
+                dot_count += 1
+            elif leaf.type == "name":
+                if not (next_leaf.type == "." or next_leaf.type in OPENING_BRACKETS):
+                    return False
+            elif leaf.type not in CLOSING_BRACKETS:
+                return False
+            if dot_count > 1 and call_count > 1:
+                return False
+            next_leaf = leaf
+    return True
+
+
+def _can_omit_opening_paren(line: _Line, first: _Leaf, line_length: int) -> bool:
+    remainder = False
+    length = 4 * line.depth
+    index = -1
+    for index, leaf, leaf_length in line.enumerate_with_length():
+        if leaf.type in CLOSING_BRACKETS and leaf.opening_bracket is first:
+            remainder = True
+        if remainder:
+            length += leaf_length
+            if length > line_length:
+                break
+            if leaf.type in OPENING_BRACKETS:
+                remainder = False
+    else:
+        if len(line.leaves) == index + 1:
+            return True
+    return False
+
+
+def _can_omit_closing_paren(line: _Line, last: _Leaf, line_length: int) -> bool:
+    length = 4 * line.depth
+    seen_other_brackets = False
+    for _, leaf, leaf_length in line.enumerate_with_length():
+        length += leaf_length
+        if leaf is last.opening_bracket:
+            if seen_other_brackets or length <= line_length:
+                return True
+        elif leaf.type in OPENING_BRACKETS:
+            seen_other_brackets = True
+    return False
+
+
+class _RHSResult:
+    __slots__ = ("head", "body", "tail", "opening_bracket", "closing_bracket")
+
+    def __init__(self, head, body, tail, opening_bracket, closing_bracket):
+        self.head = head
+        self.body = body
+        self.tail = tail
+        self.opening_bracket = opening_bracket
+        self.closing_bracket = closing_bracket
+
+
+def _can_omit_invisible_parens(rhs: _RHSResult, line_length: int) -> bool:
+    line = rhs.body
+    tracker = line.tracker
+    if not tracker.delimiters:
+        return True
+    max_priority = tracker.max_delimiter_priority()
+    delimiter_count = tracker.delimiter_count_with_priority(max_priority)
+    if delimiter_count > 1:
+        return False
+    if delimiter_count == 1:
+        if max_priority == COMMA_PRIORITY and rhs.head.is_with_stmt:
+            return False
+    if max_priority == DOT_PRIORITY:
+        return True
+    first = line.leaves[0]
+    second = line.leaves[1]
+    if first.type in OPENING_BRACKETS and second.type not in CLOSING_BRACKETS:
+        if _can_omit_opening_paren(line, first, line_length):
+            return True
+    penultimate = line.leaves[-2]
+    last = line.leaves[-1]
+    if (
+        last.type == ")"
+        or last.type == "}"
+        or (last.type == "]" and last.attached and not last.trailer)
+    ):
+        if penultimate.type in OPENING_BRACKETS:
+            return False
+        if _is_multiline_string(first):
+            return True
+        if _can_omit_closing_paren(line, last, line_length):
+            return True
+    return False
+
+
+def _leaves_inside_matching_brackets(leaves: list) -> set:
+    start = next(
+        (i for i, leaf in enumerate(leaves) if leaf.type in OPENING_BRACKETS), None
+    )
+    if start is None:
+        return set()
+    stack = []
+    ids = set()
+    for i in range(start, len(leaves)):
+        leaf = leaves[i]
+        if leaf.type in OPENING_BRACKETS:
+            stack.append((BRACKET[leaf.type], i))
+        if leaf.type in CLOSING_BRACKETS:
+            if stack and leaf.type == stack[-1][0]:
+                _, opening = stack.pop()
+                for j in range(opening, i + 1):
+                    ids.add(id(leaves[j]))
+            else:
+                break
+    return ids
+
+
+def _ensure_trailing_comma(leaves: list, original: _Line, opening: _Leaf) -> bool:
+    if not leaves:
+        return False
+    if original.is_import:
+        return True
+    if not original.is_def:
+        return False
+    if opening.value != "(":
+        return False
+    if any(leaf.type == "," and not leaf.annotation for leaf in leaves):
+        return False
+    leaf_with_parent = next((leaf for leaf in leaves if leaf.attached), None)
+    if leaf_with_parent is None:
+        return True
+    return leaf_with_parent.annotation != "return"
+
+
+def _should_split_line(line: _Line, opening: _Leaf) -> bool:
+    if not (opening.attached and opening.value in "[{("):
+        return False
+    trailing_comma = False
+    exclude = frozenset()
+    if not line.leaves:
+        return False
+    last = line.leaves[-1]
+    if last.type == ",":
+        trailing_comma = True
+        exclude = frozenset((id(last),))
+    try:
+        max_priority = line.tracker.max_delimiter_priority(exclude)
+    except ValueError:
+        return False
+    return max_priority == COMMA_PRIORITY and (trailing_comma or opening.explode)
+
+
+def _build_line(leaves: list, original: _Line, opening: _Leaf, component: str) -> _Line:
+    result = _Line(original.depth)
+    if component == "body":
+        result.inside_brackets = True
+        result.depth += 1
+        if _ensure_trailing_comma(leaves, original, opening):
+            if leaves[-1].type != ",":
+                comma = _Leaf(",", ",")
+                comma.attached = False
+                leaves.append(comma)
+    track = set()
+    if component == "head":
+        track = _leaves_inside_matching_brackets(leaves)
+    for leaf in leaves:
+        result.append(leaf, preformatted=True, track=id(leaf) in track)
+    if component == "body" and _should_split_line(result, opening):
+        result.should_split_rhs = True
+    return result
+
+
+def _split_succeeded_or_raise(head: _Line, body: _Line, tail: _Line):
+    tail_len = len(str(tail).strip()) if tail else 0
+    if not body:
+        if tail_len == 0:
+            raise _CannotSplit("splitting brackets produced the same line")
+        if tail_len < 3:
+            raise _CannotSplit("splitting brackets on an empty body is not worth it")
+
+
+def _ensure_visible(leaf: _Leaf):
+    if leaf.type == "(":
+        leaf.value = "("
+    elif leaf.type == ")":
+        leaf.value = ")"
+
+
+def _left_hand_split(line: _Line, features: frozenset) -> list:
+    for leaf_type in ("(", "["):
+        tail_leaves = []
+        body_leaves = []
+        head_leaves = []
+        current = head_leaves
+        matching = None
+        for leaf in line.leaves:
+            if (
+                current is body_leaves
+                and leaf.type in CLOSING_BRACKETS
+                and leaf.opening_bracket is matching
+                and matching is not None
+            ):
+                _ensure_visible(leaf)
+                _ensure_visible(matching)
+                current = tail_leaves if body_leaves else head_leaves
+            current.append(leaf)
+            if current is head_leaves and leaf.type == leaf_type:
+                matching = leaf
+                current = body_leaves
+        if matching and tail_leaves:
+            break
+    if not matching or not tail_leaves:
+        raise _CannotSplit("no brackets found")
+    head = _build_line(head_leaves, line, matching, "head")
+    body = _build_line(body_leaves, line, matching, "body")
+    tail = _build_line(tail_leaves, line, matching, "tail")
+    _split_succeeded_or_raise(head, body, tail)
+    return [result for result in (head, body, tail) if result]
+
+
+def _first_right_hand_split(line: _Line, omit: frozenset = frozenset()) -> _RHSResult:
+    tail_leaves = []
+    body_leaves = []
+    head_leaves = []
+    current = tail_leaves
+    opening = None
+    closing = None
+    for leaf in reversed(line.leaves):
+        if current is body_leaves and leaf is opening:
+            current = head_leaves if body_leaves else tail_leaves
+        current.append(leaf)
+        if (
+            current is tail_leaves
+            and leaf.type in CLOSING_BRACKETS
+            and id(leaf) not in omit
+        ):
+            opening = leaf.opening_bracket
+            closing = leaf
+            current = body_leaves
+    if not (opening and closing and head_leaves):
+        raise _CannotSplit("no brackets found")
+    tail_leaves.reverse()
+    body_leaves.reverse()
+    head_leaves.reverse()
+    head = _build_line(head_leaves, line, opening, "head")
+    body = _build_line(body_leaves, line, opening, "body")
+    tail = _build_line(tail_leaves, line, opening, "tail")
+    _split_succeeded_or_raise(head, body, tail)
+    return _RHSResult(head, body, tail, opening, closing)
+
+
+def _prefer_split_rhs_oop(rhs_oop: _RHSResult, rhs: _RHSResult) -> bool:
+    if not (len(rhs.head.leaves) >= 2 and rhs.head.leaves[-2].type == "="):
+        return True
+    if not any(
+        leaf.type in OPENING_BRACKETS or leaf.type in CLOSING_BRACKETS
+        for leaf in rhs.head.leaves[:-1]
+    ):
+        return True
+    if not _is_line_short_enough(rhs.head, LINE_LENGTH - 1):
+        return True
+    if rhs.head.magic_trailing_comma is not None:
+        return True
+    rhs_head_equal_count = [leaf.type for leaf in rhs.head.leaves].count("=")
+    rhs_oop_head_equal_count = [leaf.type for leaf in rhs_oop.head.leaves].count("=")
+    if rhs_head_equal_count > 1 and rhs_head_equal_count > rhs_oop_head_equal_count:
+        return False
+    has_closing_bracket_after_assign = False
+    for leaf in reversed(rhs_oop.head.leaves):
+        if leaf.type == "=":
+            break
+        if leaf.type in CLOSING_BRACKETS:
+            has_closing_bracket_after_assign = True
+            break
+    return has_closing_bracket_after_assign or (
+        any(leaf.type == "=" for leaf in rhs_oop.head.leaves)
+        and _is_line_short_enough(rhs_oop.head)
+    )
+
+
+def _maybe_split_omitting_optional_parens(
+    rhs: _RHSResult, line: _Line, omit: frozenset, force_optional_parens: bool
+) -> list:
+    if (
+        not force_optional_parens
+        and rhs.opening_bracket.type == "("
+        and not rhs.opening_bracket.value
+        and rhs.closing_bracket.type == ")"
+        and not rhs.closing_bracket.value
+        and not line.is_import
+        and _can_omit_invisible_parens(rhs, LINE_LENGTH)
+    ):
+        omit = omit | {id(rhs.closing_bracket)}
+        try:
+            rhs_oop = _first_right_hand_split(line, omit)
+            if _prefer_split_rhs_oop(rhs_oop, rhs):
+                return _maybe_split_omitting_optional_parens(
+                    rhs_oop, line, omit, force_optional_parens
+                )
+        except _CannotSplit:
+            if line.is_chained_assignment:
+                pass
+            elif not _can_be_split(rhs.body) and not _is_line_short_enough(rhs.body):
+                raise
+            elif (
+                rhs.head.contains_multiline_strings()
+                or rhs.tail.contains_multiline_strings()
+            ):
+                raise
+    _ensure_visible(rhs.opening_bracket)
+    _ensure_visible(rhs.closing_bracket)
+    return [result for result in (rhs.head, rhs.body, rhs.tail) if result]
+
+
+def _right_hand_split(
+    line: _Line, force_optional_parens: bool, omit: frozenset = frozenset()
+) -> list:
+    rhs = _first_right_hand_split(line, omit)
+    return _maybe_split_omitting_optional_parens(rhs, line, omit, force_optional_parens)
+
+
+def _generate_trailers_to_omit(line: _Line, line_length: int) -> Iterator[frozenset]:
+    omit = set()
+    if not line.magic_trailing_comma:
+        yield frozenset(omit)
+    length = 4 * line.depth
+    opening = None
+    closing = None
+    inner_brackets = set()
+    for index, leaf, leaf_length in line.enumerate_with_length(is_reversed=True):
+        length += leaf_length
+        if length > line_length:
+            break
+        if opening:
+            if leaf is opening:
+                opening = None
+            elif leaf.type in CLOSING_BRACKETS:
+                prev = line.leaves[index - 1] if index > 0 else None
+                if (
+                    prev
+                    and prev.type == ","
+                    and leaf.opening_bracket is not None
+                    and not _is_one_sequence_between(
+                        leaf.opening_bracket, leaf, line.leaves
+                    )
+                ):
+                    break
+                inner_brackets.add(id(leaf))
+        elif leaf.type in CLOSING_BRACKETS:
+            prev = line.leaves[index - 1] if index > 0 else None
+            if prev and prev.type in OPENING_BRACKETS:
+                inner_brackets.add(id(leaf))
+                continue
+            if closing:
+                omit.add(id(closing))
+                omit.update(inner_brackets)
+                inner_brackets.clear()
+                yield frozenset(omit)
+            if (
+                prev
+                and prev.type == ","
+                and leaf.opening_bracket is not None
+                and not _is_one_sequence_between(
+                    leaf.opening_bracket, leaf, line.leaves
+                )
+            ):
+                break
+            if leaf.value:
+                opening = leaf.opening_bracket
+                closing = leaf
+
+
+def _rhs(line: _Line, features: frozenset) -> list:
+    force_optional_parens = "force_optional_parentheses" in features
+    for omit in _generate_trailers_to_omit(line, LINE_LENGTH):
+        lines = _right_hand_split(line, force_optional_parens, omit)
+        if _is_line_short_enough(lines[0]):
+            return lines
+    # all splits failed, best effort split with no omits
+    return _right_hand_split(line, force_optional_parens)
+
+
+def _can_add_trailing_comma(leaf: _Leaf, features: frozenset) -> bool:
+    if leaf.vararg == "def" and leaf.attached:
+        return "trailing_comma_in_def" in features
+    if leaf.vararg == "call" and leaf.attached:
+        return "trailing_comma_in_call" in features
+    return True
+
+
+def _delimiter_split(line: _Line, features: frozenset) -> list:
+    if not line.leaves:
+        raise _CannotSplit("line is empty")
+    last_leaf = line.leaves[-1]
+    tracker = line.tracker
+    try:
+        priority = tracker.max_delimiter_priority(frozenset((id(last_leaf),)))
+    except ValueError:
+        raise _CannotSplit("no delimiters found") from None
+    if (
+        priority == DOT_PRIORITY
+        and tracker.delimiter_count_with_priority(priority) == 1
+    ):
+        raise _CannotSplit("splitting a single attribute from its owner looks wrong")
+    result = []
+    current = _Line(line.depth, line.inside_brackets)
+    lowest_depth = sys.maxsize
+    trailing_comma_safe = True
+    for leaf in line.leaves:
+        current.append(leaf, preformatted=True)
+        lowest_depth = min(lowest_depth, leaf.bracket_depth)
+        if trailing_comma_safe and leaf.bracket_depth == lowest_depth:
+            trailing_comma_safe = _can_add_trailing_comma(leaf, features)
+        if tracker.delimiters.get(id(leaf)) == priority:
+            result.append(current)
+            current = _Line(line.depth, line.inside_brackets)
+    if current:
+        if (
+            trailing_comma_safe
+            and priority == COMMA_PRIORITY
+            and current.leaves[-1].type != ","
+        ):
+            comma = _Leaf(",", ",")
+            comma.attached = False
+            current.append(comma)
+        result.append(current)
+    for split_line in result:
+        split_line.leaves[0].prefix = ""
+    return result
+
+
+def _copy_line(line: _Line) -> _Line:
+    # fresh leaves take the place of the originals, the way a reparented copy does
+    result = line.clone()
+    for leaf in line.leaves:
+        copy = leaf.copy()
+        copy.prefix = copy.ws if result.leaves else ""
+        leaf.attached = False
+        result.append(copy)
+    return result
+
+
+def _run_transformer(
+    line: _Line, transform, features: frozenset, line_str: str
+) -> list:
+    result = []
+    for transformed_line in transform(line, features):
+        if str(transformed_line) == line_str:
+            raise _CannotSplit("line transformer returned an unchanged result")
+        result.extend(_transform_line(transformed_line, features))
+    if (
+        "force_optional_parentheses" in features
+        or transform is not _rhs
+        or not line.tracker.invisible
+        or any(bracket.value for bracket in line.tracker.invisible)
+        or line.contains_multiline_strings()
+        or _is_line_short_enough(result[0])
+        or any(not leaf.attached for leaf in line.leaves)
+    ):
+        return result
+    line_copy = _copy_line(line)
+    second_opinion = _run_transformer(
+        line_copy, transform, features | {"force_optional_parentheses"}, line_str
+    )
+    if all(_is_line_short_enough(x) for x in second_opinion):
+        result = second_opinion
+    return result
+
+
+def _transform_line(line: _Line, features: frozenset) -> list:
+    line_str = str(line)
+    if (
+        not line.should_split_rhs
+        and not line.magic_trailing_comma
+        and _is_line_short_enough(line)
+    ):
+        return [line]
+    if line.is_def:
+        transformers = [_left_hand_split]
+    elif line.inside_brackets:
+        transformers = [_delimiter_split, _rhs]
+    else:
+        transformers = [_rhs]
+    for transform in transformers:
+        try:
+            return _run_transformer(line, transform, features, line_str)
+        except _CannotSplit:
+            continue
+    return [line]
+
+
+class _EmptyLineTracker:
+    """
+    Decides the empty lines around each logical line, separating definitions.
+    """
+
+    def __init__(self):
+        self.previous_line = None
+        self.previous_after = 0
+        self.previous_defs = []
+        self.after_module_docstring = False
+        self.lines_seen = 0
+
+    def maybe_empty_lines(self, line: _LineSummary, before: int) -> tuple:
+        before, after = self._maybe_empty_lines(line, before)
+        before = max(0, before - self.previous_after)
+        if self.after_module_docstring and not (line.is_class or line.is_def):
+            before = 1
+        self.after_module_docstring = (
+            self.lines_seen == 0 and line.leaf_count == 1 and line.is_docstring
+        )
+        self.lines_seen += 1
+        self.previous_line = line
+        self.previous_after = after
+        return before, after
+
+    def _maybe_empty_lines(self, line: _LineSummary, before: int) -> tuple:
+        max_allowed = 2 if line.depth == 0 else 1
+        before = min(before, max_allowed)
+        user_had_newline = bool(before)
+        depth = line.depth
+        previous_def = None
+        while self.previous_defs and self.previous_defs[-1].depth >= depth:
+            previous_def = self.previous_defs.pop()
+        if line.is_def or line.is_class:
+            self.previous_defs.append(line)
+        previous_line = self.previous_line
+        if previous_line is None:
+            return 0, 0
+        if line.is_docstring:
+            if previous_line.is_class:
+                return 0, 1
+            if previous_line.opens_block and previous_line.is_def:
+                return 0, 0
+        if previous_def is not None:
+            if depth:
+                before = 1
+            elif (
+                previous_def.depth
+                and line.opens_block
+                and line.first_value
+                not in ("with", "try", "for", "while", "if", "match")
+            ):
+                before = 1
+            else:
+                before = 2
+        if line.is_decorator or line.is_def or line.is_class:
+            if previous_line.is_decorator:
+                return 0, 0
+            if previous_line.depth < line.depth and (
+                previous_line.is_class or previous_line.is_def
+            ):
+                return (1 if user_had_newline else 0), 0
+            newlines = 1 if line.depth else 2
+            if previous_line.is_stub_def and not user_had_newline:
+                newlines = 0
+            return newlines, 0
+        if (
+            previous_line.is_import
+            and not line.is_import
+            and depth == previous_line.depth
+        ):
+            return (before or 1), 0
+        return before, 0
+
+
+def _normalize_string_prefix(s: str) -> str:
+    match = _STRING_PREFIX_RE.match(s)
+    prefix = (
+        match.group(1)
+        .replace("F", "f")
+        .replace("B", "b")
+        .replace("U", "")
+        .replace("u", "")
+    )
+    if len(prefix) == 2 and prefix[0].lower() != "r":
+        prefix = prefix[::-1]
+    return f"{prefix}{match.group(2)}"
+
+
+def _sub_twice(regex: re.Pattern, replacement: str, original: str) -> str:
+    return regex.sub(replacement, regex.sub(replacement, original))
+
+
+def _normalize_string_quotes(s: str) -> str:
+    """
+    Prefers double quotes unless it causes more escaping.
+
+    :param s: String literal including its prefix
+    :return: The string literal with normalized quotes
+    """
+    value = s.lstrip(_STRING_PREFIX_CHARS)
+    if value[:3] == '"""':
+        return s
+    elif value[:3] == "'''":
+        orig_quote = "'''"
+        new_quote = '"""'
+    elif value[0] == '"':
+        orig_quote = '"'
+        new_quote = "'"
+    else:
+        orig_quote = "'"
+        new_quote = '"'
+    first_quote_pos = s.find(orig_quote)
+    prefix = s[:first_quote_pos]
+    unescaped_new_quote = re.compile(rf"(([^\\]|^)(\\\\)*){new_quote}")
+    escaped_new_quote = re.compile(rf"([^\\]|^)\\((?:\\\\)*){new_quote}")
+    escaped_orig_quote = re.compile(rf"([^\\]|^)\\((?:\\\\)*){orig_quote}")
+    body = s[first_quote_pos + len(orig_quote) : -len(orig_quote)]
+    if "r" in prefix.casefold():
+        if unescaped_new_quote.search(body):
+            return s
+        new_body = body
+    else:
+        new_body = _sub_twice(escaped_new_quote, rf"\1\2{new_quote}", body)
+        if body != new_body:
+            body = new_body
+            s = f"{prefix}{orig_quote}{body}{orig_quote}"
+        new_body = _sub_twice(escaped_orig_quote, rf"\1\2{orig_quote}", new_body)
+        new_body = _sub_twice(unescaped_new_quote, rf"\1\\{new_quote}", new_body)
+    if "f" in prefix.casefold():
+        matches = re.findall(
+            r"(?:(?<!\{)|^)\{([^{].*?)\}(?:(?!\})|$)",
+            new_body,
+        )
+        for m in matches:
+            if "\\" in str(m):
+                return s
+    if new_quote == '"""' and new_body[-1:] == '"':
+        new_body = new_body[:-1] + '\\"'
+    orig_escape_count = body.count("\\")
+    new_escape_count = new_body.count("\\")
+    if new_escape_count > orig_escape_count:
+        return s
+    if new_escape_count == orig_escape_count and orig_quote == '"':
+        return s
+    return f"{prefix}{new_quote}{new_body}{new_quote}"
+
+
+def _format_float_or_int(text: str) -> str:
+    if "." not in text:
+        return text
+    before, after = text.split(".")
+    return f"{before or 0}.{after or 0}"
+
+
+def _normalize_number(text: str) -> str:
+    text = text.lower()
+    if "e" in text:
+        before, after = text.split("e")
+        sign = ""
+        if after.startswith("-"):
+            after = after[1:]
+            sign = "-"
+        elif after.startswith("+"):
+            after = after[1:]
+        return f"{_format_float_or_int(before)}e{sign}{after}"
+    if text.endswith("j"):
+        return f"{_format_float_or_int(text[:-1])}j"
+    return _format_float_or_int(text)
+
+
+_MULTI_QUOTES = ('"""', "'''")
+
+
+def _docstring_literal(value: str) -> str:
+    # the quoting ast.unparse picks for docstrings, avoiding backslashes
+    def escape_char(c):
+        if c in "\n\t":
+            return c
+        if c == "\\" or not c.isprintable():
+            return c.encode("unicode_escape").decode("ascii")
+        return c
+
+    escaped = "".join(map(escape_char, value))
+    possible_quotes = [q for q in _MULTI_QUOTES if q not in escaped]
+    if not possible_quotes:
+        string = repr(value)
+        quote = next((q for q in _MULTI_QUOTES if string[0] in q), string[0])
+        return f"{quote}{string[1:-1]}{quote}"
+    if escaped:
+        possible_quotes.sort(key=lambda q: q[0] == escaped[-1])
+        if possible_quotes[0][0] == escaped[-1]:
+            escaped = escaped[:-1] + "\\" + escaped[-1]
+    return f"{possible_quotes[0]}{escaped}{possible_quotes[0]}"
+
+
+def _lines_with_leading_tabs_expanded(s: str) -> list:
+    lines = []
+    for line in s.splitlines():
+        stripped_line = line.lstrip()
+        if not stripped_line or stripped_line == line:
+            lines.append(line)
+        else:
+            prefix_length = len(line) - len(stripped_line)
+            lines.append(line[:prefix_length].expandtabs() + stripped_line)
+    if s.endswith("\n"):
+        lines.append("")
+    return lines
+
+
+def _fix_multiline_docstring(docstring: str, prefix: str) -> str:
+    lines = _lines_with_leading_tabs_expanded(docstring)
+    indent = sys.maxsize
+    for line in lines[1:]:
+        stripped = line.lstrip()
+        if stripped:
+            indent = min(indent, len(line) - len(stripped))
+    trimmed = [lines[0].strip()]
+    if indent < sys.maxsize:
+        last_line_idx = len(lines) - 2
+        for i, line in enumerate(lines[1:]):
+            stripped_line = line[indent:].rstrip()
+            if stripped_line or i == last_line_idx:
+                trimmed.append(prefix + stripped_line)
+            else:
+                trimmed.append("")
+    return "\n".join(trimmed)
+
+
+def _format_docstring(literal: str, depth: int) -> str:
+    """
+    Normalizes a docstring literal the way black lays docstrings out.
+
+    :param literal: Docstring literal as ast.unparse writes it
+    :param depth: Indentation depth of the docstring
+    :return: The docstring literal to write
+    """
+    if re.search(r"\\\s*\n", literal):
+        return _normalize_string_quotes(_normalize_string_prefix(literal))
+    docstring = _normalize_string_quotes(_normalize_string_prefix(literal))
+    prefix = _STRING_PREFIX_RE.match(docstring).group(1)
+    docstring = docstring[len(prefix) :]
+    quote_char = docstring[0]
+    first_quote_len = 1 if docstring[1] != quote_char else 3
+    quote_len = first_quote_len
+    docstring = docstring[quote_len:-quote_len]
+    docstring_started_empty = not docstring
+    indent = " " * 4 * depth
+    if literal.lstrip(_STRING_PREFIX_CHARS)[:3] in _MULTI_QUOTES and "\n" in literal:
+        docstring = _fix_multiline_docstring(docstring, indent)
+    else:
+        docstring = docstring.strip()
+    has_trailing_backslash = False
+    if docstring:
+        if docstring[0] == quote_char:
+            docstring = " " + docstring
+        if docstring[-1] == quote_char:
+            docstring += " "
+        if docstring[-1] == "\\":
+            backslash_count = len(docstring) - len(docstring.rstrip("\\"))
+            if backslash_count % 2:
+                docstring += " "
+                has_trailing_backslash = True
+    elif not docstring_started_empty:
+        docstring = " "
+    quote = quote_char * quote_len
+    if quote_len == 3:
+        lines = docstring.splitlines()
+        last_line_length = len(lines[-1]) if docstring else 0
+        if (
+            len(lines) > 1
+            and last_line_length + quote_len > LINE_LENGTH
+            and len(indent) + quote_len <= LINE_LENGTH
+            and not has_trailing_backslash
+        ):
+            if literal[-1 - quote_len] == "\n":
+                value = prefix + quote + docstring + quote
+            else:
+                value = prefix + quote + docstring + "\n" + indent + quote
+        else:
+            value = prefix + quote + docstring + quote
+    else:
+        value = prefix + quote + docstring + quote
+    return _normalize_string_quotes(_normalize_string_prefix(value))
+
+
+# operator precedences of ast.unparse, parentheses are placed the same way
+_NAMED_EXPR = 1
+_TUPLE = 2
+_YIELD = 3
+_TEST = 4
+_OR = 5
+_AND = 6
+_NOT = 7
+_CMP = 8
+_EXPR = 9
+_BOR = 9
+_BXOR = 10
+_BAND = 11
+_SHIFT = 12
+_ARITH = 13
+_TERM = 14
+_FACTOR = 15
+_POWER = 16
+_AWAIT = 17
+_ATOM = 18
+
+_BINOPS = {
+    ast.Add: ("+", _ARITH),
+    ast.Sub: ("-", _ARITH),
+    ast.Mult: ("*", _TERM),
+    ast.MatMult: ("@", _TERM),
+    ast.Div: ("/", _TERM),
+    ast.Mod: ("%", _TERM),
+    ast.LShift: ("<<", _SHIFT),
+    ast.RShift: (">>", _SHIFT),
+    ast.BitOr: ("|", _BOR),
+    ast.BitXor: ("^", _BXOR),
+    ast.BitAnd: ("&", _BAND),
+    ast.FloorDiv: ("//", _TERM),
+    ast.Pow: ("**", _POWER),
+}
+_UNARYOPS = {
+    ast.Invert: ("~", _FACTOR),
+    ast.Not: ("not", _NOT),
+    ast.UAdd: ("+", _FACTOR),
+    ast.USub: ("-", _FACTOR),
+}
+_CMPOPS = {
+    ast.Eq: "==",
+    ast.NotEq: "!=",
+    ast.Lt: "<",
+    ast.LtE: "<=",
+    ast.Gt: ">",
+    ast.GtE: ">=",
+    ast.Is: "is",
+    ast.IsNot: "is not",
+    ast.In: "in",
+    ast.NotIn: "not in",
+}
+_ARITH_LIKE = (ast.Add, ast.Sub, ast.LShift, ast.RShift, ast.BitXor, ast.BitAnd)
+# parents that keep the parentheses around an assignment expression
+_WALRUS_PARENTS = frozenset(
+    (
+        "annassign",
+        "expr_stmt",
+        "assert_stmt",
+        "return_stmt",
+        "except_clause",
+        "funcdef",
+        "with_stmt",
+        "tname",
+        "for_stmt",
+        "del_stmt",
+    )
+)
+
+
+def _is_simple_power_operand(node: ast.expr) -> bool:
+    if isinstance(node, ast.Name):
+        return True
+    if isinstance(node, ast.Constant):
+        return isinstance(node.value, (int, float, complex)) or node.value is None
+    if isinstance(node, ast.Attribute):
+        while isinstance(node, ast.Attribute):
+            node = node.value
+        return isinstance(node, ast.Name)
+    return False
+
+
+def _is_simple_slice_part(node: Optional[ast.expr]) -> bool:
+    if node is None or isinstance(node, (ast.Name, ast.Constant)):
+        return True
+    if isinstance(node, ast.UnaryOp) and not isinstance(node.op, ast.Not):
+        return _is_simple_slice_part(node.operand)
+    return False
+
+
+def _is_simple_decorator(node: ast.expr) -> bool:
+    if isinstance(node, ast.Call):
+        node = node.func
+    while isinstance(node, ast.Attribute):
+        node = node.value
+    return isinstance(node, ast.Name)
+
+
+def _trailing_comma_features(root: ast.Module) -> frozenset:
+    # the features black infers from the source decide if trailing commas may
+    # follow *args and **kwargs, python 3.6 syntax is enough for both
+    for node in ast.walk(root):
+        if isinstance(node, (ast.JoinedStr, ast.NamedExpr)):
+            break
+        if isinstance(node, ast.arguments) and node.posonlyargs:
+            break
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            if not all(_is_simple_decorator(d) for d in node.decorator_list):
+                break
+        if (
+            isinstance(node, ast.ImportFrom)
+            and node.module == "__future__"
+            and any(alias.name == "annotations" for alias in node.names)
+        ):
+            break
+        if isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Starred):
+            break
+        if isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Tuple):
+            if any(isinstance(elt, ast.Starred) for elt in node.slice.elts):
+                break
+        if type(node).__name__ in ("Match", "TryStar", "TypeAlias"):
+            break
+        if getattr(node, "type_params", None):
+            break
+        if isinstance(node, Preformatted) and node.features:
+            break
+    else:
+        return frozenset()
+    return TRAILING_COMMA_FEATURES
+
+
+class Preformatted(ast.stmt):
+    """
+    A class or function definition laid out beforehand, standing in for its ast in a
+    module. Worker processes lay out definitions this way so that only their lines
+    are sent back.
+
+    :param name: Name of the definition
+    :param depth: Indentation depth the definition is laid out at
+    :param digest: Hash of the ast of the definition
+    :param lines: Lines of the definition without the trailing comma features
+    :param trailing_comma_lines: Lines of the definition with the trailing comma
+        features, None if they are the same lines
+    :param features: True if the definition has syntax that enables the features
+    :param names: Names the definition uses, for the ones that import it
+    """
+
+    _fields = (
+        "name",
+        "depth",
+        "digest",
+        "lines",
+        "trailing_comma_lines",
+        "features",
+        "names",
+    )
+
+
+class _LineWriter:
+    """
+    Turns the statements of a module into logical lines of leaves.
+
+    Parentheses follow ast.unparse, then the optional parentheses black adds or
+    hides are applied so the leaves match what black would read from that source.
+    """
+
+    def __init__(
+        self,
+        fragments: Optional[dict] = None,
+        fragment_key: Optional[Callable[[ast.AST], Optional[str]]] = None,
+        features: frozenset = frozenset(),
+    ):
+        self._precedences = {}
+        self._leaves = []
+        self._annotation = None
+        self._started = False
+        self._fragments = fragments
+        self._fragment_key = fragment_key if fragments is not None else None
+        self._features = features
+        self._key_suffix = ":f" if features else ""
+        self.vararg_leaves = 0
+
+    # lines
+
+    def lines(self, root: ast.Module) -> Iterator[tuple]:
+        """
+        Generates the logical lines of a module.
+
+        Definitions with a fragment in the cache are generated as a single "cached"
+        event, and the ones that will be cached are put between "begin" and "end".
+
+        :param root: Module to generate lines for
+        :return: Iterator of ("line", line, before), ("cached", entries, before),
+            ("begin", key) and ("end", key) events, where before is the number of
+            empty lines ast.unparse puts before the line
+        """
+        yield from self._block(root.body, 0, root)
+
+    def _line(self, depth: int, before: int = 0) -> tuple:
+        line = _Line(depth)
+        for leaf in self._leaves:
+            line.append(leaf)
+        self._leaves = []
+        self._started = True
+        return "line", line, before
+
+    def _block(self, body: list, depth: int, owner: ast.AST) -> Iterator[tuple]:
+        for index, node in enumerate(body):
+            if (
+                index == 0
+                and isinstance(node, ast.Expr)
+                and isinstance(node.value, ast.Constant)
+                and isinstance(node.value.value, str)
+            ):
+                if isinstance(
+                    owner,
+                    (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef),
+                ):
+                    literal = _docstring_literal(node.value.value)
+                else:
+                    literal = repr(node.value.value)
+                leaf = self._add("string", _format_docstring(literal, depth))
+                leaf.docstring = True
+                yield self._line(depth)
+                continue
+            if isinstance(node, Preformatted):
+                yield self._preformatted(node, depth)
+                continue
+            handler = getattr(self, f"_stmt_{type(node).__name__}", None)
+            if handler is None:
+                raise ValueError(f"unsupported statement {type(node).__name__}")
+            key = None
+            if self._fragment_key is not None and isinstance(
+                node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+            ):
+                key = self._fragment_key(node)
+            if key is None:
+                yield from handler(node, depth)
+                continue
+            key = f"{key}:{depth}{self._key_suffix}"
+            if key in self._fragments:
+                yield "cached", self._fragments[key], self._def_before()
+                self._started = True
+                continue
+            yield "begin", key
+            yield from handler(node, depth)
+            yield "end", key
+
+    def _preformatted(self, node: Preformatted, depth: int) -> tuple:
+        if node.depth != depth:
+            raise ValueError(
+                f"{node.name} is laid out at depth {node.depth}, not at {depth}"
+            )
+        entries = node.lines
+        if self._features and node.trailing_comma_lines is not None:
+            entries = node.trailing_comma_lines
+        if self._fragment_key is not None:
+            key = self._fragment_key(node)
+            if key is not None:
+                self._fragments[f"{key}:{depth}{self._key_suffix}"] = entries
+        before = self._def_before()
+        self._started = True
+        return "cached", entries, before
+
+    def _suite(self, body: list, depth: int, owner: ast.AST) -> Iterator[tuple]:
+        self._add(":", ":", space=False)
+        yield self._line(depth)
+        yield from self._block(body, depth + 1, owner)
+
+    # leaves
+
+    def _add(self, type_: str, value: str, space: bool = True) -> _Leaf:
+        previous = self._leaves[-1] if self._leaves else None
+        if (
+            previous is None
+            or not space
+            or previous.sticky
+            or previous.type in OPENING_BRACKETS
+        ):
+            ws = ""
+        else:
+            ws = " "
+        leaf = _Leaf(type_, value, ws)
+        leaf.annotation = self._annotation
+        self._leaves.append(leaf)
+        return leaf
+
+    def _name(self, value: str) -> _Leaf:
+        return self._add("name", value)
+
+    def _comma(self, arglist: bool = False) -> _Leaf:
+        leaf = self._add(",", ",", space=False)
+        leaf.arglist = arglist
+        return leaf
+
+    def _operator(self, value: str, priority: int = 0, needs_parent: bool = True):
+        leaf = self._add("name" if value.isalpha() else "op", value)
+        leaf.priority = priority
+        leaf.needs_parent = needs_parent
+        return leaf
+
+    def _star(self, value: str, vararg: Optional[str] = None) -> _Leaf:
+        leaf = self._add(value, value)
+        leaf.sticky = True
+        leaf.vararg = vararg
+        if vararg is not None:
+            self.vararg_leaves += 1
+        return leaf
+
+    def _open(self, value: str, explode: bool = False, trailer: bool = False):
+        leaf = self._add(value, value, space=not trailer)
+        leaf.explode = explode
+        leaf.trailer = trailer
+        return leaf
+
+    def _close(self, value: str, trailer: bool = False) -> _Leaf:
+        leaf = self._add(value, value, space=False)
+        leaf.trailer = trailer
+        return leaf
+
+    # optional parentheses
+
+    def _outer_parens(self, node: ast.expr, parent: str) -> Optional[str]:
+        if isinstance(node, ast.Tuple):
+            if not node.elts or self._get_precedence(node) > _TUPLE:
+                return "visible"
+            return None
+        if isinstance(node, ast.Constant) and isinstance(node.value, tuple):
+            return "visible"
+        if isinstance(node, ast.GeneratorExp):
+            return "visible"
+        precedence = self._own_precedence(node)
+        if precedence is None or self._get_precedence(node) <= precedence:
+            return None
+        if isinstance(node, (ast.Yield, ast.YieldFrom)):
+            return "optional" if parent == "expr_stmt" else "visible"
+        if isinstance(node, ast.NamedExpr):
+            return "visible" if parent in _WALRUS_PARENTS else "optional"
+        return "optional"
+
+    def _own_precedence(self, node: ast.expr) -> Optional[int]:
+        if isinstance(node, ast.NamedExpr):
+            return _NAMED_EXPR
+        if isinstance(node, (ast.Yield, ast.YieldFrom)):
+            return _YIELD
+        if isinstance(node, (ast.IfExp, ast.Lambda)):
+            return _TEST
+        if isinstance(node, ast.BoolOp):
+            return _AND if isinstance(node.op, ast.And) else _OR
+        if isinstance(node, ast.UnaryOp):
+            return _UNARYOPS[type(node.op)][1]
+        if isinstance(node, ast.BinOp):
+            return _BINOPS[type(node.op)][1]
+        if isinstance(node, ast.Compare):
+            return _CMP
+        if isinstance(node, ast.Await):
+            return _AWAIT
+        return None
+
+    def _wrapped(self, node: ast.expr, parent: str):
+        # an expression in a place black puts optional parentheses around
+        parens = self._outer_parens(node, parent)
+        if parens == "visible":
+            self._expr(node)
+        elif parens == "optional":
+            start = len(self._leaves)
+            self._expr(node)
+            self._leaves[start].value = ""
+            self._leaves[-1].value = ""
+        elif isinstance(node, ast.Tuple) and len(node.elts) == 1:
+            self._open("(", explode=True)
+            self._expr(node)
+            self._close(")")
+        else:
+            self._open("", explode=True).type = "("
+            self._expr(node, sole=True)
+            self._close("").type = ")"
+
+    def _invisible_parens(self, node: ast.expr, explode: bool = True):
+        lpar = self._open("(", explode=explode)
+        lpar.value = ""
+        self._expr(node, sole=True)
+        self._close(")").value = ""
+
+    # statements
+
+    def _def_before(self) -> int:
+        return 1 if self._started else 0
+
+    def _decorators(self, node: ast.AST, depth: int) -> Iterator[tuple]:
+        for decorator in node.decorator_list:
+            before = self._def_before()
+            self._star("@")
+            simple = _is_simple_decorator(decorator)
+            start = len(self._leaves)
+            self._expr(decorator)
+            if simple:
+                for leaf in self._leaves[start:]:
+                    leaf.attr_dot = False
+            yield self._line(depth, before)
+
+    def _is_stub_body(self, node: ast.AST) -> bool:
+        return (
+            len(node.body) == 1
+            and isinstance(node.body[0], ast.Expr)
+            and isinstance(node.body[0].value, ast.Constant)
+            and node.body[0].value.value is Ellipsis
+        )
+
+    def _definition_body(self, node: ast.AST, depth: int, before: int):
+        if self._is_stub_body(node):
+            self._add(":", ":", space=False)
+            for i in range(3):
+                self._add(".", ".", space=i == 0)
+            yield self._line(depth, before)
+        else:
+            self._add(":", ":", space=False)
+            yield self._line(depth, before)
+            yield from self._block(node.body, depth + 1, node)
+
+    def _stmt_FunctionDef(self, node: ast.FunctionDef, depth: int):
+        if getattr(node, "type_params", None):
+            raise ValueError("unsupported type parameters")
+        before = self._def_before()
+        if node.decorator_list:
+            yield from self._decorators(node, depth)
+            before = 0
+        if isinstance(node, ast.AsyncFunctionDef):
+            self._add("async", "async")
+        self._name("def")
+        self._name(node.name)
+        self._add("(", "(", space=False)
+        self._arguments(node.args)
+        self._close(")")
+        if node.returns:
+            self._add("op", "->")
+            self._annotation = "return"
+            returns = node.returns
+            self._wrapped(returns, "funcdef")
+            self._annotation = None
+        yield from self._definition_body(node, depth, before)
+
+    _stmt_AsyncFunctionDef = _stmt_FunctionDef
+
+    def _stmt_ClassDef(self, node: ast.ClassDef, depth: int):
+        if getattr(node, "type_params", None):
+            raise ValueError("unsupported type parameters")
+        before = self._def_before()
+        if node.decorator_list:
+            yield from self._decorators(node, depth)
+            before = 0
+        self._name("class")
+        self._name(node.name)
+        if node.bases or node.keywords:
+            self._add("(", "(", space=False)
+            self._call_arguments(node.bases, node.keywords)
+            self._close(")")
+        yield from self._definition_body(node, depth, before)
+
+    def _stmt_Module(self, node: ast.Module, depth: int):
+        # the generator nests modules to group statements
+        yield from self._block(node.body, depth, node)
+
+    def _stmt_Expr(self, node: ast.Expr, depth: int):
+        self._set_precedence(_YIELD, node.value)
+        value = node.value
+        if isinstance(value, ast.BinOp) and isinstance(value.op, _ARITH_LIKE):
+            if self._get_precedence(value) <= _BINOPS[type(value.op)][1]:
+                self._invisible_parens(value)
+                yield self._line(depth)
+                return
+        self._expr(value)
+        yield self._line(depth)
+
+    def _stmt_Assign(self, node: ast.Assign, depth: int):
+        for index, target in enumerate(node.targets):
+            self._set_precedence(_TUPLE, target)
+            if index > 0 or (isinstance(target, ast.Tuple) and target.elts):
+                self._wrapped(target, "expr_stmt")
+            else:
+                self._expr(target)
+            self._add("=", "=")
+        self._wrapped(node.value, "expr_stmt")
+        yield self._line(depth)
+
+    def _stmt_AugAssign(self, node: ast.AugAssign, depth: int):
+        self._expr(node.target)
+        self._add("op", _BINOPS[type(node.op)][0] + "=")
+        self._wrapped(node.value, "expr_stmt")
+        yield self._line(depth)
+
+    def _stmt_AnnAssign(self, node: ast.AnnAssign, depth: int):
+        if not node.simple and isinstance(node.target, ast.Name):
+            self._open("(", explode=True)
+            self._expr(node.target)
+            self._close(")")
+        else:
+            self._expr(node.target)
+        self._add(":", ":", space=False)
+        self._wrapped(node.annotation, "annassign")
+        if node.value:
+            self._add("=", "=")
+            self._wrapped(node.value, "annassign")
+        yield self._line(depth)
+
+    def _stmt_Return(self, node: ast.Return, depth: int):
+        self._name("return")
+        if node.value:
+            self._wrapped(node.value, "return_stmt")
+        yield self._line(depth)
+
+    def _stmt_Pass(self, node: ast.Pass, depth: int):
+        self._name("pass")
+        yield self._line(depth)
+
+    def _stmt_Break(self, node: ast.Break, depth: int):
+        self._name("break")
+        yield self._line(depth)
+
+    def _stmt_Continue(self, node: ast.Continue, depth: int):
+        self._name("continue")
+        yield self._line(depth)
+
+    def _stmt_Delete(self, node: ast.Delete, depth: int):
+        self._name("del")
+        if len(node.targets) == 1:
+            self._wrapped(node.targets[0], "del_stmt")
+        else:
+            self._open("(", explode=True).value = ""
+            for index, target in enumerate(node.targets):
+                if index:
+                    self._comma()
+                self._expr(target)
+            self._close(")").value = ""
+        yield self._line(depth)
+
+    def _stmt_Assert(self, node: ast.Assert, depth: int):
+        self._name("assert")
+        self._wrapped(node.test, "assert_stmt")
+        if node.msg:
+            self._comma()
+            self._wrapped(node.msg, "assert_stmt")
+        yield self._line(depth)
+
+    def _stmt_Raise(self, node: ast.Raise, depth: int):
+        self._name("raise")
+        if node.exc:
+            self._expr(node.exc)
+            if node.cause:
+                self._name("from")
+                self._expr(node.cause)
+        yield self._line(depth)
+
+    def _stmt_Global(self, node: ast.Global, depth: int):
+        self._name("global" if isinstance(node, ast.Global) else "nonlocal")
+        for index, name in enumerate(node.names):
+            if index:
+                self._comma()
+            self._name(name)
+        yield self._line(depth)
+
+    _stmt_Nonlocal = _stmt_Global
+
+    def _dotted_name(self, name: str, space: bool = True):
+        for index, part in enumerate(name.split(".")):
+            if index:
+                self._add(".", ".", space=False).sticky = True
+                self._add("name", part, space=False)
+            else:
+                self._add("name", part, space=space)
+
+    def _aliases(self, names: list):
+        for index, alias in enumerate(names):
+            if index:
+                self._comma()
+            self._dotted_name(alias.name)
+            if alias.asname:
+                self._name("as")
+                self._name(alias.asname)
+
+    def _stmt_Import(self, node: ast.Import, depth: int):
+        self._name("import").import_kw = True
+        self._aliases(node.names)
+        yield self._line(depth)
+
+    def _stmt_ImportFrom(self, node: ast.ImportFrom, depth: int):
+        self._name("from").import_kw = True
+        for index in range(node.level or 0):
+            self._add(".", ".", space=index == 0)
+        if node.module:
+            self._dotted_name(node.module, space=not node.level)
+        self._name("import")
+        if len(node.names) == 1 and node.names[0].name == "*":
+            self._star("*").sticky = False
+        else:
+            self._open("(", explode=True).value = ""
+            self._aliases(node.names)
+            self._close(")").value = ""
+        yield self._line(depth)
+
+    def _stmt_If(self, node: ast.If, depth: int):
+        self._name("if")
+        self._wrapped(node.test, "if_stmt")
+        yield from self._suite(node.body, depth, node)
+        while (
+            node.orelse and len(node.orelse) == 1 and isinstance(node.orelse[0], ast.If)
+        ):
+            node = node.orelse[0]
+            self._name("elif")
+            self._wrapped(node.test, "if_stmt")
+            yield from self._suite(node.body, depth, node)
+        if node.orelse:
+            self._name("else")
+            yield from self._suite(node.orelse, depth, node)
+
+    def _stmt_While(self, node: ast.While, depth: int):
+        self._name("while")
+        self._wrapped(node.test, "while_stmt")
+        yield from self._suite(node.body, depth, node)
+        if node.orelse:
+            self._name("else")
+            yield from self._suite(node.orelse, depth, node)
+
+    def _stmt_For(self, node: ast.For, depth: int):
+        if isinstance(node, ast.AsyncFor):
+            self._add("async", "async")
+        self._name("for")
+        self._set_precedence(_TUPLE, node.target)
+        self._wrapped(node.target, "for_stmt")
+        self._name("in")
+        self._wrapped(node.iter, "for_stmt")
+        yield from self._suite(node.body, depth, node)
+        if node.orelse:
+            self._name("else")
+            yield from self._suite(node.orelse, depth, node)
+
+    _stmt_AsyncFor = _stmt_For
+
+    def _stmt_With(self, node: ast.With, depth: int):
+        if isinstance(node, ast.AsyncWith):
+            self._add("async", "async")
+        self._name("with")
+        for index, item in enumerate(node.items):
+            if index:
+                self._comma()
+            if item.optional_vars is None and isinstance(
+                item.context_expr, (ast.Name, ast.Constant)
+            ):
+                self._wrapped(item.context_expr, "with_stmt")
+                continue
+            self._expr(item.context_expr)
+            if item.optional_vars is not None:
+                self._name("as")
+                self._expr(item.optional_vars)
+        yield from self._suite(node.body, depth, node)
+
+    _stmt_AsyncWith = _stmt_With
+
+    def _stmt_Try(self, node: ast.Try, depth: int):
+        self._name("try")
+        yield from self._suite(node.body, depth, node)
+        for handler in node.handlers:
+            self._name("except")
+            if handler.type:
+                self._wrapped(handler.type, "except_clause")
+            if handler.name:
+                self._name("as")
+                self._name(handler.name)
+            yield from self._suite(handler.body, depth, handler)
+        if node.orelse:
+            self._name("else")
+            yield from self._suite(node.orelse, depth, node)
+        if node.finalbody:
+            self._name("finally")
+            yield from self._suite(node.finalbody, depth, node)
+
+    # arguments
+
+    def _arguments(self, args: ast.arguments, lambda_: bool = False):
+        vararg_kind = None if lambda_ else "def"
+        first = True
+
+        def argument(arg: ast.arg, default: Optional[ast.expr], annotated: bool):
+            self._name(arg.arg)
+            if arg.annotation and not lambda_:
+                self._add(":", ":", space=False)
+                self._annotation = "param"
+                if annotated:
+                    self._param_annotation(arg.annotation)
+                else:
+                    self._expr(arg.annotation)
+                self._annotation = None
+            if default:
+                if arg.annotation and not lambda_:
+                    self._add("=", "=")
+                else:
+                    self._add("=", "=", space=False).sticky = True
+                self._expr(default)
+
+        all_args = args.posonlyargs + args.args
+        defaults = [None] * (len(all_args) - len(args.defaults)) + args.defaults
+        for index, (arg, default) in enumerate(zip(all_args, defaults), 1):
+            if first:
+                first = False
+            else:
+                self._comma(arglist=not lambda_)
+            argument(arg, default, True)
+            if index == len(args.posonlyargs):
+                self._comma(arglist=not lambda_)
+                leaf = self._add("op", "/")
+                leaf.vararg = vararg_kind
+                if vararg_kind is not None:
+                    self.vararg_leaves += 1
+        if args.vararg or args.kwonlyargs:
+            if first:
+                first = False
+            else:
+                self._comma(arglist=not lambda_)
+            self._star("*", vararg_kind)
+            if args.vararg:
+                self._add("name", args.vararg.arg, space=False)
+                if args.vararg.annotation and not lambda_:
+                    self._add(":", ":", space=False)
+                    self._annotation = "param"
+                    self._expr(args.vararg.annotation)
+                    self._annotation = None
+        if args.kwonlyargs:
+            for arg, default in zip(args.kwonlyargs, args.kw_defaults):
+                self._comma(arglist=not lambda_)
+                argument(arg, default, True)
+        if args.kwarg:
+            if not first:
+                self._comma(arglist=not lambda_)
+            self._star("**", vararg_kind)
+            self._add("name", args.kwarg.arg, space=False)
+            if args.kwarg.annotation and not lambda_:
+                self._add(":", ":", space=False)
+                self._annotation = "param"
+                self._param_annotation(args.kwarg.annotation)
+                self._annotation = None
+
+    def _param_annotation(self, node: ast.expr):
+        # black wraps unions and displays in parameter annotations
+        if (
+            isinstance(node, ast.BinOp)
+            and isinstance(node.op, ast.BitOr)
+            and self._get_precedence(node) <= _BOR
+        ) or isinstance(
+            node, (ast.List, ast.Dict, ast.Set, ast.ListComp, ast.SetComp, ast.DictComp)
+        ):
+            self._invisible_parens(node)
+        else:
+            self._expr(node)
+
+    def _call_arguments(self, args: list, keywords: list):
+        sole = len(args) == 1 and not keywords and not isinstance(args[0], ast.Starred)
+        comma = False
+        for arg in args:
+            if comma:
+                self._comma(arglist=True)
+            else:
+                comma = True
+            if isinstance(arg, ast.Starred):
+                self._star("*", "call")
+                self._set_precedence(_EXPR, arg.value)
+                self._expr(arg.value)
+            else:
+                self._expr(arg, sole=sole)
+        for keyword in keywords:
+            if comma:
+                self._comma(arglist=True)
+            else:
+                comma = True
+            if keyword.arg is None:
+                self._star("**", "call")
+            else:
+                self._name(keyword.arg)
+                self._add("=", "=", space=False).sticky = True
+            self._expr(keyword.value)
+
+    # expressions
+
+    def _get_precedence(self, node: ast.AST) -> int:
+        return self._precedences.get(node, _TEST)
+
+    def _set_precedence(self, precedence: int, *nodes: ast.AST):
+        for node in nodes:
+            self._precedences[node] = precedence
+
+    def _expr(self, node: ast.expr, sole: bool = False):
+        handler = getattr(self, f"_expr_{type(node).__name__}", None)
+        if handler is None:
+            raise ValueError(f"unsupported expression {type(node).__name__}")
+        handler(node, sole)
+
+    def _require_parens(self, precedence: int, node: ast.expr) -> bool:
+        if self._get_precedence(node) > precedence:
+            self._open("(", explode=True)
+            return True
+        return False
+
+    def _expr_Name(self, node: ast.Name, sole: bool):
+        self._name(node.id)
+
+    def _expr_Constant(self, node: ast.Constant, sole: bool):
+        value = node.value
+        if isinstance(value, tuple):
+            self._open("(", explode=True)
+            for index, item in enumerate(value):
+                if index:
+                    self._comma()
+                self._expr(ast.Constant(item))
+            if len(value) == 1:
+                self._comma()
+            self._close(")")
+        elif value is ...:
+            for i in range(3):
+                self._add(".", ".", space=i == 0)
+        elif isinstance(value, (str, bytes)):
+            self._add("string", _normalize_string_quotes(repr(value)))
+        elif isinstance(value, bool) or value is None:
+            self._name(repr(value))
+        elif isinstance(value, (int, float)):
+            text = repr(value).replace("inf", _INFSTR)
+            if text.startswith("-"):
+                self._add("op", "-").sticky = True
+                text = text[1:]
+            if "nan" in text:
+                raise ValueError("unsupported constant nan")
+            self._add("number", _normalize_number(text))
+        elif isinstance(value, complex) and not value.real and value.imag >= 0:
+            self._add("number", _normalize_number(repr(value).replace("inf", _INFSTR)))
+        elif isinstance(value, (list, dict, set)):
+            # ast.unparse writes the repr of other values, like list defaults
+            self._expr(ast.parse(repr(value), mode="eval").body)
+        else:
+            raise ValueError(f"unsupported constant {value!r}")
+
+    def _expr_JoinedStr(self, node: ast.JoinedStr, sole: bool):
+        self._add("string", _normalize_string_quotes(ast.unparse(node)))
+
+    def _expr_NamedExpr(self, node: ast.NamedExpr, sole: bool):
+        parens = self._require_parens(_NAMED_EXPR, node)
+        self._set_precedence(_ATOM, node.target, node.value)
+        self._expr(node.target)
+        self._add("op", ":=")
+        self._expr(node.value)
+        if parens:
+            self._close(")")
+
+    def _expr_Await(self, node: ast.Await, sole: bool):
+        parens = self._require_parens(_AWAIT, node)
+        self._add("name", "await")
+        self._set_precedence(_ATOM, node.value)
+        self._expr(node.value)
+        if parens:
+            self._close(")")
+
+    def _expr_Yield(self, node: ast.Yield, sole: bool):
+        parens = self._require_parens(_YIELD, node)
+        self._name("yield")
+        if isinstance(node, ast.YieldFrom):
+            self._name("from")
+        if node.value:
+            self._set_precedence(_ATOM, node.value)
+            self._expr(node.value)
+        if parens:
+            self._close(")")
+
+    _expr_YieldFrom = _expr_Yield
+
+    def _expr_List(self, node: ast.List, sole: bool):
+        self._open("[", explode=True)
+        for index, elt in enumerate(node.elts):
+            if index:
+                self._comma()
+            self._element(elt)
+        self._close("]")
+
+    def _element(self, node: ast.expr):
+        if isinstance(node, ast.Starred):
+            self._star("*")
+            self._set_precedence(_EXPR, node.value)
+            self._expr(node.value)
+        else:
+            self._expr(node)
+
+    def _expr_Set(self, node: ast.Set, sole: bool):
+        self._open("{", explode=True)
+        if node.elts:
+            for index, elt in enumerate(node.elts):
+                if index:
+                    self._comma()
+                self._element(elt)
+        else:
+            self._star("*")
+            self._open("(", explode=True)
+            self._close(")")
+        self._close("}")
+
+    def _expr_Tuple(self, node: ast.Tuple, sole: bool):
+        parens = not node.elts or self._get_precedence(node) > _TUPLE
+        if parens:
+            self._open("(", explode=True)
+        self._items(node.elts)
+        if parens:
+            self._close(")")
+
+    def _items(self, elts: list):
+        for index, elt in enumerate(elts):
+            if index:
+                self._comma()
+            self._element(elt)
+        if len(elts) == 1:
+            self._comma()
+
+    def _expr_Dict(self, node: ast.Dict, sole: bool):
+        self._open("{", explode=True)
+        for index, (key, value) in enumerate(zip(node.keys, node.values)):
+            if index:
+                self._comma()
+            if key is None:
+                self._star("**")
+                self._set_precedence(_EXPR, value)
+                self._expr(value)
+            else:
+                self._expr(key)
+                self._add(":", ":", space=False)
+                self._expr(value)
+        self._close("}")
+
+    def _comprehension(self, generators: list):
+        for generator in generators:
+            if generator.is_async:
+                leaf = self._add("async", "async")
+                leaf.priority = COMPREHENSION_PRIORITY
+                self._name("for")
+            else:
+                self._operator("for", COMPREHENSION_PRIORITY)
+            self._set_precedence(_TUPLE, generator.target)
+            self._expr(generator.target)
+            self._name("in")
+            self._set_precedence(_TEST + 1, generator.iter, *generator.ifs)
+            self._expr(generator.iter)
+            for condition in generator.ifs:
+                self._operator("if", COMPREHENSION_PRIORITY)
+                self._expr(condition)
+
+    def _expr_ListComp(self, node: ast.ListComp, sole: bool):
+        self._open("[", explode=True)
+        self._expr(node.elt)
+        self._comprehension(node.generators)
+        self._close("]")
+
+    def _expr_SetComp(self, node: ast.SetComp, sole: bool):
+        self._open("{", explode=True)
+        self._expr(node.elt)
+        self._comprehension(node.generators)
+        self._close("}")
+
+    def _expr_GeneratorExp(self, node: ast.GeneratorExp, sole: bool):
+        self._open("(", explode=True)
+        self._expr(node.elt)
+        self._comprehension(node.generators)
+        self._close(")")
+
+    def _expr_DictComp(self, node: ast.DictComp, sole: bool):
+        self._open("{", explode=True)
+        self._expr(node.key)
+        self._add(":", ":", space=False)
+        self._expr(node.value)
+        self._comprehension(node.generators)
+        self._close("}")
+
+    def _expr_IfExp(self, node: ast.IfExp, sole: bool):
+        parens = self._require_parens(_TEST, node)
+        invisible = not parens and not sole
+        if invisible:
+            self._open("(").value = ""
+        self._set_precedence(_TEST + 1, node.body, node.test)
+        self._expr(node.body)
+        self._operator("if", TERNARY_PRIORITY)
+        self._expr(node.test)
+        self._operator("else", TERNARY_PRIORITY)
+        self._set_precedence(_TEST, node.orelse)
+        self._expr(node.orelse)
+        if invisible:
+            self._close(")").value = ""
+        if parens:
+            self._close(")")
+
+    def _expr_UnaryOp(self, node: ast.UnaryOp, sole: bool):
+        operator, precedence = _UNARYOPS[type(node.op)]
+        parens = self._require_parens(precedence, node)
+        self._set_precedence(precedence, node.operand)
+        if precedence == _NOT:
+            self._name(operator)
+            self._expr(node.operand)
+        else:
+            self._add("op", operator).sticky = True
+            operand = node.operand
+            if (
+                isinstance(operand, ast.BinOp)
+                and isinstance(operand.op, ast.Pow)
+                and self._get_precedence(operand) <= _POWER
+            ):
+                self._open("(", explode=True)
+                self._expr(operand)
+                self._close(")")
+            else:
+                self._expr(operand)
+        if parens:
+            self._close(")")
+
+    def _expr_BinOp(self, node: ast.BinOp, sole: bool):
+        operator, precedence = _BINOPS[type(node.op)]
+        parens = self._require_parens(precedence, node)
+        if operator == "**":
+            left, right = precedence + 1, precedence
+        else:
+            left, right = precedence, precedence + 1
+        self._set_precedence(left, node.left)
+        self._expr(node.left)
+        hug = (
+            operator == "**"
+            and _is_simple_power_operand(node.left)
+            and _is_simple_power_operand(node.right)
+        )
+        leaf = self._add("op", operator, space=not hug)
+        leaf.priority = MATH_PRIORITIES[operator]
+        leaf.needs_parent = True
+        leaf.sticky = hug
+        self._set_precedence(right, node.right)
+        self._expr(node.right)
+        if parens:
+            self._close(")")
+
+    def _expr_Compare(self, node: ast.Compare, sole: bool):
+        parens = self._require_parens(_CMP, node)
+        self._set_precedence(_CMP + 1, node.left, *node.comparators)
+        self._expr(node.left)
+        for op, comparator in zip(node.ops, node.comparators):
+            operator = _CMPOPS[type(op)]
+            if operator == "is not":
+                self._operator("is", COMPARATOR_PRIORITY, needs_parent=False)
+                self._name("not")
+            elif operator == "not in":
+                self._operator("not", COMPARATOR_PRIORITY)
+                self._name("in")
+            elif operator == "in":
+                self._operator("in", COMPARATOR_PRIORITY)
+            else:
+                self._operator(operator, COMPARATOR_PRIORITY, needs_parent=False)
+            self._expr(comparator)
+        if parens:
+            self._close(")")
+
+    def _expr_BoolOp(self, node: ast.BoolOp, sole: bool):
+        operator = "and" if isinstance(node.op, ast.And) else "or"
+        precedence = _AND if operator == "and" else _OR
+        parens = self._require_parens(precedence, node)
+        for index, value in enumerate(node.values):
+            if index:
+                self._operator(operator, LOGIC_PRIORITY)
+            precedence += 1
+            self._set_precedence(precedence, value)
+            self._expr(value)
+        if parens:
+            self._close(")")
+
+    def _expr_Attribute(self, node: ast.Attribute, sole: bool):
+        self._set_precedence(_ATOM, node.value)
+        if isinstance(node.value, ast.Constant) and type(node.value.value) in (
+            int,
+            float,
+        ):
+            self._open("(", explode=True)
+            self._expr(node.value)
+            self._close(")")
+        else:
+            self._expr(node.value)
+        dot = self._add(".", ".", space=False)
+        dot.sticky = True
+        dot.attr_dot = True
+        self._add("name", node.attr, space=False)
+
+    def _expr_Call(self, node: ast.Call, sole: bool):
+        self._set_precedence(_ATOM, node.func)
+        self._expr(node.func)
+        self._open("(", trailer=True)
+        self._call_arguments(node.args, node.keywords)
+        self._close(")", trailer=True)
+
+    def _expr_Subscript(self, node: ast.Subscript, sole: bool):
+        self._set_precedence(_ATOM, node.value)
+        self._expr(node.value)
+        self._open("[", trailer=True)
+        if isinstance(node.slice, ast.Tuple) and node.slice.elts:
+            for index, elt in enumerate(node.slice.elts):
+                if index:
+                    self._comma()
+                self._subscript_element(elt)
+            if len(node.slice.elts) == 1:
+                self._comma()
+        else:
+            self._subscript_element(node.slice)
+        self._close("]", trailer=True)
+
+    def _subscript_element(self, node: ast.expr):
+        if not isinstance(node, ast.Slice):
+            self._element(node)
+            return
+        complex_ = not all(
+            _is_simple_slice_part(part) for part in (node.lower, node.upper, node.step)
+        )
+
+        def colon():
+            previous = self._leaves[-1]
+            leaf = self._add(
+                ":",
+                ":",
+                space=previous.type == ","
+                or (complex_ and previous.type not in ("[", ":")),
+            )
+            leaf.sticky = not complex_
+
+        if node.lower:
+            self._expr(node.lower)
+        colon()
+        if node.upper:
+            self._expr(node.upper)
+        if node.step:
+            colon()
+            self._expr(node.step)
+
+    def _expr_Starred(self, node: ast.Starred, sole: bool):
+        self._element(node)
+
+    def _expr_Lambda(self, node: ast.Lambda, sole: bool):
+        parens = self._require_parens(_TEST, node)
+        self._name("lambda")
+        self._arguments(node.args, lambda_=True)
+        self._add(":", ":", space=False)
+        self._set_precedence(_TEST, node.body)
+        self._expr(node.body)
+        if parens:
+            self._close(")")
+
+
+def emit_lines(
+    root: ast.Module,
+    fragments: Optional[dict] = None,
+    fragment_key: Optional[Callable[[ast.AST], Optional[str]]] = None,
+) -> Iterator[str]:
+    """
+    Generates the formatted source of a module line by line.
+
+    The layout is the one `black.format_str(ast.unparse(root))` produces.
+    Definitions whose key has a fragment are written from the fragment instead of
+    being laid out again, the others are laid out and stored as fragments.
+
+    :param root: Module to generate the source of
+    :param fragments: Mapping of fragment keys and the lines of the definitions
+    :param fragment_key: Function returning the key of a class or function definition,
+        or None to always lay it out. The key must change whenever its source would.
+    :return: Iterator of source lines, each ending with a newline
+    """
+    features = _trailing_comma_features(root)
+    tracker = _EmptyLineTracker()
+    pending_after = 0
+    recordings = []
+    writer = _LineWriter(fragments, fragment_key, features)
+    for event in writer.lines(root):
+        kind = event[0]
+        if kind == "begin":
+            recordings.append([])
+            continue
+        if kind == "end":
+            fragments[event[1]] = recordings.pop()
+            continue
+        if kind == "line":
+            _, line, before = event
+            texts = [str(split_line) for split_line in _transform_line(line, features)]
+            entries = [(line.summary(), before, texts)]
+        else:
+            _, entries, before = event
+            first_summary, _, first_texts = entries[0]
+            entries = [(first_summary, before, first_texts), *entries[1:]]
+        for summary, before, texts in entries:
+            summary = _LineSummary(*summary)
+            for recording in recordings:
+                recording.append((summary, before, texts))
+            before, after = tracker.maybe_empty_lines(summary, before)
+            for _ in range(pending_after + before):
+                yield "\n"
+            for text in texts:
+                yield text + "\n"
+            pending_after = after
+
+
+def definition_digest(node: ast.AST) -> str:
+    return hashlib.sha256(ast.dump(node).encode()).hexdigest()
+
+
+def _definition_lines(node: ast.AST, depth: int, features: frozenset) -> tuple:
+    entries = []
+    writer = _LineWriter(features=features)
+    for _, line, before in writer._block([node], depth, node):
+        texts = [str(split_line) for split_line in _transform_line(line, features)]
+        entries.append((line.summary(), before, texts))
+    return entries, writer.vararg_leaves
+
+
+def preformat(
+    node: ast.AST, depth: int, names: frozenset = frozenset()
+) -> Preformatted:
+    """
+    Lays out a class or function definition on its own, the way emit_lines lays it
+    out in a module at the given depth.
+
+    :param node: Ast node of the definition
+    :param depth: Indentation depth of the definition in its module
+    :param names: Names the definition uses, see Preformatted
+    :return: Preformatted node to put in the module instead of the definition
+    """
+    lines, vararg_leaves = _definition_lines(node, depth, frozenset())
+    trailing_comma_lines = None
+    # the features only decide the trailing commas after *args and **kwargs
+    if vararg_leaves:
+        trailing_comma_lines, _ = _definition_lines(
+            node, depth, TRAILING_COMMA_FEATURES
+        )
+    return Preformatted(
+        name=node.name,
+        depth=depth,
+        digest=definition_digest(node),
+        lines=lines,
+        trailing_comma_lines=trailing_comma_lines,
+        features=bool(_trailing_comma_features(node)),
+        names=names,
+    )
+
+
+def format_module(
+    root: ast.Module,
+    fragments: Optional[dict] = None,
+    fragment_key: Optional[Callable[[ast.AST], Optional[str]]] = None,
+) -> str:
+    """
+    Generates the formatted source of a module.
+
+    :param root: Module to generate the source of
+    :param fragments: Mapping of fragment keys and the lines of the definitions
+    :param fragment_key: Function returning the key of a definition, see emit_lines
+    :return: Formatted python source
+    """
+    return "".join(emit_lines(root, fragments, fragment_key))
+
+
+def write_module(root: ast.Module, path: str):
+    """
+    Writes the formatted source of a module into a file as it is generated.
+
+    :param root: Module to generate the source of
+    :param path: Path of the python file to write
+    """
+    with open(path, "w") as f:
+        f.writelines(emit_lines(root))
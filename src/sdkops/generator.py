@@ -1,68 +1,77 @@
 import ast
+import copy
+import keyword
+import pickle
 import re
 from typing import Any
-from sdkops.openapi import APISpec, APISpecPathOperation
+from sdkops.openapi import (
+    APISpec,
+    APISpecPathOperation,
+    APISpecPathOperationContent,
+    APISpecPathOperationResponse,
+    path_pattern_to_snake_case,
+)
 from sdkops.json_schema import (
     case_snake_to_pascal,
     to_ast as schema_to_ast,
     schema_type_to_py_type,
     ast_create_annotation,
-    schema_resolve_ref,
+    ast_create_forward_ref,
+    ast_create_alias,
+    schema_collect_refs,
+    ast_class_structure_hash,
+    RefResolver,
+    ClassRegistry,
+    ast_rename_annotations,
+    ast_decode_union,
     find_default_value_from_types,
 )
+from sdkops.emitter import Preformatted, preformat
+from sdkops.parallel import WorkerPool, worker_spec
+from sdkops.profiler import Profiler, profile
 
 
-def to_ast(spec: APISpec, sdk_name: str, base_url: str | None):
+def to_ast(
+    spec: APISpec,
+    sdk_name: str,
+    base_url: str | None,
+    class_registry: ClassRegistry | None = None,
+    pool: WorkerPool | None = None,
+    profiler: Profiler | None = None,
+    asynchronous: bool = False,
+    models: str = "dict",
+):
     # import statements
-    import_stmt = ast.Import(names=[ast.alias("httpx")])
+    stream_arrays = streams_json_arrays(spec)
+    import_stmts = ast_generate_client_imports(stream_arrays, asynchronous)
 
     # json schemas to python classes
-    schema_class_defs: list[ast.ClassDef] = []
-    for path_item in spec.paths:
-        for operation in path_item.operations:
-            if operation.request_body is not None:
-                for content in operation.request_body.contents:
-                    if content.schema:
-                        combined_schema = {
-                            **content.schema,
-                            **{"components": spec.schema_dict["components"]},
-                        }
-                        class_defs = schema_to_ast(
-                            f"{sdk_name}_{content.get_id()}", combined_schema
-                        )
-                        if isinstance(class_defs, list):
-                            schema_class_defs.extend(class_defs)
-                        if isinstance(class_defs, ast.AnnAssign):
-                            schema_class_defs.append(class_defs)
-
-            for response in operation.responses:
-                for content in response.contents:
-                    if content.schema:
-                        combined_schema = {
-                            **content.schema,
-                            **{"components": spec.schema_dict["components"]},
-                        }
-                        class_defs = schema_to_ast(
-                            f"{sdk_name}_{content.get_id()}", combined_schema
-                        )
-                        if isinstance(class_defs, list):
-                            schema_class_defs.extend(class_defs)
-                        if isinstance(class_defs, ast.AnnAssign):
-                            schema_class_defs.append(class_defs)
+    schema_class_defs, component_class_names = ast_generate_schema_defs(
+        spec, sdk_name, class_registry, pool, profiler, models
+    )
 
     # path operations as sdk class methods
-    sdk_class_def = ast_generate_sdk_class(sdk_name=sdk_name, base_url=base_url)
-    for path_item in spec.paths:
-        for operation in path_item.operations:
-            method_def = ast_generate_class_method(
-                path_item.pattern, operation, sdk_name, spec
-            )
-            sdk_class_def.body[0].body.append(method_def)
+    sdk_class_def = ast_generate_sdk_class(
+        sdk_name=sdk_name,
+        base_url=base_url,
+        asynchronous=asynchronous,
+        stream_arrays=stream_arrays,
+    )
+    for operation_method_defs in ast_generate_class_methods(
+        spec,
+        sdk_name,
+        component_class_names,
+        pool,
+        profiler,
+        asynchronous,
+        models,
+    ):
+        sdk_class_def.body[0].body.extend(operation_method_defs)
 
     # sdk assignment
     sdk_assign = ast.parse(f"{sdk_name} = {case_snake_to_pascal(sdk_name)}()")
 
-    body = [import_stmt]
+    body = [*import_stmts]
     body.extend(schema_class_defs)
     body.append(sdk_class_def)
     body.append(sdk_assign)
@@ -71,49 +80,980 @@ def to_ast(spec: APISpec, sdk_name: str, base_url: str | None):
     return root
 
 
-def ast_generate_sdk_class(sdk_name: str, base_url: str):
+def to_package_ast(
+    spec: APISpec,
+    sdk_name: str,
+    base_url: str | None,
+    group_by: str = "tag",
+    class_registry: ClassRegistry | None = None,
+    pool: WorkerPool | None = None,
+    profiler: Profiler | None = None,
+    asynchronous: bool = False,
+    models: str = "dict",
+) -> dict[str, ast.Module]:
+    """
+    Generates the modules of an sdk package. The schema classes go to a models module,
+    the base sdk class to a client module and the operations to one module per tag
+    or path prefix. The __init__ module imports the others on their first access.
+
+    :param group_by: Either "tag" or "path", operations without tags are grouped by path
+    :param pool: Worker processes to generate the operations and classes with, they
+        come laid out as Preformatted nodes of the emitter then
+    :param profiler: Profiler to measure each schema and operation with, unless they
+        are generated in worker processes
+    :param asynchronous: Whether to generate the client on httpx.AsyncClient, with
+        async operation methods
+    :param models: Either "dict" for model classes that subclass dict or "slots" for
+        slotted ones
+    :return: Dictionary of module names and ast nodes of the modules
+    """
+    schema_class_defs, component_class_names = ast_generate_schema_defs(
+        spec, sdk_name, class_registry, pool, profiler, models
+    )
+    model_names = collect_defined_names(schema_class_defs)
+
+    sdk_class_name = case_snake_to_pascal(sdk_name)
+    client_class_name = f"{sdk_class_name}Client"
+    stream_arrays = streams_json_arrays(spec)
+    client_module = ast_generate_sdk_class(
+        sdk_name=sdk_name,
+        base_url=base_url,
+        asynchronous=asynchronous,
+        stream_arrays=stream_arrays,
+    )
+    client_module.body[0].name = client_class_name
+
+    # path operations as methods of the group classes
+    group_method_defs: dict[str, list[ast.stmt]] = {}
+    method_defs = iter(
+        ast_generate_class_methods(
+            spec,
+            sdk_name,
+            component_class_names,
+            pool,
+            profiler,
+            asynchronous,
+            models,
+        )
+    )
+    for path_item in spec.paths:
+        for operation in path_item.operations:
+            group = operation_group_name(path_item.pattern, operation, group_by)
+            group_method_defs.setdefault(group, []).extend(next(method_defs))
+
+    modules: dict[str, ast.Module] = {
+        "models": ast.Module(body=schema_class_defs, type_ignores=[]),
+        "_client": ast.Module(
+            body=[
+                *ast_generate_client_imports(stream_arrays, asynchronous),
+                client_module,
+            ],
+            type_ignores=[],
+        ),
+    }
+    group_class_names: dict[str, str] = {}
+    for group, method_defs in group_method_defs.items():
+        group_class_names[group] = case_snake_to_pascal(f"{sdk_name}_{group}_api")
+        body = [
+            ast.ImportFrom(
+                module="_client", names=[ast.alias(client_class_name)], level=1
+            )
+        ]
+        if any(method_def.name.startswith("iter_") for method_def in method_defs):
+            body.extend(ast_generate_iter_imports(asynchronous))
+        used_model_names = sorted(collect_used_names(method_defs) & model_names)
+        if used_model_names:
+            body.append(
+                ast.ImportFrom(
+                    module="models",
+                    names=[ast.alias(name) for name in used_model_names],
+                    level=1,
+                )
+            )
+        body.append(
+            ast.ClassDef(
+                name=group_class_names[group],
+                bases=[ast.Name(id=client_class_name, ctx=ast.Load())],
+                keywords=[],
+                decorator_list=[],
+                type_params=[],
+                body=method_defs,
+            )
+        )
+        modules[group] = ast.Module(body=body, type_ignores=[])
+
+    # a class with every operation, for the ones that use most of the api
+    modules["_sdk"] = ast.parse(
+        "".join(
+            f"from .{group} import {class_name}\n"
+            for group, class_name in group_class_names.items()
+        )
+        + f"class {sdk_class_name}({', '.join(group_class_names.values()) or client_class_name}):\n"
+        + "    pass\n"
+        # the instance a single module sdk has too, created on its first access
+        + f"{sdk_name} = {sdk_class_name}()\n"
+    )
+
+    lazy_attributes = {
+        sdk_class_name: "_sdk",
+        sdk_name: "_sdk",
+        client_class_name: "_client",
+    }
+    for group, class_name in group_class_names.items():
+        lazy_attributes[class_name] = group
+    modules["__init__"] = ast_generate_package_init(
+        ["models", *group_class_names], lazy_attributes
+    )
+
+    return modules
+
+
+def ast_generate_package_init(
+    submodules: list[str], lazy_attributes: dict[str, str]
+) -> ast.Module:
     return ast.parse(
         source=f"""
-class {case_snake_to_pascal(sdk_name)}:
-    def __init__(self):
-        self.client = httpx.Client(
-            base_url="{base_url}",
-            headers={{'user-agent': '{sdk_name}', 'accept': 'application/json'}},
-            timeout=10,
+import importlib
+
+_lazy_submodules = {tuple(submodules)!r}
+_lazy_attributes = {lazy_attributes!r}
+
+__all__ = {[*submodules, *lazy_attributes]!r}
+
+
+def __getattr__(name: str):
+    if name in _lazy_submodules:
+        value = importlib.import_module(f".{{name}}", __name__)
+    elif name in _lazy_attributes:
+        module = importlib.import_module(f".{{_lazy_attributes[name]}}", __name__)
+        value = getattr(module, name)
+    else:
+        raise AttributeError(f"module {{__name__!r}} has no attribute {{name!r}}")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return __all__
+"""
     )
 
-    def auth(self, scheme: str, value: str):
-        self.client.headers['authorization'] = f"{{scheme}} {{value}}"
 
-    def deauth(self):
-        self.client.headers.pop('authorization', None)
+def ast_generate_schema_defs(
+    spec: APISpec,
+    sdk_name: str,
+    class_registry: ClassRegistry | None = None,
+    pool: WorkerPool | None = None,
+    profiler: Profiler | None = None,
+    models: str = "dict",
+) -> tuple[list[ast.stmt], dict[str, str]]:
+    """
+    Generates the classes of the component schemas and operation contents, in the
+    worker processes of the pool if there is one.
+
+    :param models: Either "dict" or "slots", see json_schema.to_ast
+
+    :return: List of the definitions and the class names of the component refs
+    """
+    if class_registry is None:
+        class_registry = ClassRegistry()
+
+    resolver = spec.resolver
+    component_class_names = collect_component_class_names(spec.schema_dict, sdk_name)
+
+    # component schemas to python classes, each emitted once and dependencies first.
+    # components that aren't emitted yet, because of cycles, are forward references.
+    schema_class_defs: list[ast.stmt] = []
+    component_refs = sort_component_refs(resolver, component_class_names)
+    if pool is not None:
+        return ast_generate_schema_defs_in_pool(
+            spec,
+            sdk_name,
+            class_registry,
+            pool,
+            component_refs,
+            component_class_names,
+            models,
+        )
+    ref_class_names = {
+        ref: ast_create_forward_ref(class_name)
+        for ref, class_name in component_class_names.items()
+    }
+    for ref in component_refs:
+        with profile(profiler, "schema", ref):
+            schema, _trace = resolver.resolve(ref)
+            class_defs = schema_to_ast(
+                component_root_name(sdk_name, ref),
+                schema,
+                resolver,
+                ref_class_names,
+                class_registry,
+                models,
+                from_dict=True,
+            )
+        schema_class_defs.extend(class_defs)
+        ref_class_names[ref] = class_registry.resolve_name(component_class_names[ref])
+
+    # operation contents to python classes, or aliases of the component classes
+    for path_item in spec.paths:
+        for operation in path_item.operations:
+            with profile(profiler, "operation", operation.operation_id):
+                for content in operation_contents(operation):
+                    schema_class_defs.extend(
+                        ast_generate_content_defs(
+                            content,
+                            sdk_name,
+                            resolver,
+                            ref_class_names,
+                            class_registry,
+                            models,
+                        )
+                    )
+
+    return schema_class_defs, component_class_names
+
+
+def ast_generate_schema_defs_in_pool(
+    spec: APISpec,
+    sdk_name: str,
+    class_registry: ClassRegistry,
+    pool: WorkerPool,
+    component_refs: list[str],
+    component_class_names: dict[str, str],
+    models: str = "dict",
+) -> tuple[list[ast.stmt], dict[str, str]]:
+    """
+    Generates the classes of the component schemas and operation contents in the
+    worker processes, with the same result as ast_generate_schema_defs. Each component
+    and operation is generated with a registry of its own, merging them in order
+    registers their classes as a serial generation would.
+
+    :param component_refs: Component refs in the order of their dependencies
+    :return: List of the definitions and the class names of the component refs
+    """
+    resolver = spec.resolver
+    schema_class_defs: list[ast.stmt] = []
+
+    # the components a component refers to are either emitted before it, by the
+    # names merge_schema_defs renames to the classes they merge into, or after it
+    positions = {ref: index for index, ref in enumerate(component_refs)}
+    component_jobs = []
+    for index, ref in enumerate(component_refs):
+        schema, _trace = resolver.resolve(ref)
+        ref_class_names = {}
+        for dep in collect_reachable_component_refs(
+            resolver, schema, component_class_names
+        ):
+            class_name = component_class_names[dep]
+            if positions[dep] >= index:
+                class_name = ast_create_forward_ref(class_name)
+            ref_class_names[dep] = class_name
+        component_jobs.append((ref, ref_class_names))
+    for result in pool.map(
+        _generate_component_defs_job, component_jobs, sdk_name, models
+    ):
+        schema_class_defs.extend(merge_schema_defs(class_registry, *result))
+
+    ref_class_names = {
+        ref: class_registry.resolve_name(class_name)
+        for ref, class_name in component_class_names.items()
+    }
+    for result in pool.map(
+        _generate_content_defs_job,
+        operation_indices(spec),
+        sdk_name,
+        ref_class_names,
+        models,
+    ):
+        schema_class_defs.extend(merge_schema_defs(class_registry, *result))
+
+    return schema_class_defs, component_class_names
+
+
+def _generate_component_defs_job(
+    jobs: list[tuple[str, dict[str, str]]], sdk_name: str, models: str = "dict"
+) -> list[tuple]:
+    spec = worker_spec()
+    result = []
+    for ref, ref_class_names in jobs:
+        schema, _trace = spec.resolver.resolve(ref)
+        class_registry = ClassRegistry()
+        class_defs = schema_to_ast(
+            component_root_name(sdk_name, ref),
+            schema,
+            spec.resolver,
+            ref_class_names,
+            class_registry,
+            models,
+            from_dict=True,
+        )
+        result.append(preformat_schema_defs(class_defs, class_registry))
+    return result
+
+
+def _generate_content_defs_job(
+    indices: list[tuple[int, int]],
+    sdk_name: str,
+    ref_class_names: dict[str, str],
+    models: str = "dict",
+) -> list[tuple]:
+    spec = worker_spec()
+    result = []
+    for path_index, operation_index in indices:
+        operation = spec.paths[path_index].operations[operation_index]
+        class_registry = ClassRegistry()
+        definitions = []
+        for content in operation_contents(operation):
+            definitions.extend(
+                ast_generate_content_defs(
+                    content,
+                    sdk_name,
+                    spec.resolver,
+                    ref_class_names,
+                    class_registry,
+                    models,
+                )
+            )
+        result.append(preformat_schema_defs(definitions, class_registry))
+    return result
+
+
+def preformat_schema_defs(
+    definitions: list[ast.stmt], class_registry: ClassRegistry
+) -> tuple[list[ast.stmt], list[tuple], set[str]]:
+    """
+    Lays out the classes generated in a worker process, and describes the classes of
+    its registry for merge_schema_defs.
+
+    :param definitions: Definitions generated with the registry
+    :param class_registry: Registry of the worker process
+    :return: Definitions with the classes laid out, the name, structure hash, used
+        names and pickled ast of each registered class, and the names of the aliases
+    """
+    registered = [
+        (
+            class_def.name,
+            key,
+            frozenset(collect_used_names([class_def])),
+            pickle.dumps(class_def),
+        )
+        for class_def, key in class_registry.registered
+    ]
+    definitions = [
+        preformat(node, 0) if isinstance(node, ast.ClassDef) else node
+        for node in definitions
+    ]
+    return definitions, registered, set(class_registry.aliases)
+
+
+def merge_schema_defs(
+    class_registry: ClassRegistry,
+    definitions: list[ast.stmt],
+    registered: list[tuple],
+    local_aliases: set[str],
+) -> list[ast.stmt]:
+    """
+    Registers the classes a worker process generated with a registry of its own in
+    their order, as if they were generated with the given registry. Classes identical
+    to one registered before become aliases of it, and the classes referring to those
+    are renamed and laid out again.
+
+    :param class_registry: Registry of the whole generation
+    :param definitions: Definitions returned by preformat_schema_defs
+    :param registered: Classes of the worker registry, see preformat_schema_defs
+    :param local_aliases: Names the worker registry made aliases
+    :return: Definitions as a serial generation would have them
+    """
+    aliases = class_registry.aliases
+    renamed: dict[str, ast.ClassDef] = {}
+    canonical_names: dict[str, str] = {}
+    for class_name, key, names, class_def_data in registered:
+        if any(name in aliases for name in names):
+            class_def = pickle.loads(class_def_data)
+            if ast_rename_annotations(class_def, aliases):
+                renamed[class_name] = class_def
+                key = ast_class_structure_hash(class_def)
+        canonical_name = class_registry.register_name(class_name, key)
+        if canonical_name is not None:
+            canonical_names[class_name] = canonical_name
+
+    result: list[ast.stmt] = []
+    for node in definitions:
+        if isinstance(node, Preformatted) and node.name in canonical_names:
+            node = ast_create_alias(node.name, canonical_names[node.name])
+        elif isinstance(node, Preformatted) and node.name in renamed:
+            node = renamed[node.name]
+        elif isinstance(node, ast.Assign) and node.targets[0].id in local_aliases:
+            node = ast_create_alias(
+                node.targets[0].id, canonical_names[node.targets[0].id]
+            )
+        elif isinstance(node, ast.AnnAssign) and aliases:
+            # the given definitions are left as they are to be reused by later merges
+            renamed_node = copy.deepcopy(node)
+            if ast_rename_annotations(renamed_node, aliases):
+                node = renamed_node
+        result.append(node)
+    return result
+
+
+def ast_generate_class_methods(
+    spec: APISpec,
+    sdk_name: str,
+    component_class_names: dict[str, str],
+    pool: WorkerPool | None = None,
+    profiler: Profiler | None = None,
+    asynchronous: bool = False,
+    models: str = "dict",
+) -> list[list[ast.stmt]]:
+    """
+    Generates the sdk class methods of the operations. In the worker processes of the
+    pool if there is one, where they are laid out too.
+
+    :param asynchronous: Whether to generate async methods for httpx.AsyncClient
+    :param models: Either "dict" or "slots", slotted request bodies are sent as dicts
+    :return: Lists of the method definitions of each operation, in the order of the
+        operations. Operations that respond with a json array have an iter_ method too
+    """
+    if pool is not None:
+        return pool.map(
+            _generate_class_methods_job,
+            operation_indices(spec),
+            sdk_name,
+            component_class_names,
+            asynchronous,
+            models,
+        )
+    method_defs = []
+    for path_item in spec.paths:
+        for operation in path_item.operations:
+            with profile(profiler, "operation", operation.operation_id):
+                method_defs.append(
+                    ast_generate_operation_methods(
+                        path_item.pattern,
+                        operation,
+                        sdk_name,
+                        spec,
+                        component_class_names,
+                        asynchronous,
+                        models,
+                    )
+                )
+    return method_defs
+
+
+def _generate_class_methods_job(
+    indices: list[tuple[int, int]],
+    sdk_name: str,
+    component_class_names: dict[str, str],
+    asynchronous: bool = False,
+    models: str = "dict",
+) -> list[list[Preformatted]]:
+    spec = worker_spec()
+    result = []
+    for path_index, operation_index in indices:
+        method_defs = ast_generate_operation_methods(
+            spec.paths[path_index].pattern,
+            spec.paths[path_index].operations[operation_index],
+            sdk_name,
+            spec,
+            component_class_names,
+            asynchronous,
+            models,
+        )
+        result.append(
+            [
+                preformat(method_def, 1, frozenset(collect_used_names([method_def])))
+                for method_def in method_defs
+            ]
+        )
+    return result
+
+
+def operation_indices(spec: APISpec) -> list[tuple[int, int]]:
+    # operations are sent to the worker processes by their position in the spec
+    return [
+        (path_index, operation_index)
+        for path_index, path_item in enumerate(spec.paths)
+        for operation_index in range(len(path_item.operations))
+    ]
+
+
+def operation_contents(
+    operation: APISpecPathOperation,
+) -> list[APISpecPathOperationContent]:
+    contents = []
+    if operation.request_body is not None:
+        contents.extend(operation.request_body.contents)
+    for response in operation.responses:
+        contents.extend(response.contents)
+    return [content for content in contents if content.schema]
+
+
+def operation_group_name(
+    pattern: str, operation: APISpecPathOperation, group_by: str
+) -> str:
+    if group_by == "tag" and operation.tags:
+        text = operation.tags[0]
+    else:
+        text = pattern.strip("/").split("/")[0]
+    name = re.sub(r"\W+", "_", path_pattern_to_snake_case(text)).strip("_") or "home"
+    if name[0].isdigit():
+        name = f"api_{name}"
+    if keyword.iskeyword(name) or name == "models":
+        name = f"{name}_api"
+    return name
+
+
+def collect_defined_names(body: list[ast.stmt]) -> set[str]:
+    result: set[str] = set()
+    for node in body:
+        if isinstance(node, (ast.ClassDef, Preformatted)):
+            result.add(node.name)
+        elif isinstance(node, ast.Assign):
+            result.update(x.id for x in node.targets if isinstance(x, ast.Name))
+        elif isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+            result.add(node.target.id)
+    return result
+
+
+def collect_used_names(nodes: list[ast.AST]) -> set[str]:
+    # annotations are names like "list[Item]" or strings of forward references
+    result: set[str] = set()
+    for node in nodes:
+        if isinstance(node, Preformatted):
+            result.update(node.names)
+            continue
+        for child in ast.walk(node):
+            if isinstance(child, ast.Name):
+                result.update(re.findall(r"[A-Za-z_]\w*", child.id))
+            elif isinstance(child, ast.Constant) and isinstance(child.value, str):
+                result.update(re.findall(r"[A-Za-z_]\w*", child.value))
+    return result
+
+
+def component_root_name(sdk_name: str, ref: str) -> str:
+    name = ref.split("/")[-1].replace("~1", "/").replace("~0", "~")
+    return sdk_name + "_" + re.sub(r"\W", "_", name)
+
+
+def collect_component_class_names(
+    document: dict[str, Any], sdk_name: str
+) -> dict[str, str]:
+    """
+    Maps refs of the component schemas that become classes to their class names.
+
+    :param document: The whole openapi schema
+    :param sdk_name: Name of the sdk, used as the prefix of class names
+    :return: Dictionary of "#/components/schemas/{name}" refs and class names
+    """
+    result: dict[str, str] = {}
+    schemas = document.get("components", {}).get("schemas", {})
+    for name, schema in schemas.items():
+        if schema.get("type") == "object" and "properties" in schema:
+            ref = f"#/components/schemas/{name.replace('~', '~0').replace('/', '~1')}"
+            result[ref] = case_snake_to_pascal(component_root_name(sdk_name, ref))
+    return result
+
+
+def sort_component_refs(
+    resolver: RefResolver, component_class_names: dict[str, str]
+) -> list[str]:
+    """
+    Orders component refs so that every component comes after the ones it refers to.
+    Refs to components that don't become classes are followed through.
+
+    :param resolver: Resolver of the openapi schema
+    :param component_class_names: Refs of the component classes
+    :return: List of component refs
+    """
+    result: list[str] = []
+    visited: set[str] = set()
+    for root_ref in component_class_names:
+        if root_ref in visited:
+            continue
+        visited.add(root_ref)
+        stack = [(root_ref, iter(collect_component_deps(resolver, root_ref)))]
+        while stack:
+            ref, deps = stack[-1]
+            dep = next(deps, None)
+            if dep is None:
+                stack.pop()
+                if ref in component_class_names:
+                    result.append(ref)
+            elif dep not in visited:
+                visited.add(dep)
+                stack.append((dep, iter(collect_component_deps(resolver, dep))))
+    return result
+
+
+def collect_reachable_component_refs(
+    resolver: RefResolver, schema: Any, component_class_names: dict[str, str]
+) -> set[str]:
+    """
+    Collects the component refs of a schema, following the refs to schemas that
+    aren't components through, the way they are inlined.
+    """
+    result: set[str] = set()
+    visited: set[str] = set()
+    stack = schema_collect_refs(schema)
+    while stack:
+        ref = stack.pop()
+        if ref in visited:
+            continue
+        visited.add(ref)
+        if ref in component_class_names:
+            result.add(ref)
+            continue
+        resolved, _trace = resolver.resolve(ref)
+        if resolved is not None:
+            stack.extend(schema_collect_refs(resolved))
+    return result
+
+
+def collect_component_deps(resolver: RefResolver, ref: str) -> list[str]:
+    schema, _trace = resolver.resolve(ref)
+    if schema is None:
+        raise ValueError(f"failed to resolve ref. {_trace}")
+    return schema_collect_refs(schema)
+
+
+def ast_generate_content_defs(
+    content: APISpecPathOperationContent,
+    sdk_name: str,
+    resolver: RefResolver,
+    component_class_names: dict[str, str],
+    class_registry: ClassRegistry | None = None,
+    models: str = "dict",
+) -> list[ast.stmt]:
+    """
+    Generates the type definitions of a request or response content. Contents that
+    refer to a component class get an alias of it instead of a class of their own.
+    """
+    name = f"{sdk_name}_{content.get_id()}"
+    shared_name = component_class_names.get(content.schema.get("$ref"))
+    if shared_name == case_snake_to_pascal(name):
+        return []
+    if shared_name is not None:
+        return [ast_create_alias(case_snake_to_pascal(name), shared_name)]
+
+    class_defs = schema_to_ast(
+        name,
+        content.schema,
+        resolver,
+        component_class_names,
+        class_registry,
+        models,
+        from_dict=True,
+    )
+    if isinstance(class_defs, ast.AnnAssign):
+        class_defs = [class_defs]
+    if not isinstance(class_defs, list):
+        return []
+    class_name = case_snake_to_pascal(name)
+    definitions = []
+    for class_def in class_defs:
+        if not isinstance(class_def, ast.AnnAssign):
+            definitions.append(class_def)
+            continue
+        # the content is an alias of its type, unless its name is the class of its
+        # items or first member already, or an alias of the class they merge into
+        if class_name in collect_defined_names(class_defs):
+            definitions.append(class_def)
+        else:
+            definitions.append(
+                ast.Assign(
+                    targets=[ast.Name(id=class_name, ctx=ast.Store())],
+                    value=class_def.annotation,
+                    lineno=1,
+                )
+            )
+    return definitions
+
+
+def content_type_name(
+    content: APISpecPathOperationContent,
+    sdk_name: str,
+    component_class_names: dict[str, str],
+) -> str:
+    if content.schema:
+        shared_name = component_class_names.get(content.schema.get("$ref"))
+        if shared_name is not None:
+            return shared_name
+    return case_snake_to_pascal(f"{sdk_name}_{content.get_id()}")
+
+
+def ast_generate_client_imports(
+    stream_arrays: bool = False, asynchronous: bool = False
+) -> list[ast.stmt]:
+    """
+    :param stream_arrays: Whether the sdk has iter_ methods, they stream json arrays
+        with the decoder of the json module
+    :param asynchronous: Whether the iter_ methods are async generators
+    """
+    imports = ast.parse("import httpx").body
+    if stream_arrays:
+        imports = [
+            *ast.parse("import json").body,
+            *imports,
+            *ast_generate_iter_imports(asynchronous),
+        ]
+    # the sdk decodes json with orjson when it's installed
+    imports.extend(
+        ast.parse(
+            """
+try:
+    import orjson as _json
+except ImportError:
+    import json as _json
+"""
+        ).body
+    )
+    return imports
+
+
+def ast_generate_iter_imports(asynchronous: bool = False) -> list[ast.stmt]:
+    # the names the annotations of the iter_ methods refer to
+    iterator = "AsyncIterator" if asynchronous else "Iterator"
+    return ast.parse(f"from typing import Any, {iterator}").body
+
+
+# decodes the json arrays iter_ methods stream, emitted after the sdk class
+JSON_ARRAY_STREAM_SOURCE = """
+class _JSONArrayStream:
+    '''
+    Decodes the items of a json array as its text arrives in chunks. Only the text
+    of the items that aren't decoded yet is kept.
+    '''
+
+    def __init__(self):
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.position = 0
+        self.chunks = []
+        self.chunks_size = 0
+        # an item that doesn't fit in the buffer is decoded again once the buffer
+        # doubles, which keeps decoding it linear in its size
+        self.wanted_size = 0
+        self.expected = "["
+
+    def feed(self, chunk: str, final: bool = False) -> list:
+        self.chunks.append(chunk)
+        self.chunks_size += len(chunk)
+        if len(self.buffer) - self.position + self.chunks_size < self.wanted_size:
+            return []
+        self.buffer = self.buffer[self.position :] + "".join(self.chunks)
+        self.position = 0
+        self.chunks = []
+        self.chunks_size = 0
+        items = []
+        while self.expected:
+            while self.position < len(self.buffer) and self.buffer[self.position] in " \\t\\n\\r":
+                self.position += 1
+            if self.position == len(self.buffer):
+                break
+            char = self.buffer[self.position]
+            if self.expected == "[":
+                if char != "[":
+                    raise ValueError("The response is not a json array.")
+                self.position += 1
+                self.expected = "item or ]"
+            elif char == "]" and self.expected != "item":
+                self.position += 1
+                self.expected = None
+            elif self.expected == ", or ]":
+                if char != ",":
+                    raise ValueError(f"Expected ',' or ']' but found '{char}' in the json array.")
+                self.position += 1
+                self.expected = "item"
+            else:
+                try:
+                    item, end = self.decoder.raw_decode(self.buffer, self.position)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    self.wanted_size = 2 * (len(self.buffer) - self.position)
+                    break
+                # a number may go on in the next chunk until a delimiter follows it
+                if end == len(self.buffer) or self.buffer[end] not in " \\t\\n\\r,]":
+                    break
+                items.append(item)
+                self.position = end
+                self.wanted_size = 0
+                self.expected = ", or ]"
+        if final and self.expected:
+            raise ValueError("The json array of the response ends early.")
+        return items
+
+    def close(self) -> list:
+        # the whitespace ends a number at the end of the array
+        self.wanted_size = 0
+        return self.feed(" ", final=True)
+"""
+
 
+def ast_generate_sdk_class(
+    sdk_name: str,
+    base_url: str,
+    asynchronous: bool = False,
+    stream_arrays: bool = False,
+):
+    """
+    Generates the sdk class that holds the http client. Its constructor takes the
+    connection pool limits, timeouts per phase, http/2 and a transport for the client
+    it creates, or a client to use instead, and the function to decode json with.
+    A client passed in is used as it is, it needs a base_url of its own.
+
+    :param asynchronous: Whether to generate the class on httpx.AsyncClient
+    :param stream_arrays: Whether to add the method that iter_ methods stream json
+        arrays with, and the _JSONArrayStream class after the sdk class
+    """
+    if asynchronous:
+        client_class, transport_class = "AsyncClient", "AsyncBaseTransport"
+        async_, await_, a = "async ", "await ", "a"
+        lifecycle = """
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        if not self.client.is_closed:
+            await self.client.aclose()
+
+    async def warm_up(self, connections: int = 1, path: str = "/"):
+        import asyncio
+
+        if connections < 1:
+            return
+
+        await asyncio.gather(*(self._warm_up_request(path) for _ in range(connections)))
+"""
+    else:
+        client_class, transport_class = "Client", "BaseTransport"
+        async_, await_, a = "", "", ""
+        lifecycle = """
     def _cleanup(self):
         if not self.client.is_closed:
             self.client.close()
 
-    def _send_request(self, request: httpx.Request) -> httpx.Response:
+    def warm_up(self, connections: int = 1, path: str = "/"):
+        from concurrent.futures import ThreadPoolExecutor
+
+        if connections < 1:
+            return
+
+        with ThreadPoolExecutor(connections) as executor:
+            list(executor.map(self._warm_up_request, [path] * connections))
+"""
+    iter_method = ""
+    if stream_arrays:
+        iter_method = f"""
+    {async_}def _iter_json_array(self, request: httpx.Request, status_code: int, decode=None):
+        response = {await_}self.client.send(request, stream=True)
         try:
-            response = self.client.send(request)
+            if response.status_code != status_code:
+                {await_}response.{a}read()
+                raise httpx.HTTPStatusError(
+                    f"Expected status code {{status_code}} but the response to {{request.url}} has {{response.status_code}}.",
+                    request=request,
+                    response=response,
+                )
+            stream = _JSONArrayStream()
+            {async_}for chunk in response.{a}iter_text():
+                for item in stream.feed(chunk):
+                    yield item if decode is None else decode(item)
+            for item in stream.close():
+                yield item if decode is None else decode(item)
+        finally:
+            {await_}response.{a}close()
+"""
+    root = ast.parse(
+        source=f"""
+class {case_snake_to_pascal(sdk_name)}:
+    _json_headers = {{'accept': 'application/json'}}
+    _text_headers = {{'accept': 'text/plain'}}
+    _json_body_headers = {{'accept': 'application/json', 'content-type': 'application/json'}}
+    _text_body_headers = {{'accept': 'text/plain', 'content-type': 'application/json'}}
+    _operation_headers = ('_json_headers', '_text_headers', '_json_body_headers', '_text_body_headers')
+
+    def __init__(
+        self,
+        base_url: str = "{base_url}",
+        timeout: httpx.Timeout | float | None = 10,
+        limits: httpx.Limits | None = None,
+        http2: bool = False,
+        transport: httpx.{transport_class} | None = None,
+        client: httpx.{client_class} | None = None,
+        json_loads=None,
+        json_dumps=None,
+    ):
+        if client is None:
+            client = httpx.{client_class}(
+                base_url=base_url,
+                headers={{'user-agent': '{sdk_name}', 'accept': 'application/json'}},
+                timeout=timeout,
+                limits=limits or httpx.Limits(max_connections=100, max_keepalive_connections=20),
+                http2=http2,
+                transport=transport,
+            )
+        self.client = client
+        self._json_loads = json_loads or _json.loads
+        self._json_dumps = json_dumps or _json.dumps
+
+    def auth(self, scheme: str, value: str):
+        # the headers of this instance take the authorization, the client may be shared
+        for name in self._operation_headers:
+            setattr(self, name, {{**getattr(type(self), name), 'authorization': f"{{scheme}} {{value}}"}})
+
+    def deauth(self):
+        for name in self._operation_headers:
+            vars(self).pop(name, None)
+{lifecycle}
+    {async_}def _warm_up_request(self, path: str):
+        try:
+            {await_}self.client.head(path)
+        except httpx.HTTPError:
+            pass
+
+    {async_}def _send_request(self, request: httpx.Request) -> httpx.Response:
+        try:
+            response = {await_}self.client.send(request)
             return response
         except httpx.HTTPError as e:
             message = f"An unexpected error occurred while handling request to {{e.request.url}}. {{e}}"
             return httpx.Response(status_code=500, json={{'error': {{'code': 'unexpected', 'message': message}}}})
-"""
+{iter_method}"""
     )
+    if stream_arrays:
+        root.body.extend(ast.parse(JSON_ARRAY_STREAM_SOURCE).body)
+    return root
 
 
 def ast_generate_class_method(
-    pattern: str, operation: APISpecPathOperation, sdk_name: str, spec: APISpec
+    pattern: str,
+    operation: APISpecPathOperation,
+    sdk_name: str,
+    spec: APISpec,
+    component_class_names: dict[str, str] | None = None,
+    asynchronous: bool = False,
+    models: str = "dict",
 ):
     """
     Generates fully-typed function definitions to add to the generated sdk class.
 
     :param pattern: URL parh
     :param operation: APISpecPathOperation object
+    :param component_class_names: Refs of the component classes and their class names
+    :param asynchronous: Whether to generate an async function that awaits the request
+    :param models: Either "dict" or "slots", the object bodies are sent by to_dict
+        for slotted models
     :return: Ast node of a function definition
     """
 
+    if component_class_names is None:
+        component_class_names = {}
+
     # function name is the snake cased operation_id
     function_name = operation.operation_id
 
@@ -123,7 +1063,7 @@ def ast_generate_class_method(
         for content in response.contents:
             if "json" in content.media_type:
                 function_return_types.append(
-                    case_snake_to_pascal(f"{sdk_name}_{content.get_id()}")
+                    content_type_name(content, sdk_name, component_class_names)
                 )
             elif "text/plain" in content.media_type:
                 function_return_types.append("str")
@@ -136,18 +1076,14 @@ def ast_generate_class_method(
     if operation.request_body:
         for content in operation.request_body.contents:
             if "json" in content.media_type:
-                py_type = case_snake_to_pascal(f"{sdk_name}_{content.get_id()}")
+                py_type = content_type_name(content, sdk_name, component_class_names)
                 function_arguments.append(
                     ast.arg(arg="json", annotation=ast.Name(id=py_type, ctx=ast.Load()))
                 )
     # path and query parameters from parameters
     for parameter in operation.parameters:
         if parameter.kind == "path" or parameter.kind == "query":
-            combined_schema = {
-                **parameter.schema,
-                **{"components": spec.schema_dict["components"]},
-            }
-            py_types = collect_py_types_from_schema(combined_schema)
+            py_types = collect_py_types_from_schema(parameter.schema, spec.resolver)
             function_arguments.append(
                 ast.arg(arg=parameter.name, annotation=ast_create_annotation(py_types))
             )
@@ -168,23 +1104,35 @@ def ast_generate_class_method(
 
     # create function body
     function_body = []
-    if does_function_return_str:
-        # set accept header to plain text for text kind responses
-        function_body.append(ast.parse("self.client.headers['accept'] = 'text/plain'"))
-    # apply endpoint specific headers if specified
+    json_body_contents = []
+    if operation.request_body:
+        json_body_contents = [
+            content
+            for content in operation.request_body.contents
+            if "json" in content.media_type
+        ]
+    # headers of the operation are shared by its requests, the client headers are
+    # merged in by httpx, so neither of them is copied or changed here
+    operation_headers = "_text" if does_function_return_str else "_json"
+    operation_headers += "_body_headers" if json_body_contents else "_headers"
     function_body.append(
         ast.parse(
-            "headers_combined = self.client.headers if headers is None else {**self.client.headers, **headers}"
+            f"headers_combined = self.{operation_headers} if headers is None else {{**self.{operation_headers}, **headers}}"
         )
     )
     # build request call
     build_request_keywords = []
-    if operation.request_body:
-        for content in operation.request_body.contents:
-            if "json" in content.media_type:
-                build_request_keywords.append(
-                    ast.keyword(arg="json", value=ast.Name(id="json", ctx=ast.Load()))
-                )
+    # the body is encoded by the json_dumps of the sdk, dict models are dicts already
+    for content in json_body_contents[:1]:
+        body = "json"
+        if models == "slots" and is_object_schema(content.schema, spec):
+            body = "json.to_dict()"
+        build_request_keywords.append(
+            ast.keyword(
+                arg="content",
+                value=ast.parse(f"self._json_dumps({body})", mode="eval").body,
+            )
+        )
     query_params = [x.name for x in operation.parameters if x.kind == "query"]
     if len(query_params) > 0:
         build_request_keywords.append(
@@ -208,7 +1156,7 @@ def ast_generate_class_method(
         ast.Constant(value=operation.method),
         # either simply a url path or parameterized path pattern
         (
-            ast.parse('f"' + pattern + '"')
+            ast.parse('f"' + pattern + '"', mode="eval").body
             if len(re.findall(r"\{([^}]+)\}", pattern)) > 0
             else ast.Constant(value=pattern)
         ),
@@ -231,43 +1179,32 @@ def ast_generate_class_method(
     )
     function_body.append(request_var)
     # send request call
+    send_request_call = ast.Call(
+        func=ast.Attribute(
+            value=ast.Name(id="self", ctx=ast.Load()),
+            attr="_send_request",
+            ctx=ast.Load(),
+        ),
+        args=[ast.Name(id="request", ctx=ast.Load())],
+        keywords=[],
+    )
     response_var = ast.Assign(
         targets=[ast.Name(id="response", ctx=ast.Store())],
-        value=ast.Call(
-            func=ast.Attribute(
-                value=ast.Name(id="self", ctx=ast.Load()),
-                attr="_send_request",
-                ctx=ast.Load(),
-            ),
-            args=[ast.Name(id="request", ctx=ast.Load())],
-            keywords=[],
-        ),
+        value=ast.Await(value=send_request_call) if asynchronous else send_request_call,
         lineno=1,
     )
     function_body.append(response_var)
     if does_function_return_str:
-        function_return_statement = ast.Return(
-            value=ast.Attribute(
-                value=ast.Name(id="response", ctx=ast.Load()),
-                attr="text",
-                ctx=ast.Load(),
-            )
-        )
+        function_body.append(ast.parse("return response.text").body[0])
     else:
-        function_return_statement = ast.Return(
-            value=ast.Call(
-                func=ast.Attribute(
-                    value=ast.Name(id="response", ctx=ast.Load()),
-                    attr="json",
-                    ctx=ast.Load(),
-                ),
-                args=[],
-                keywords=[],
+        function_body.extend(
+            ast_generate_response_decoding(
+                operation, sdk_name, spec, component_class_names
             )
         )
-    function_body.append(function_return_statement)
 
-    return ast.FunctionDef(
+    function_def_class = ast.AsyncFunctionDef if asynchronous else ast.FunctionDef
+    return function_def_class(
         name=function_name,
         args=ast.arguments(
             args=function_arguments,
@@ -282,11 +1219,254 @@ def ast_generate_class_method(
     )
 
 
-def collect_py_types_from_schema(schema: dict[str, Any]):
+def ast_generate_operation_methods(
+    pattern: str,
+    operation: APISpecPathOperation,
+    sdk_name: str,
+    spec: APISpec,
+    component_class_names: dict[str, str] | None = None,
+    asynchronous: bool = False,
+    models: str = "dict",
+) -> list[ast.FunctionDef | ast.AsyncFunctionDef]:
+    """
+    Generates the method of an operation, followed by its iter_ method if it responds
+    with a json array, see ast_generate_iter_method.
+
+    :return: Ast nodes of the function definitions
+    """
+    method_def = ast_generate_class_method(
+        pattern,
+        operation,
+        sdk_name,
+        spec,
+        component_class_names,
+        asynchronous,
+        models,
+    )
+    iter_method_def = ast_generate_iter_method(
+        method_def, operation, sdk_name, spec, component_class_names or {}
+    )
+    return [method_def] if iter_method_def is None else [method_def, iter_method_def]
+
+
+def ast_generate_iter_method(
+    method_def: ast.FunctionDef | ast.AsyncFunctionDef,
+    operation: APISpecPathOperation,
+    sdk_name: str,
+    spec: APISpec,
+    component_class_names: dict[str, str],
+) -> ast.FunctionDef | ast.AsyncFunctionDef | None:
+    """
+    Generates a generator method that streams the json array an operation responds
+    with, and yields its items one at a time, decoded into their model if they are
+    objects. It takes the arguments of the operation method and builds the same
+    request.
+
+    :param method_def: Definition of the operation method
+    :return: Ast node of the function definition, None if the operation doesn't
+        respond with a json array
+    """
+    array_response = json_array_response(operation, spec)
+    if array_response is None:
+        return None
+    response, content = array_response
+
+    item_class_name = array_item_class_name(
+        content, sdk_name, spec, component_class_names
+    )
+    if item_class_name is not None:
+        item_type, decode = item_class_name, f"{item_class_name}.from_dict"
+    else:
+        # items that aren't objects are yielded as they are decoded
+        item_type, decode = "Any", "None"
+    iter_call = f"self._iter_json_array(request, {response.status_code}, {decode})"
+
+    iter_method_def = copy.deepcopy(method_def)
+    iter_method_def.name = f"iter_{method_def.name}"
+    # the headers and the request are the ones of the operation method
+    iter_method_def.body = iter_method_def.body[:2]
+    if isinstance(method_def, ast.AsyncFunctionDef):
+        iter_method_def.returns = ast.Constant(value=f"AsyncIterator[{item_type}]")
+        iter_method_def.body.extend(
+            ast.parse(f"async for item in {iter_call}:\n    yield item").body
+        )
+    else:
+        iter_method_def.returns = ast.Constant(value=f"Iterator[{item_type}]")
+        iter_method_def.body.extend(ast.parse(f"yield from {iter_call}").body)
+    return iter_method_def
+
+
+def json_array_response(
+    operation: APISpecPathOperation, spec: APISpec
+) -> tuple[APISpecPathOperationResponse, APISpecPathOperationContent] | None:
+    """
+    :return: The first successful response of an operation that is a json array, and
+        its content, None if it has none
+    """
+    for response in operation.responses:
+        if not response.status_code.startswith("2"):
+            continue
+        content = next((x for x in response.contents if "json" in x.media_type), None)
+        if content is None:
+            continue
+        schema = content.schema
+        if "$ref" in schema:
+            schema, _trace = spec.resolver.resolve(schema["$ref"])
+        if schema is not None and schema.get("type") == "array":
+            return response, content
+    return None
+
+
+def streams_json_arrays(spec: APISpec) -> bool:
+    """
+    :return: Whether any operation of the spec has an iter_ method
+    """
+    return any(
+        json_array_response(operation, spec) is not None
+        for path_item in spec.paths
+        for operation in path_item.operations
+    )
+
+
+def is_object_schema(schema: dict[str, Any], spec: APISpec) -> bool:
+    """
+    :return: Whether the schema, or the one its ref points to, is an object with
+        properties, which becomes a model class
+    """
+    seen_refs = set()
+    while "$ref" in schema and schema["$ref"] not in seen_refs:
+        seen_refs.add(schema["$ref"])
+        schema, _trace = spec.resolver.resolve(schema["$ref"])
+        if schema is None:
+            return False
+    return schema.get("type") == "object" and "properties" in schema
+
+
+def ast_generate_response_decoding(
+    operation: APISpecPathOperation,
+    sdk_name: str,
+    spec: APISpec,
+    component_class_names: dict[str, str],
+) -> list[ast.stmt]:
+    """
+    Generates the statements that decode the json of a response into the models of
+    its status code. Responses of other status codes, and the ones that aren't
+    objects or arrays of objects, are returned as they are decoded.
+
+    :return: Ast nodes of the statements, the last one returns
+    """
+    data = "self._json_loads(response.content)"
+    source = ""
+    for response in operation.responses:
+        for content in response.contents:
+            if "json" not in content.media_type:
+                continue
+            decoder = content_decoder(content, sdk_name, spec, component_class_names)
+            if decoder is not None:
+                source += f"if response.status_code == {response.status_code}:\n"
+                if decoder.count("{data}") > 1:
+                    # unions check the decoded json more than once
+                    source += f"    data = {data}\n"
+                    source += f"    return {decoder.format(data='data')}\n"
+                else:
+                    source += f"    return {decoder.format(data=data)}\n"
+            break
+    source += f"return {data}\n"
+    return ast.parse(source).body
+
+
+def content_decoder(
+    content: APISpecPathOperationContent,
+    sdk_name: str,
+    spec: APISpec,
+    component_class_names: dict[str, str],
+) -> str | None:
+    """
+    :return: Source of the expression that decodes the json "{data}" of a content into
+        its models, None if it isn't an object or an array of objects
+    """
+    if is_object_schema(content.schema, spec):
+        class_name = content_type_name(content, sdk_name, component_class_names)
+        return f"{class_name}.from_dict({{data}})"
+    item_class_name = array_item_class_name(
+        content, sdk_name, spec, component_class_names
+    )
+    if item_class_name is not None:
+        return f"[{item_class_name}.from_dict(item) for item in {{data}}]"
+    union_text = content_union_text(content, sdk_name, spec, component_class_names)
+    if union_text is not None:
+        return ast_decode_union(union_text, "{data}")
+    return None
+
+
+def content_union_text(
+    content: APISpecPathOperationContent,
+    sdk_name: str,
+    spec: APISpec,
+    component_class_names: dict[str, str],
+) -> str | None:
+    """
+    :return: Annotation of a content that is an anyOf, the way its type definition
+        names the types of its members, None if it isn't one
+    """
+    if "anyOf" not in content.schema:
+        return None
+    class_name = case_snake_to_pascal(f"{sdk_name}_{content.get_id()}")
+    types = []
+    object_count = 0
+    for schema in content.schema["anyOf"]:
+        if schema.get("$ref") in component_class_names:
+            types.append(component_class_names[schema["$ref"]])
+            continue
+        if "$ref" in schema:
+            schema, _trace = spec.resolver.resolve(schema["$ref"])
+            if schema is None:
+                return None
+        if schema.get("type") == "object":
+            # inline objects are named after the content, like the classes of them
+            types.append(class_name + (str(object_count + 1) if object_count else ""))
+            object_count += 1
+        elif "type" in schema:
+            types.append(schema_type_to_py_type(schema["type"]))
+    return " | ".join(types)
+
+
+def array_item_class_name(
+    content: APISpecPathOperationContent,
+    sdk_name: str,
+    spec: APISpec,
+    component_class_names: dict[str, str],
+) -> str | None:
+    """
+    :return: Class name of the items of a content that is an array of objects, None
+        if it isn't one
+    """
+    schema = content.schema
+    if "$ref" in schema:
+        schema, _trace = spec.resolver.resolve(schema["$ref"])
+        if schema is None:
+            return None
+    if schema.get("type") != "array" or not isinstance(schema.get("items"), dict):
+        return None
+    items = schema["items"]
+    if not is_object_schema(items, spec):
+        return None
+    if items.get("$ref") in component_class_names:
+        return component_class_names[items["$ref"]]
+    # the class of inline items, and of items of other refs, is named after the
+    # content
+    return case_snake_to_pascal(f"{sdk_name}_{content.get_id()}")
+
+
+def collect_py_types_from_schema(
+    schema: dict[str, Any], resolver: RefResolver | None = None
+):
+    if resolver is None:
+        resolver = RefResolver(schema)
     result: list[str] = []
 
     if "$ref" in schema:
-        schema, _trace = schema_resolve_ref(schema, schema["$ref"])
+        schema, _trace = resolver.resolve(schema["$ref"])
         if schema is None:
             raise ValueError(f"failed to resolve ref. {_trace}")
 
@@ -297,11 +1477,12 @@ def collect_py_types_from_schema(schema: dict[str, Any]):
 
     if "anyOf" in schema:
         for child_schema in schema["anyOf"]:
-            result.extend(collect_py_types_from_schema(child_schema))
+            result.extend(collect_py_types_from_schema(child_schema, resolver))
     elif t in ["string", "integer", "boolean", "null"]:
         return result.append(schema_type_to_py_type(t))
     elif t == "array" and "items" in schema:
-        result.append(f"list[{collect_py_types_from_schema(schema["items"])}]")
+        item_types = collect_py_types_from_schema(schema["items"], resolver)
+        result.append(f"list[{item_types}]")
     elif t == "object":
         result.append("dict")
     else:
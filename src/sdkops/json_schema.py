@@ -1,15 +1,60 @@
 import ast
-from typing import Any
-
-
-ref_cache: dict[str, dict] = {}
-ref_name_cache: dict[str, str] = {}
-
-
-def to_ast(root_name: str, root_schema: dict[str, Any]):
-    ref_cache = []
-    ref_name_cache = {}
+import hashlib
+import json
+import re
+from typing import Any, Callable
+
+
+def to_ast(
+    root_name: str,
+    root_schema: dict[str, Any],
+    resolver: "RefResolver | None" = None,
+    ref_class_names: dict[str, str] | None = None,
+    class_registry: "ClassRegistry | None" = None,
+    models: str = "dict",
+    from_dict: bool = False,
+):
+    """
+    Generates class definitions or an annotated assignment for a json schema.
+
+    :param root_name: Snake cased name of the root schema
+    :param root_schema: The json schema to generate python types for
+    :param resolver: Resolver of the document refs point to, the root schema by default
+    :param ref_class_names: Refs whose classes are emitted elsewhere, mapped to their class names
+    :param class_registry: Registry of the classes generated so far, to merge classes of identical schemas
+    :param models: Either "dict" for dict subclasses or "slots" for slotted classes, see ast_create_slots_class
+    :param from_dict: Whether to add a from_dict class method that decodes the classes, see ast_create_from_dict
+    :return: Either a list of ast class definitions or an ast annotated assignment.
+        The annotated assignment of an array or anyOf comes after the classes of its
+        items or members in a list, if it has any
+    """
+    if resolver is None:
+        resolver = RefResolver(root_schema)
+    if ref_class_names is None:
+        ref_class_names = {}
     class_defs: list[ast.ClassDef] = []
+    # class names of the object schemas generated so far, and the ones still being
+    # generated, by the identity of the schema node. a schema reachable from
+    # several places is generated once, and a schema reachable from itself is
+    # annotated with a forward reference instead of being expanded again.
+    class_names_by_node: dict[int, str] = {}
+    pending_class_names: dict[int, str] = {}
+    # names of the classes generated for this schema. the nested classes of anyOf
+    # members are named after the same property chain, the later ones get a suffix
+    claimed_class_names: set[str] = set()
+
+    def claim_class_name(class_name: str) -> str:
+        unique_name, suffix = class_name, 1
+        while unique_name in claimed_class_names:
+            suffix += 1
+            unique_name = f"{class_name}{suffix}"
+        claimed_class_names.add(unique_name)
+        return unique_name
+
+    def shared_class_name(input_schema: dict[str, Any]) -> str | None:
+        if "$ref" in input_schema:
+            return ref_class_names.get(input_schema["$ref"])
+        return None
 
     def process_ref(input_schema: dict[str, Any]):
         is_ref = False
@@ -18,12 +63,70 @@ def to_ast(root_name: str, root_schema: dict[str, Any]):
         if "$ref" in input_schema:
             is_ref = True
             is_ref_on_path = input_schema["$ref"].startswith("#/properties")
-            ref_name = schema_generate_name_by_ref(root_schema, input_schema["$ref"])
-            input_schema, _trace = schema_resolve_ref(root_schema, input_schema["$ref"])
-            if input_schema is None:
-                raise ValueError(f"failed to resolve ref. {_trace}")
+            ref_name = resolver.generate_name(input_schema["$ref"])
+            seen_refs = set()
+            while "$ref" in input_schema:
+                if input_schema["$ref"] in seen_refs:
+                    raise ValueError(f"ref {input_schema['$ref']} refers to itself.")
+                seen_refs.add(input_schema["$ref"])
+                input_schema, _trace = resolver.resolve(input_schema["$ref"])
+                if input_schema is None:
+                    raise ValueError(f"failed to resolve ref. {_trace}")
         return input_schema, is_ref, ref_name, is_ref_on_path
 
+    def known_class_name(input_schema: dict[str, Any]) -> str | None:
+        node_id = id(input_schema)
+        if node_id in class_names_by_node:
+            return class_names_by_node[node_id]
+        if node_id in pending_class_names:
+            return ast_create_forward_ref(pending_class_names[node_id])
+        return None
+
+    def emit_class(
+        class_name: str, input_schema: dict[str, Any], name_chain: tuple[str]
+    ) -> str:
+        node_id = id(input_schema)
+        class_name = claim_class_name(class_name)
+        pending_class_names[node_id] = class_name
+        new_class = ast_create_class(class_name)
+        required_props = input_schema["required"] if "required" in input_schema else []
+        for child_prop_name, child_schema in input_schema["properties"].items():
+            _is_required = True if child_prop_name in required_props else False
+            to_ast_recursive(
+                name_chain + (child_prop_name,),
+                child_schema,
+                new_class,
+                is_required=_is_required,
+            )
+        del pending_class_names[node_id]
+        if models == "slots":
+            new_class = ast_create_slots_class(new_class)
+        if from_dict:
+            init_def = next(
+                node
+                for node in new_class.body
+                if isinstance(node, ast.FunctionDef) and node.name == "__init__"
+            )
+            new_class.body.append(ast_create_from_dict(init_def))
+        canonical_name = (
+            class_registry.register(new_class) if class_registry is not None else None
+        )
+        if canonical_name is not None:
+            # an identical class exists, keep the name as an alias of it
+            class_defs.append(ast_create_alias(class_name, canonical_name))
+            class_name = canonical_name
+        else:
+            class_defs.append(new_class)
+        class_names_by_node[node_id] = class_name
+        return class_name
+
+    def root_assignment(
+        prop_name: str, py_type: ast.expr | str
+    ) -> ast.AnnAssign | list[ast.stmt]:
+        # the classes of the items or the members come before the assignment
+        assignment = ast_create_assignment(prop_name, py_type)
+        return [*class_defs, assignment] if class_defs else assignment
+
     def to_ast_recursive(
         name_chain: tuple[str],
         schema: dict[str, Any],
@@ -32,43 +135,44 @@ def to_ast(root_name: str, root_schema: dict[str, Any]):
     ):
         prop_name = name_chain[-1]
 
+        shared_name = shared_class_name(schema)
+        if shared_name is not None:
+            if ast_class is None:
+                return ast_create_assignment(prop_name, shared_name)
+            has_default_value = False if is_required is True else True
+            return ast_class_add_init_argument(
+                ast_class, prop_name, shared_name, has_default_value, None
+            )
+
         schema, is_ref, ref_name, is_ref_on_path = process_ref(schema)
 
         if "anyOf" in schema:
             all_types = []
             object_count = 0
             for child_schema in schema["anyOf"]:
+                shared_name = shared_class_name(child_schema)
+                if shared_name is not None:
+                    all_types.append(shared_name)
+                    continue
                 child_schema, is_ref, ref_name, is_ref_on_path = process_ref(
                     child_schema
                 )
                 if "type" in child_schema and child_schema["type"] == "object":
-                    class_name = case_snake_to_pascal("_".join(name_chain)) + (
-                        str(object_count + 1) if object_count > 0 else ""
-                    )
-                    new_class = ast_create_class(class_name)
-                    required_props = (
-                        child_schema["required"] if "required" in child_schema else []
-                    )
-                    for child_prop_name, any_child_schema in child_schema[
-                        "properties"
-                    ].items():
-                        _is_required = (
-                            True if child_prop_name in required_props else False
-                        )
-                        to_ast_recursive(
-                            name_chain + (child_prop_name,),
-                            any_child_schema,
-                            new_class,
-                            _is_required,
+                    class_name = known_class_name(child_schema)
+                    if class_name is None:
+                        class_name = emit_class(
+                            case_snake_to_pascal("_".join(name_chain))
+                            + (str(object_count + 1) if object_count > 0 else ""),
+                            child_schema,
+                            name_chain,
                         )
-                    class_defs.append(new_class)
                     all_types.append(class_name)
                     object_count += 1
                 elif "type" in child_schema:
                     all_types.append(schema_type_to_py_type(child_schema["type"]))
             ann = ast_create_annotation(all_types)
             if ast_class is None:
-                return ast_create_assignment(prop_name, ann)
+                return root_assignment(prop_name, ann)
             else:
                 has_default_value = False if is_required is True else True
                 default_value = find_default_value_from_types(types=all_types)
@@ -93,47 +197,33 @@ def to_ast(root_name: str, root_schema: dict[str, Any]):
 
         elif schema["type"] == "array":
             if "items" in schema:
-                if "$ref" in schema["items"]:
-                    schema["items"], _trace = schema_resolve_ref(
-                        root_schema, schema["items"]["$ref"]
-                    )
-                    if schema["items"] is None:
-                        raise ValueError(f"failed to resolve ref. {_trace}")
-                if "type" not in schema["items"]:
+                items_schema = schema["items"]
+                shared_name = shared_class_name(items_schema)
+                if shared_name is None and "$ref" in items_schema:
+                    items_schema, *_ = process_ref(items_schema)
+                if shared_name is not None:
+                    item_type = shared_name
+                elif "type" not in items_schema:
                     raise Exception(
                         f"there is not type in the schema items. it's either broken or contains functionality this module doesn't support yet."
                     )
-                if schema["items"]["type"] == "object":
-                    class_name = case_snake_to_pascal("_".join(name_chain))
-                    new_class = ast_create_class(class_name)
-                    required_props = (
-                        schema["items"]["required"]
-                        if "required" in schema["items"]
-                        else []
-                    )
-                    for child_prop_name, child_schema in schema["items"][
-                        "properties"
-                    ].items():
-                        _is_required = (
-                            True if child_prop_name in required_props else False
+                elif items_schema["type"] == "object":
+                    item_type = known_class_name(items_schema)
+                    if item_type is None:
+                        item_type = emit_class(
+                            case_snake_to_pascal("_".join(name_chain)),
+                            items_schema,
+                            name_chain,
                         )
-                        to_ast_recursive(
-                            name_chain + (child_prop_name,),
-                            child_schema,
-                            new_class,
-                            _is_required,
-                        )
-                    class_defs.append(new_class)
-                    item_type = class_name
                 else:
-                    item_type = schema_type_to_py_type(schema["items"]["type"])
+                    item_type = schema_type_to_py_type(items_schema["type"])
                 items_type = f"list[{item_type}]"
             else:
                 raise Exception(
                     "there is no 'items' in the array schema. it's either broken or contains functionality this module doesn't support yet."
                 )
             if ast_class is None:
-                return ast_create_assignment(prop_name, items_type)
+                return root_assignment(prop_name, items_type)
             else:
                 has_default_value = False if is_required is True else True
                 default_value = find_default_value_from_types(types=[items_type])
@@ -142,39 +232,29 @@ def to_ast(root_name: str, root_schema: dict[str, Any]):
                 )
 
         elif schema["type"] == "object":
-            if is_ref is False or (
-                is_ref is True and (ast_class is None or is_ref_on_path is False)
+            class_name = known_class_name(schema)
+            if class_name is None and (
+                is_ref is False or ast_class is None or is_ref_on_path is False
             ):
-                class_name = case_snake_to_pascal(
-                    "_".join(name_chain)
-                    if is_ref is False or (is_ref is True and ast_class is None)
-                    else f"{root_name}_{ref_name}"
+                class_name = emit_class(
+                    case_snake_to_pascal(
+                        "_".join(name_chain)
+                        if is_ref is False or (is_ref is True and ast_class is None)
+                        else f"{root_name}_{ref_name}"
+                    ),
+                    schema,
+                    name_chain,
+                )
+            if class_name is None:
+                # the main traversal hasn't reached the referred property yet
+                class_name = ast_create_forward_ref(
+                    case_snake_to_pascal(f"{root_name}_{ref_name}")
                 )
-                new_class = ast_create_class(class_name)
-                required_props = schema["required"] if "required" in schema else []
-                for child_prop_name, child_schema in schema["properties"].items():
-                    _is_required = True if child_prop_name in required_props else False
-                    to_ast_recursive(
-                        name_chain + (child_prop_name,),
-                        child_schema,
-                        new_class,
-                        is_required=_is_required,
-                    )
-                if is_ref is False and ast_class is not None:
-                    has_default_value = False if is_required is True else True
-                    ast_class_add_init_argument(
-                        ast_class, prop_name, class_name, has_default_value, None
-                    )
-                class_defs.append(new_class)
 
-            if is_ref is True and ast_class is not None:
+            if ast_class is not None:
                 has_default_value = False if is_required is True else True
                 ast_class_add_init_argument(
-                    ast_class,
-                    prop_name,
-                    case_snake_to_pascal(f"{root_name}_{ref_name}"),
-                    has_default_value,
-                    None,
+                    ast_class, prop_name, class_name, has_default_value, None
                 )
 
             return class_defs
@@ -189,9 +269,6 @@ def schema_generate_name_by_ref(schema: dict[str, Any], ref: str):
     if not ref.startswith("#/"):
         raise ValueError("ref must start with '#/'")
 
-    if ref in ref_name_cache:
-        return ref_name_cache[ref]
-
     # remove the '#/' prefix and split by '/'
     path_parts = ref[2:].split("/") if len(ref) > 2 else []
 
@@ -223,7 +300,6 @@ def schema_generate_name_by_ref(schema: dict[str, Any], ref: str):
             or schema_type == "integer"
             or schema_type == "boolean"
         ):
-            ref_name_cache[ref] = "_".join(name_chain)
             return "_".join(name_chain)
 
         elif schema_type == "array":
@@ -249,20 +325,37 @@ def schema_generate_name_by_ref(schema: dict[str, Any], ref: str):
             # NOTE: we only handle object types here
             name_chain.append(part)
 
-    ref_name_cache[ref] = "_".join(name_chain)
-
     return "_".join(name_chain)
 
 
+def content_hash(value: Any) -> str:
+    data = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def schema_collect_refs(schema: Any) -> list[str]:
+    """
+    Collects every $ref found in a schema, in document order, without resolving them.
+    """
+    refs: list[str] = []
+    stack = [schema]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if isinstance(node.get("$ref"), str):
+                refs.append(node["$ref"])
+            stack.extend(reversed(node.values()))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+    return refs
+
+
 def schema_resolve_ref(
     schema: dict[str, Any], ref: str
 ) -> tuple[dict | None, list[str]]:
     if not ref.startswith("#/"):
         raise ValueError("ref must start with '#/'")
 
-    if ref in ref_cache:
-        return ref_cache[ref], []
-
     # remove the '#/' prefix and split by '/'
     path_parts = ref[2:].split("/") if len(ref) > 2 else []
 
@@ -286,11 +379,221 @@ def schema_resolve_ref(
         current = current[part]
         trace.append(part)
 
-    ref_cache[ref] = current
-
     return current, trace
 
 
+class ClassRegistry:
+    """
+    Keeps the generated classes by a hash of their structure, so that schemas of the
+    same shape share a single class and the other names become aliases of it.
+    """
+
+    def __init__(self):
+        self.class_names: dict[str, str] = {}
+        self.aliases: dict[str, str] = {}
+        self.registered: list[tuple[ast.ClassDef, str]] = []
+        # structure hashes of the registered classes by their names
+        self.keys: dict[str, str] = {}
+
+    def register(self, class_def: ast.ClassDef, key: str | None = None) -> str | None:
+        """
+        Registers a class, unless an identical one exists.
+
+        :param class_def: Ast node of the class definition
+        :param key: Structure hash of the class if it's known
+        :return: Name of the identical class registered before, None otherwise
+        """
+        if key is None:
+            key = ast_class_structure_hash(class_def)
+        self.registered.append((class_def, key))
+        return self.register_name(class_def.name, key)
+
+    def register_name(self, class_name: str, key: str) -> str | None:
+        """
+        Registers a class by the hash of its structure, unless an identical one exists.
+
+        :param class_name: Name of the class
+        :param key: Structure hash of the class, see ast_class_structure_hash
+        :return: Name of the identical class registered before, None otherwise
+        """
+        if self.keys.get(class_name, key) != key:
+            raise ValueError(
+                f"two different classes are generated with the name {class_name}."
+            )
+        canonical_name = self.class_names.get(key)
+        if canonical_name is None or canonical_name == class_name:
+            self.class_names[key] = class_name
+            self.keys[class_name] = key
+            return None
+        self.aliases[class_name] = canonical_name
+        self.keys[class_name] = key
+        return canonical_name
+
+    def resolve_name(self, class_name: str) -> str:
+        return self.aliases.get(class_name, class_name)
+
+
+class DocumentIndex:
+    """
+    Indexes every node of a document by its json pointer, along with the name
+    generated for it, in one pass, so lookups don't walk the document again.
+    Pointers are prefixed with the key of the document, empty for the openapi schema
+    itself, and refs are looked up by them as they are.
+    """
+
+    def __init__(
+        self,
+        key: str,
+        document: Any,
+        rebase_ref: Callable[[str], str] | None = None,
+    ):
+        """
+        :param key: Key of the document, the part of the refs to it before the "#"
+        :param document: Parsed json document
+        :param rebase_ref: Rewrites the refs in the document, relative to it, into
+            refs by the keys of the documents. The refs are changed in place while
+            the document is indexed.
+        """
+        self.key = key
+        self.document = document
+        self.nodes: dict[str, Any] = {}
+        self.names: dict[str, str] = {}
+        # refs in the document, rebased if they're rebased
+        self.refs: list[str] = []
+        self.index(rebase_ref)
+
+    def index(self, rebase_ref: Callable[[str], str] | None = None):
+        root = f"{self.key}#"
+        self.nodes = {root: self.document, f"{root}/": self.document}
+        self.names = {root: "", f"{root}/": ""}
+        self.refs = []
+        # pointer, node, name chain, key the node is under, whether its parent is
+        # an object schema and whether the name chain stopped growing
+        stack = [(root, self.document, "", None, False, False)]
+        while stack:
+            pointer, node, chain, node_key, is_parent_object, is_stopped = stack.pop()
+            if isinstance(node, dict):
+                if isinstance(node.get("$ref"), str):
+                    if rebase_ref is not None:
+                        node["$ref"] = rebase_ref(node["$ref"])
+                    self.refs.append(node["$ref"])
+                items = node.items()
+                schema_type = node.get("type")
+            elif isinstance(node, list):
+                items = enumerate(node)
+                schema_type = None
+            else:
+                continue
+            if not is_stopped and isinstance(node, dict) and "anyOf" not in node:
+                is_stopped = schema_type in ("string", "integer", "boolean")
+            is_properties = node_key == "properties" and is_parent_object
+
+            for key, child in items:
+                key = str(key)
+                child_pointer = f"{pointer}/{key.replace('~', '~0').replace('/', '~1')}"
+                child_chain = chain
+                if is_properties and not is_stopped:
+                    child_chain = f"{chain}_{key}" if chain else key
+                self.nodes[child_pointer] = child
+                self.names[child_pointer] = child_chain
+                if (
+                    not is_stopped
+                    and node_key != "properties"
+                    and key != "properties"
+                    and isinstance(child, dict)
+                    and child.get("type") == "object"
+                ):
+                    # a named schema like "#/components/schemas/{name}"
+                    self.names[child_pointer] = (
+                        f"{child_chain}_{key}" if child_chain else key
+                    )
+                if isinstance(child, (dict, list)):
+                    stack.append(
+                        (
+                            child_pointer,
+                            child,
+                            child_chain,
+                            key,
+                            schema_type == "object",
+                            is_stopped,
+                        )
+                    )
+
+
+class RefResolver:
+    """
+    Resolves the refs of a document, and of the other documents its refs point to.
+    Refs to other documents are prefixed with their keys, like
+    "common.json#/components/schemas/User", see DocumentIndex. The documents are
+    resolved as they are, without bundling them into one.
+    """
+
+    def __init__(
+        self,
+        document: dict[str, Any],
+        documents: dict[str, DocumentIndex] | None = None,
+        aliases: dict[str, str] | None = None,
+    ):
+        """
+        :param document: The document refs starting with "#" point to
+        :param documents: Indexes of the other documents by their keys
+        :param aliases: Keys of the other documents by how the document refers to
+            them, if it doesn't by their keys
+        """
+        self.document = document
+        self.documents: dict[str, DocumentIndex] = {}
+        self.aliases: dict[str, str] = {}
+        self.nodes: dict[str, Any] = {}
+        self.names: dict[str, str] = {}
+        # refs in the document, not the other documents
+        self.refs: list[str] = []
+        self.index()
+        self.add_documents(documents or {}, aliases or {})
+
+    def index(self):
+        main_index = DocumentIndex("", self.document)
+        self.nodes = main_index.nodes
+        self.names = main_index.names
+        self.refs = main_index.refs
+        self.documents[""] = main_index
+
+    def add_documents(
+        self, documents: dict[str, DocumentIndex], aliases: dict[str, str]
+    ):
+        self.documents.update(documents)
+        self.aliases.update(aliases)
+
+    def document_index(self, ref: str) -> tuple[DocumentIndex, str]:
+        """
+        :return: Index of the document the ref points to, and the ref by its key
+        """
+        key, _, pointer = ref.partition("#")
+        key = self.aliases.get(key, key)
+        if key not in self.documents:
+            raise ValueError(f"ref {ref} points to a document that isn't loaded.")
+        return self.documents[key], f"{key}#{pointer}"
+
+    def resolve(self, ref: str) -> tuple[Any | None, list[str]]:
+        if ref in self.nodes:
+            return self.nodes[ref], []
+
+        document_index, ref = self.document_index(ref)
+        if ref in document_index.nodes:
+            return document_index.nodes[ref], []
+        return schema_resolve_ref(document_index.document, f"#{ref.partition('#')[2]}")
+
+    def generate_name(self, ref: str) -> str:
+        if ref in self.names:
+            return self.names[ref]
+
+        document_index, ref = self.document_index(ref)
+        if ref in document_index.names:
+            return document_index.names[ref]
+        return schema_generate_name_by_ref(
+            document_index.document, f"#{ref.partition('#')[2]}"
+        )
+
+
 def schema_type_to_py_type(key: str):
     mapping: dict[str, str] = {
         "string": "str",
@@ -347,6 +650,314 @@ def ast_create_class(id: str):
     )
 
 
+PRIMITIVE_TYPE_NAMES = frozenset(
+    {"str", "int", "float", "bool", "None", "dict", "list"}
+)
+
+
+def ast_create_slots_class(class_def: ast.ClassDef) -> ast.ClassDef:
+    """
+    Turns a dict subclass made by ast_create_class into a slotted class. Its fields
+    are stored once, in the slots, instead of both in the dict and the instance
+    dictionary. Lists and dicts default to None and a new one is made for each
+    instance, rather than sharing the default. to_dict returns the fields as a dict,
+    with the nested models as dicts, sharing the other values.
+
+    :param class_def: Class with the arguments of its fields added, see
+        ast_class_add_init_argument
+    :return: Ast node of the slotted class
+    """
+    init_def = class_def.body[0]
+    args = list(init_def.args.args[1:])
+    defaults = list(init_def.args.defaults)
+    first_default = len(args) - len(defaults)
+    field_names = [arg.arg for arg in args]
+
+    body: list[ast.stmt] = []
+    for index, arg in enumerate(args):
+        default = defaults[index - first_default] if index >= first_default else None
+        if isinstance(default, ast.Constant) and isinstance(
+            default.value, (list, dict)
+        ):
+            defaults[index - first_default] = ast.Constant(value=None)
+            args[index] = ast.arg(
+                arg=arg.arg, annotation=ast_optional_annotation(arg.annotation)
+            )
+            value = ast.parse(
+                f"{'[]' if isinstance(default.value, list) else '{}'} if {arg.arg} is None else {arg.arg}",
+                mode="eval",
+            ).body
+        else:
+            value = ast.Name(id=arg.arg, ctx=ast.Load())
+        body.append(
+            ast.Assign(
+                targets=[
+                    ast.Attribute(
+                        value=ast.Name(id="self", ctx=ast.Load()),
+                        attr=arg.arg,
+                        ctx=ast.Store(),
+                    )
+                ],
+                value=value,
+                lineno=1,
+            )
+        )
+    to_dict_items = ", ".join(
+        f"{arg.arg!r}: {ast_field_to_dict(arg.arg, arg.annotation)}"
+        for arg in init_def.args.args[1:]
+    )
+    to_dict_def = ast.parse(
+        f"def to_dict(self) -> dict:\n    return {{{to_dict_items}}}"
+    ).body[0]
+
+    return ast.ClassDef(
+        name=class_def.name,
+        bases=[],
+        keywords=[],
+        decorator_list=[],
+        type_params=[],
+        body=[
+            ast.Assign(
+                targets=[ast.Name(id="__slots__", ctx=ast.Store())],
+                value=ast.Tuple(
+                    elts=[ast.Constant(value=name) for name in field_names],
+                    ctx=ast.Load(),
+                ),
+                lineno=1,
+            ),
+            ast.FunctionDef(
+                name="__init__",
+                args=ast.arguments(
+                    args=[init_def.args.args[0], *args],
+                    defaults=defaults,
+                    posonlyargs=[],
+                    kwonlyargs=[],
+                ),
+                body=body or [ast.Pass()],
+                decorator_list=[],
+                returns=None,
+                lineno=1,
+            ),
+            to_dict_def,
+        ],
+    )
+
+
+def ast_optional_annotation(annotation: ast.expr | None) -> ast.expr | None:
+    """
+    :return: Annotation that allows None too, like "list[str] | None" for "list[str]"
+    """
+    if annotation is None or "None" in ast_union_members(
+        ast_annotation_text(annotation)
+    ):
+        return annotation
+    if isinstance(annotation, ast.Constant):
+        # forward references
+        return ast.Constant(value=f"{annotation.value} | None")
+    return ast.BinOp(left=annotation, op=ast.BitOr(), right=ast.Constant(value=None))
+
+
+def ast_field_to_dict(name: str, annotation: ast.expr | None) -> str:
+    """
+    :return: Source of the expression that converts a field to builtin values, by
+        the types in its annotation
+    """
+    text = ast_annotation_text(annotation)
+    type_names = set(re.findall(r"[A-Za-z_]\w*", text))
+    if type_names <= PRIMITIVE_TYPE_NAMES:
+        return f"self.{name}"
+    members = ast_union_members(text)
+    optional = "None" in members
+    members = [member for member in members if member != "None"]
+    list_match = re.fullmatch(r"list\[([A-Za-z_]\w*)\]", members[0])
+    if len(members) == 1 and re.fullmatch(r"[A-Za-z_]\w*", members[0]):
+        return f"None if self.{name} is None else self.{name}.to_dict()"
+    if len(members) == 1 and list_match is not None:
+        source = f"[item.to_dict() for item in self.{name}]"
+        return f"None if self.{name} is None else {source}" if optional else source
+    source = (
+        f"self.{name}.to_dict() if hasattr(self.{name}, 'to_dict') else self.{name}"
+    )
+    if any(
+        re.fullmatch(r"list\[([A-Za-z_]\w*)\]", member)
+        and member[5:-1] not in PRIMITIVE_TYPE_NAMES
+        for member in members
+    ):
+        # lists of models are converted item by item
+        source = (
+            f"[item.to_dict() for item in self.{name}] "
+            f"if isinstance(self.{name}, list) else {source}"
+        )
+    return source
+
+
+def ast_create_from_dict(init_def: ast.FunctionDef) -> ast.FunctionDef:
+    """
+    Generates the from_dict class method of a class, that makes an instance of it
+    from decoded json in one go, the nested models included. Missing fields get
+    their defaults and unknown ones are left out.
+
+    :param init_def: __init__ of the class, its arguments are the fields
+    """
+    args = init_def.args.args[1:]
+    defaults = init_def.args.defaults
+    first_default = len(args) - len(defaults)
+    keywords = []
+    for index, arg in enumerate(args):
+        default = defaults[index - first_default] if index >= first_default else None
+        keywords.append(
+            f"{arg.arg}={ast_field_from_dict(arg.arg, arg.annotation, default)}"
+        )
+    return ast.parse(
+        "@classmethod\n"
+        "def from_dict(cls, data: dict):\n"
+        f"    return cls({', '.join(keywords)})"
+    ).body[0]
+
+
+def ast_annotation_text(annotation: ast.expr | None) -> str:
+    if annotation is None:
+        return ""
+    if isinstance(annotation, ast.Constant):
+        # forward references
+        return str(annotation.value)
+    return ast.unparse(annotation)
+
+
+def ast_field_from_dict(
+    name: str, annotation: ast.expr | None, default: ast.expr | None
+) -> str:
+    """
+    :return: Source of the expression that decodes a field from the dict "data", by
+        the types in its annotation
+    """
+    text = ast_annotation_text(annotation)
+    value = (
+        f"data.get({name!r})"
+        if default is None or ast_is_none(default)
+        else f"data.get({name!r}, {ast.unparse(default)})"
+    )
+    if set(re.findall(r"[A-Za-z_]\w*", text)) <= PRIMITIVE_TYPE_NAMES:
+        return value
+    if re.fullmatch(r"[A-Za-z_]\w*", text):
+        return (
+            f"None if data.get({name!r}) is None else {text}.from_dict(data[{name!r}])"
+        )
+    match = re.fullmatch(r"list\[([A-Za-z_]\w*)\]", text)
+    if match is not None and match[1] not in PRIMITIVE_TYPE_NAMES:
+        return f"[{match[1]}.from_dict(item) for item in data.get({name!r}) or ()]"
+    return ast_decode_union(text, value) or value
+
+
+def ast_union_members(text: str) -> list[str]:
+    """
+    :return: Types of the union in an annotation, like ["list[Item]", "None"] for
+        "list[Item] | None"
+    """
+    members = []
+    depth = start = 0
+    for index, char in enumerate(text):
+        if char == "[":
+            depth += 1
+        elif char == "]":
+            depth -= 1
+        elif char == "|" and depth == 0:
+            members.append(text[start:index].strip())
+            start = index + 1
+    members.append(text[start:].strip())
+    return members
+
+
+def ast_decode_union(text: str, value: str) -> str | None:
+    """
+    Decodes a value of a union by its type at runtime. Dicts become the first model
+    of the union and lists the first list of models, the other values are left as
+    they are.
+
+    :param text: Annotation of the union, like "Item | None"
+    :param value: Source of the expression of the decoded json
+    :return: Source of the expression that decodes the value into its models, None
+        if there are no models in the union
+    """
+    models = []
+    model_lists = []
+    others = []
+    for member in ast_union_members(text):
+        match = re.fullmatch(r"list\[([A-Za-z_]\w*)\]", member)
+        if re.fullmatch(r"[A-Za-z_]\w*", member) and member not in PRIMITIVE_TYPE_NAMES:
+            models.append(member)
+        elif match is not None and match[1] not in PRIMITIVE_TYPE_NAMES:
+            model_lists.append(match[1])
+        elif member != "None":
+            others.append(member)
+    decoders = []
+    if models:
+        decoders.append(("dict", f"{models[0]}.from_dict({value})"))
+    if model_lists:
+        decoders.append(
+            ("list", f"[{model_lists[0]}.from_dict(item) for item in {value}]")
+        )
+    if not decoders:
+        return None
+    if len(decoders) == 1 and not others:
+        return f"None if {value} is None else {decoders[0][1]}"
+    source = value
+    for type_name, decoder in reversed(decoders):
+        source = f"{decoder} if isinstance({value}, {type_name}) else {source}"
+    return source
+
+
+def ast_is_none(node: ast.expr) -> bool:
+    return isinstance(node, ast.Constant) and node.value is None
+
+
+def ast_class_structure_hash(class_def: ast.ClassDef) -> str:
+    # everything but the name of the class
+    structure = ast.dump(ast.Module(body=class_def.body, type_ignores=[]))
+    return hashlib.sha256(structure.encode()).hexdigest()
+
+
+def ast_rename_annotations(node: ast.AST, renames: dict[str, str]) -> bool:
+    """
+    Renames the classes referred to in the annotations of a definition, and in its
+    code, like the from_dict methods.
+
+    :param node: Ast node of the definition, changed in place
+    :param renames: Dictionary of the old and new class names
+    :return: True if a name is changed
+    """
+    if not renames:
+        return False
+
+    def rename(text: str) -> str:
+        return re.sub(r"[A-Za-z_]\w*", lambda m: renames.get(m[0], m[0]), text)
+
+    changed = False
+    for child in ast.walk(node):
+        # annotations are names like "list[Item]" or strings of forward references
+        if isinstance(child, ast.Name):
+            new_id = rename(child.id)
+            changed = changed or new_id != child.id
+            child.id = new_id
+        elif isinstance(child, (ast.arg, ast.AnnAssign)) and child.annotation:
+            for annotation_node in ast.walk(child.annotation):
+                if isinstance(annotation_node, ast.Constant) and isinstance(
+                    annotation_node.value, str
+                ):
+                    new_value = rename(annotation_node.value)
+                    changed = changed or new_value != annotation_node.value
+                    annotation_node.value = new_value
+    return changed
+
+
+def ast_create_alias(id: str, target: str) -> ast.Assign:
+    return ast.Assign(
+        targets=[ast.Name(id=id, ctx=ast.Store())],
+        value=ast.Name(id=target, ctx=ast.Load()),
+        lineno=1,
+    )
+
+
 def ast_class_add_init_argument(
     current_class: ast.ClassDef,
     name: str,
@@ -412,10 +1023,21 @@ def ast_create_assignment(
     )
 
 
+def ast_create_forward_ref(type_name: str) -> str:
+    return f'"{type_name}"'
+
+
 def ast_create_annotation(types: list[str]) -> ast.expr | None:
     if not types:
         return None
 
+    # forward references make the whole annotation a string so that it isn't
+    # evaluated before the classes it mentions are defined
+    if any('"' in type_name for type_name in types):
+        return ast.Constant(
+            value=" | ".join(type_name.replace('"', "") for type_name in types)
+        )
+
     if len(types) == 1:
         type_name = types[0]
         if type_name == "None":
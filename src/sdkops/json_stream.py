@@ -0,0 +1,111 @@
+import json
+import re
+from typing import Any, Iterator, TextIO
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class JSONStream:
+    """
+    Reads a json document from a file incrementally. Objects are iterated key by key
+    and their values are read one at a time, so only the value being read is kept in
+    memory with the part of the file after it, not the whole document.
+    """
+
+    def __init__(self, file: TextIO, chunk_size: int = 1 << 20):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.position = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self, size: int) -> bool:
+        if self.eof:
+            return False
+        # the part read so far is dropped before the buffer grows
+        self.buffer = self.buffer[self.position :]
+        self.position = 0
+        chunk = self.file.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer += chunk
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            self.position = _WHITESPACE.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._fill(self.chunk_size):
+                raise ValueError("unexpected end of the json document.")
+
+    def _expect(self, char: str):
+        found = self._peek()
+        if found != char:
+            raise ValueError(
+                f"expected '{char}' but found '{found}' in the json document."
+            )
+        self.position += 1
+
+    def _decode(self) -> tuple[Any, int]:
+        self._peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                # the value doesn't fit in the buffer yet, doubling the buffer keeps
+                # decoding it again linear in its size
+                if not self._fill(max(self.chunk_size, len(self.buffer))):
+                    raise
+                continue
+            # a number at the end of the buffer may go on in the next chunk
+            if end == len(self.buffer) and self._fill(self.chunk_size):
+                continue
+            start = self.position
+            self.position = end
+            return value, start
+
+    def read_value(self) -> Any:
+        """
+        Reads the value at the current position, whatever its type.
+
+        :return: Decoded value
+        """
+        return self._decode()[0]
+
+    def read_value_text(self) -> tuple[Any, str]:
+        """
+        Reads the value at the current position along with its json text.
+
+        :return: Decoded value and its text as it is in the document
+        """
+        value, start = self._decode()
+        return value, self.buffer[start : self.position]
+
+    def iter_object(self) -> Iterator[str]:
+        """
+        Iterates over the keys of the object at the current position. The value of
+        each key must be read, with read_value or iter_object, before the next key.
+
+        :return: Iterator of the keys
+        """
+        self._expect("{")
+        if self._peek() == "}":
+            self.position += 1
+            return
+        while True:
+            if self._peek() != '"':
+                raise ValueError("expected a key in the json document.")
+            key = self.read_value()
+            self._expect(":")
+            yield key
+            char = self._peek()
+            self.position += 1
+            if char == "}":
+                return
+            if char != ",":
+                raise ValueError(
+                    f"expected ',' or '}}' but found '{char}' in the json document."
+                )
@@ -1,37 +1,74 @@
+import bisect
+import hashlib
 import os
 import re
-from typing import Any, Union
+from sys import intern
+from typing import Any, Iterable, TextIO, Union
 from dataclasses import dataclass, asdict
+from sdkops.documents import DocumentLoader
+from sdkops.json_schema import (
+    DocumentIndex,
+    RefResolver,
+    content_hash,
+    schema_collect_refs,
+)
+from sdkops.json_stream import JSONStream
 
 
 class APISpecServer:
+    __slots__ = ("url", "description")
+
     def __init__(self, url: str, description: str = ""):
         self.url = ""
         self.description = ""
 
 
 class APISpecComponentSchema:
+    __slots__ = ("name", "schema")
+
     def __init__(self):
         self.name: str = ""
         self.schema: dict[str, Any] = {}
 
 
 class APISpecPathOperationContent:
+    # a spec has a few contents per operation, their attributes are slots and their
+    # extensions are allocated only if they're accessed
+    __slots__ = ("media_type", "examples", "schema", "_id", "_extensions")
+
     def __init__(self):
         self.media_type: str = ""
         self.examples: dict[str, Any] | None = None
         self.schema: dict[str, Any] | None = None
-        self.extensions: dict[str, Any] = {"x-id": ""}
+        self._id: str = ""
+        self._extensions: dict[str, Any] | None = None
+
+    @property
+    def extensions(self) -> dict[str, Any]:
+        if self._extensions is None:
+            self._extensions = {"x-id": self._id}
+        return self._extensions
+
+    @extensions.setter
+    def extensions(self, value: dict[str, Any]):
+        self._extensions = value
 
     def set_id(self, value: str):
-        self.extensions["x-id"] = value
+        if self._extensions is None:
+            self._id = value
+        else:
+            self._extensions["x-id"] = value
         return self
 
     def get_id(self):
-        return self.extensions["x-id"]
+        if self._extensions is None:
+            return self._id
+        return self._extensions["x-id"]
 
 
 class APISpecPathOperationRequestBody:
+    __slots__ = ("description", "required", "contents")
+
     def __init__(self):
         self.description: str = ""
         self.required: bool = False
@@ -39,6 +76,8 @@ class APISpecPathOperationRequestBody:
 
 
 class APISpecPathOperationResponse:
+    __slots__ = ("status_code", "description", "contents")
+
     def __init__(self):
         self.status_code: int = 200
         self.description: str = ""
@@ -46,6 +85,8 @@ class APISpecPathOperationResponse:
 
 
 class APISpecPathOperationParameter:
+    __slots__ = ("name", "kind", "required", "schema")
+
     def __init__(self):
         self.name: str = ""
         self.kind: str = ""  # path, query, header, cookie
@@ -54,15 +95,32 @@ class APISpecPathOperationParameter:
 
 
 class APISpecPathOperation:
+    __slots__ = (
+        "method",
+        "operation_id",
+        "tags",
+        "parameters",
+        "request_body",
+        "responses",
+        "digest",
+        "refs",
+    )
+
     def __init__(self):
         self.method: str = ""
         self.operation_id: str = ""
+        self.tags: list[str] = []
         self.parameters: list[APISpecPathOperationParameter] = []
         self.request_body: APISpecPathOperationRequestBody | None = None
         self.responses: list[APISpecPathOperationResponse] = []
+        # hash of the operation in the schema and the refs in it, to tell if it changed
+        self.digest: str = ""
+        self.refs: list[str] = []
 
 
 class APISpecPathItem:
+    __slots__ = ("pattern", "operations")
+
     def __init__(self):
         self.pattern: str = ""
         self.operations: list[APISpecPathOperation] = []
@@ -75,6 +133,98 @@ class APISpecApplicationInfo:
         self.version: str = ""
 
 
+class APISpecIndex:
+    """
+    Indexes of the operations of a spec by id, tag and path, and the graph of the
+    refs between its schemas. The ref graph is built on its first use, from the refs
+    of the operations and the component schemas.
+    """
+
+    def __init__(self, spec: "APISpec"):
+        self.spec = spec
+        self.operations: dict[str, tuple[APISpecPathItem, APISpecPathOperation]] = {}
+        self.tags: dict[str, list[str]] = {}
+        self.path_items: dict[str, APISpecPathItem] = {}
+        self.patterns: list[str] = []
+        for path_item in spec.paths:
+            self.path_items[path_item.pattern] = path_item
+            for operation in path_item.operations:
+                self.operations.setdefault(
+                    operation.operation_id, (path_item, operation)
+                )
+                for tag in operation.tags:
+                    self.tags.setdefault(tag, []).append(operation.operation_id)
+        self.patterns = sorted(self.path_items)
+        self._dependencies: dict[str, list[str]] | None = None
+        self._dependents: dict[str, list[str]] | None = None
+        self._ref_operations: dict[str, list[str]] | None = None
+
+    def operation_ids_by_path_prefix(self, prefix: str) -> list[str]:
+        """
+        :param prefix: Path prefix like "/users", it matches "/users" and
+            "/users/{id}" but not "/users_admin"
+        :return: Ids of the operations under the prefix
+        """
+        prefix = prefix.rstrip("/")
+        result = []
+        start = bisect.bisect_left(self.patterns, prefix)
+        for pattern in self.patterns[start:]:
+            if not pattern.startswith(prefix):
+                break
+            if len(pattern) == len(prefix) or pattern[len(prefix)] == "/":
+                result.extend(
+                    operation.operation_id
+                    for operation in self.path_items[pattern].operations
+                )
+        return result
+
+    def build_ref_graph(self):
+        resolver = self.spec.resolver
+        dependencies: dict[str, list[str]] = {}
+        dependents: dict[str, list[str]] = {}
+        ref_operations: dict[str, list[str]] = {}
+        stack: list[str] = []
+        for _path_item, operation in self.operations.values():
+            for ref in operation.refs:
+                ref_operations.setdefault(ref, []).append(operation.operation_id)
+                stack.append(ref)
+        schemas = self.spec.schema_dict.get("components", {}).get("schemas", {})
+        stack.extend(
+            f"#/components/schemas/{name.replace('~', '~0').replace('/', '~1')}"
+            for name in schemas
+        )
+        while stack:
+            ref = stack.pop()
+            if ref in dependencies:
+                continue
+            schema, _trace = resolver.resolve(ref)
+            dependencies[ref] = sorted(set(schema_collect_refs(schema)))
+            for dep in dependencies[ref]:
+                dependents.setdefault(dep, []).append(ref)
+                stack.append(dep)
+        self._dependencies = dependencies
+        self._dependents = dependents
+        self._ref_operations = ref_operations
+
+    @property
+    def dependencies(self) -> dict[str, list[str]]:
+        if self._dependencies is None:
+            self.build_ref_graph()
+        return self._dependencies
+
+    @property
+    def dependents(self) -> dict[str, list[str]]:
+        if self._dependents is None:
+            self.build_ref_graph()
+        return self._dependents
+
+    @property
+    def ref_operations(self) -> dict[str, list[str]]:
+        if self._ref_operations is None:
+            self.build_ref_graph()
+        return self._ref_operations
+
+
 class APISpec:
     def __init__(self):
         self.version_openapi: str = ""
@@ -84,6 +234,132 @@ class APISpec:
         self.components: list[APISpecComponentSchema] = []
         self.servers: list[APISpecServer] = []
         self.schema_dict: dict[str, Any] = {}
+        self.resolver: RefResolver = RefResolver({})
+        self._index: APISpecIndex | None = None
+
+    @property
+    def index(self) -> APISpecIndex:
+        """
+        Indexes of the operations and refs, built on first use. The spec shouldn't
+        change after that.
+        """
+        if self._index is None:
+            self._index = APISpecIndex(self)
+        return self._index
+
+    def find_operation(
+        self, operation_id: str
+    ) -> tuple[APISpecPathItem, APISpecPathOperation] | None:
+        """
+        :return: Path item and operation of the id, None if there isn't one
+        """
+        return self.index.operations.get(operation_id)
+
+    def find_operation_ids(
+        self,
+        operation_ids: Iterable[str] = (),
+        tags: Iterable[str] = (),
+        path_prefixes: Iterable[str] = (),
+    ) -> set[str]:
+        """
+        :return: Ids of the operations that have one of the ids, one of the tags, or a
+            path under one of the prefixes
+        """
+        index = self.index
+        result = {
+            operation_id
+            for operation_id in operation_ids
+            if operation_id in index.operations
+        }
+        for tag in tags:
+            result.update(index.tags.get(tag, ()))
+        for prefix in path_prefixes:
+            result.update(index.operation_ids_by_path_prefix(prefix))
+        return result
+
+    def ref_closure(self, refs: Iterable[str]) -> set[str]:
+        """
+        :return: The refs and the refs their values refer to, transitively
+        """
+        dependencies = self.index.dependencies
+        result: set[str] = set()
+        stack = list(refs)
+        while stack:
+            ref = stack.pop()
+            if ref in result:
+                continue
+            result.add(ref)
+            if ref not in dependencies:
+                schema, _trace = self.resolver.resolve(ref)
+                dependencies[ref] = sorted(set(schema_collect_refs(schema)))
+            stack.extend(dependencies[ref])
+        return result
+
+    def dependent_operation_ids(self, ref: str) -> set[str]:
+        """
+        :return: Ids of the operations that refer to the ref, directly or through the
+            refs that refer to it
+        """
+        index = self.index
+        result: set[str] = set()
+        visited: set[str] = set()
+        stack = [ref]
+        while stack:
+            ref = stack.pop()
+            if ref in visited:
+                continue
+            visited.add(ref)
+            result.update(index.ref_operations.get(ref, ()))
+            stack.extend(index.dependents.get(ref, ()))
+        return result
+
+    def subset(self, operation_ids: Iterable[str]) -> "APISpec":
+        """
+        Creates a spec of only the operations of the ids, and the component schemas
+        they need, transitively. The documents and their resolver are shared with
+        this spec, they aren't indexed again.
+
+        :return: The spec of the subset
+        """
+        operation_ids = set(operation_ids)
+        spec = APISpec()
+        spec.version_openapi = self.version_openapi
+        spec.version = self.version
+        spec.info = self.info
+        spec.servers = self.servers
+        spec.resolver = self.resolver
+        refs: list[str] = []
+        for path_item in self.paths:
+            operations = [
+                operation
+                for operation in path_item.operations
+                if operation.operation_id in operation_ids
+            ]
+            if not operations:
+                continue
+            subset_path_item = APISpecPathItem()
+            subset_path_item.pattern = path_item.pattern
+            subset_path_item.operations = operations
+            spec.paths.append(subset_path_item)
+            for operation in operations:
+                refs.extend(operation.refs)
+
+        closure = self.ref_closure(refs)
+        components = self.schema_dict.get("components", {})
+        schemas = {
+            name: schema
+            for name, schema in components.get("schemas", {}).items()
+            if f"#/components/schemas/{name.replace('~', '~0').replace('/', '~1')}"
+            in closure
+        }
+        spec.schema_dict = {
+            **self.schema_dict,
+            "components": {**components, "schemas": schemas},
+        }
+        spec.components = [
+            component for component in self.components if component.name in schemas
+        ]
+        return spec
 
     def update_info(self, data: Union[APISpecApplicationInfo, dict[str, Any]]):
         data_dict = asdict(data) if isinstance(data, APISpecApplicationInfo) else data
@@ -118,10 +394,167 @@ class APISpec:
         )
 
 
-def parse(schema_dict: dict[str, Any]):
+def parse(
+    schema_dict: dict[str, Any],
+    base: str | None = None,
+    loader: DocumentLoader | None = None,
+):
+    """
+    :param schema_dict: The whole openapi schema
+    :param base: Path or url of the schema that refs to other documents are relative
+        to, the working directory by default
+    :param loader: Loader of the other documents, see DocumentLoader
+    :return: Whether the schema is parsed, and the spec
+    """
     spec = APISpec()
     spec.schema_dict = schema_dict
+    spec.resolver = RefResolver(schema_dict)
+    spec.resolver.add_documents(*load_documents(spec.resolver.refs, base, loader))
+    parse_document_info(spec, schema_dict)
+
+    if "paths" in schema_dict:
+        for pattern, operations_dict in schema_dict["paths"].items():
+            spec.paths.append(parse_path_item(pattern, operations_dict))
+
+    return True, spec
+
+
+def load(
+    path: str,
+    chunk_size: int = 1 << 20,
+    path_items: dict[tuple[str, str], APISpecPathItem] | None = None,
+    loader: DocumentLoader | None = None,
+):
+    """
+    Loads an openapi schema file without reading all of it into memory, see read.
+
+    :param path: Path of the json file of the schema
+    :param chunk_size: Number of characters read from the file at a time
+    :param path_items: Path items of an earlier load to reuse, see read
+    :param loader: Loader of the documents refs point to, see DocumentLoader
+    :return: Whether the schema is parsed, and the spec
+    """
+    with open(path, encoding="utf-8") as f:
+        return read(f, chunk_size, path_items, path, loader)
+
+
+def read(
+    f: TextIO,
+    chunk_size: int = 1 << 20,
+    path_items: dict[tuple[str, str], APISpecPathItem] | None = None,
+    base: str | None = None,
+    loader: DocumentLoader | None = None,
+):
+    """
+    Reads an openapi schema from a json text stream incrementally. Path items are
+    parsed one at a time as they are read, and only their parsed operations are
+    kept. Components are read one at a time too, and kept along with the rest of the
+    document so that refs are resolved in it. The other documents refs point to are
+    loaded after it, and resolved along with it.
+
+    :param f: Seekable text stream of the schema, a file or a response in memory
+    :param chunk_size: Number of characters read from the stream at a time
+    :param path_items: Path items of an earlier read by their pattern and the hash of
+        their text, the ones whose text hasn't changed are reused instead of being
+        parsed again. It's updated with the path items of this read.
+    :param base: Path or url of the schema that refs to other documents are relative
+        to, the working directory by default
+    :param loader: Loader of the other documents, see DocumentLoader
+    :return: Whether the schema is parsed, and the spec
+    """
+    spec = APISpec()
+    document: dict[str, Any] = {}
+    loaded_path_items: dict[tuple[str, str], APISpecPathItem] = {}
+    stream = JSONStream(f, chunk_size)
+    for key in stream.iter_object():
+        if key == "paths" and path_items is not None:
+            for pattern in stream.iter_object():
+                operations_dict, text = stream.read_value_text()
+                text_key = (pattern, hashlib.sha256(text.encode()).hexdigest())
+                path_item = path_items.get(text_key)
+                if path_item is None:
+                    path_item = parse_path_item(pattern, operations_dict)
+                loaded_path_items[text_key] = path_item
+                spec.paths.append(path_item)
+        elif key == "paths":
+            for pattern in stream.iter_object():
+                spec.paths.append(parse_path_item(pattern, stream.read_value()))
+        elif key == "components":
+            document[key] = {}
+            for section in stream.iter_object():
+                document[key][section] = {
+                    name: stream.read_value() for name in stream.iter_object()
+                }
+        else:
+            document[key] = stream.read_value()
+
+    # refs into the paths are rare, the path items they point to are read again
+    refs = schema_collect_refs(document)
+    for path_item in spec.paths:
+        for path_op in path_item.operations:
+            refs.extend(path_op.refs)
+    documents, aliases = load_documents(refs, base, loader)
+    for document_index in documents.values():
+        refs.extend(document_index.refs)
+    referred_patterns = {
+        ref.split("/")[2].replace("~1", "/").replace("~0", "~")
+        for ref in refs
+        if ref.startswith("#/paths/")
+    }
+    if referred_patterns:
+        document["paths"] = {}
+        f.seek(0)
+        stream = JSONStream(f, chunk_size)
+        for key in stream.iter_object():
+            if key != "paths":
+                stream.read_value()
+                continue
+            for pattern in stream.iter_object():
+                operations_dict = stream.read_value()
+                if pattern in referred_patterns:
+                    document["paths"][pattern] = operations_dict
+
+    if path_items is not None:
+        # path items that are no longer in the schema are dropped
+        path_items.clear()
+        path_items.update(loaded_path_items)
+    spec.schema_dict = document
+    spec.resolver = RefResolver(document, documents, aliases)
+    parse_document_info(spec, document)
+    return True, spec
+
 
+def reload_documents(
+    spec: APISpec, base: str | None, loader: DocumentLoader | None = None
+):
+    """
+    Loads the documents the refs of a parsed schema point to again, for a spec that
+    is kept while the other documents may change.
+    """
+    refs = list(spec.resolver.refs)
+    for path_item in spec.paths:
+        for path_op in path_item.operations:
+            refs.extend(path_op.refs)
+    spec.resolver.documents = {"": spec.resolver.documents[""]}
+    spec.resolver.aliases = {}
+    spec.resolver.add_documents(*load_documents(refs, base, loader))
+
+
+def load_documents(
+    refs: list[str], base: str | None, loader: DocumentLoader | None = None
+) -> tuple[dict[str, DocumentIndex], dict[str, str]]:
+    """
+    Loads the documents the refs of a schema point to, if any of them points to
+    another document, see DocumentLoader.load.
+    """
+    if all(ref.startswith("#") for ref in refs):
+        return {}, {}
+    if loader is None:
+        loader = DocumentLoader()
+    return loader.load(base, refs)
+
+
+def parse_document_info(spec: APISpec, schema_dict: dict[str, Any]):
     if "openapi" in schema_dict:
         spec.version_openapi = schema_dict["openapi"]
 
@@ -132,80 +565,82 @@ def parse(schema_dict: dict[str, Any]):
         for server in schema_dict["servers"]:
             spec.servers.append(APISpecServer(server["url"], server["description"]))
 
-    if "paths" in schema_dict:
-        for pattern, operations_dict in schema_dict["paths"].items():
-            path_item = APISpecPathItem()
-            path_item.pattern = pattern
-            for method, operation_dict in operations_dict.items():
-                path_op = APISpecPathOperation()
-                path_op.method = method
-
-                if "operationId" in operation_dict:
-                    path_op.operation_id = operation_dict["operationId"]
-                else:
-                    path_op.operation_id = f"{path_pattern_to_snake_case(path_item.pattern)}_{path_op.method}"
-
-                if "parameters" in operation_dict:
-                    for parameter in operation_dict["parameters"]:
-                        parameter_ins = APISpecPathOperationParameter()
-                        parameter_ins.name = parameter["name"]
-                        parameter_ins.kind = parameter["in"]
-                        parameter_ins.required = (
-                            parameter["required"]
-                            if "required" in parameter or parameter["in"] == "path"
-                            else False
-                        )
-                        parameter_ins.schema = parameter["schema"]
-                        path_op.parameters.append(parameter_ins)
-
-                if "requestBody" in operation_dict:
-                    path_op.request_body = APISpecPathOperationRequestBody()
-
-                    if "required" in operation_dict["requestBody"]:
-                        path_op.request_body.required = operation_dict["requestBody"][
-                            "required"
-                        ]
-
-                    if "description" in operation_dict["requestBody"]:
-                        path_op.request_body.description = operation_dict[
-                            "requestBody"
-                        ]["description"]
-
-                    if "content" in operation_dict["requestBody"]:
-                        contents = parse_content(
-                            operation_dict["requestBody"]["content"],
-                            f"{path_op.operation_id}_request_body",
-                        )
-                        path_op.request_body.contents.extend(contents)
-
-                if "responses" in operation_dict:
-                    responses_dict = operation_dict["responses"]
-                    for status_code, response_dict in responses_dict.items():
-                        status_code_num = int(status_code)
-                        op_id_snake_case = (
-                            f"{path_op.operation_id}_response_{status_code}"
-                        )
-                        response = APISpecPathOperationResponse()
-                        response.status_code = status_code
-                        response.description = response_dict["description"]
-
-                        if "content" in response_dict:
-                            contents = parse_content(
-                                response_dict["content"], op_id_snake_case
-                            )
-                            response.contents.extend(contents)
-
-                        if status_code_num in range(301, 309):
-                            empty = {"text/plain": {"schema": {"type": "string"}}}
-                            response.contents.extend(
-                                parse_content(empty, op_id_snake_case)
-                            )
-
-                        path_op.responses.append(response)
-                path_item.operations.append(path_op)
-            spec.paths.append(path_item)
 
-    return True, spec
+def parse_path_item(pattern: str, operations_dict: dict[str, Any]) -> APISpecPathItem:
+    path_item = APISpecPathItem()
+    path_item.pattern = pattern
+    for method, operation_dict in operations_dict.items():
+        path_op = APISpecPathOperation()
+        # names repeated across the operations are interned, so that they're shared
+        path_op.method = intern(method)
+        path_op.digest = content_hash(operation_dict)
+        path_op.refs = [
+            intern(ref) for ref in sorted(set(schema_collect_refs(operation_dict)))
+        ]
+
+        if "operationId" in operation_dict:
+            path_op.operation_id = operation_dict["operationId"]
+        else:
+            path_op.operation_id = (
+                f"{path_pattern_to_snake_case(path_item.pattern)}_{path_op.method}"
+            )
+
+        if "tags" in operation_dict:
+            path_op.tags = [intern(tag) for tag in operation_dict["tags"]]
+
+        if "parameters" in operation_dict:
+            for parameter in operation_dict["parameters"]:
+                parameter_ins = APISpecPathOperationParameter()
+                parameter_ins.name = intern(parameter["name"])
+                parameter_ins.kind = intern(parameter["in"])
+                parameter_ins.required = (
+                    parameter["required"]
+                    if "required" in parameter or parameter["in"] == "path"
+                    else False
+                )
+                parameter_ins.schema = parameter["schema"]
+                path_op.parameters.append(parameter_ins)
+
+        if "requestBody" in operation_dict:
+            path_op.request_body = APISpecPathOperationRequestBody()
+
+            if "required" in operation_dict["requestBody"]:
+                path_op.request_body.required = operation_dict["requestBody"][
+                    "required"
+                ]
+
+            if "description" in operation_dict["requestBody"]:
+                path_op.request_body.description = operation_dict["requestBody"][
+                    "description"
+                ]
+
+            if "content" in operation_dict["requestBody"]:
+                contents = parse_content(
+                    operation_dict["requestBody"]["content"],
+                    f"{path_op.operation_id}_request_body",
+                )
+                path_op.request_body.contents.extend(contents)
+
+        if "responses" in operation_dict:
+            responses_dict = operation_dict["responses"]
+            for status_code, response_dict in responses_dict.items():
+                status_code_num = int(status_code)
+                op_id_snake_case = f"{path_op.operation_id}_response_{status_code}"
+                response = APISpecPathOperationResponse()
+                response.status_code = intern(status_code)
+                response.description = response_dict["description"]
+
+                if "content" in response_dict:
+                    contents = parse_content(response_dict["content"], op_id_snake_case)
+                    response.contents.extend(contents)
+
+                if status_code_num in range(301, 309):
+                    empty = {"text/plain": {"schema": {"type": "string"}}}
+                    response.contents.extend(parse_content(empty, op_id_snake_case))
+
+                path_op.responses.append(response)
+        path_item.operations.append(path_op)
+    return path_item
 
 
 def parse_content(
@@ -214,7 +649,7 @@ def parse_content(
     result = []
     for media_type, content_dict in contents_dict.items():
         content = APISpecPathOperationContent()
-        content.media_type = media_type
+        content.media_type = intern(media_type)
 
         if "examples" in content_dict:
             content.examples = content_dict["examples"]
@@ -0,0 +1,85 @@
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterable
+from sdkops.openapi import APISpec
+
+# the spec sent to each worker process once, refs can't be resolved across processes
+_worker_spec: APISpec | None = None
+
+
+def _init_worker(spec: APISpec):
+    global _worker_spec
+    _worker_spec = spec
+
+
+def worker_spec() -> APISpec:
+    if _worker_spec is None:
+        raise Exception("the openapi schema is only available in the worker processes.")
+    return _worker_spec
+
+
+def default_jobs() -> int:
+    return os.cpu_count() or 1
+
+
+class WorkerPool:
+    """
+    Worker processes that receive the parsed openapi schema once, and generate the operations
+    and classes of large schemas in parallel. Results are returned in the order of
+    their inputs so that the output doesn't depend on the number of workers.
+    """
+
+    def __init__(self, spec: APISpec, jobs: int):
+        self.jobs = jobs
+        self.executor = ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=_init_worker,
+            initargs=(spec,),
+        )
+
+    def map(
+        self, fn: Callable[..., list[Any]], items: Iterable[Any], *args: Any
+    ) -> list[Any]:
+        """
+        Calls the function with chunks of the items in the worker processes, a few
+        chunks per worker to balance the load. The arguments are sent once per chunk.
+
+        :param fn: Function of a module that takes a chunk and the arguments, and
+            returns a list of results. The workers import it by name.
+        :param items: Picklable items
+        :return: List of the results in the order of the items
+        """
+        items = list(items)
+        size = max(1, -(-len(items) // (self.jobs * 4)))
+        chunks = [items[i : i + size] for i in range(0, len(items), size)]
+        results: list[Any] = []
+        for chunk_results in self.executor.map(
+            fn, chunks, *(itertools.repeat(arg, len(chunks)) for arg in args)
+        ):
+            results.extend(chunk_results)
+        return results
+
+    def close(self):
+        self.executor.shutdown()
+
+    def __enter__(self) -> "WorkerPool":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class LocalPool:
+    """
+    Runs the jobs of a WorkerPool in this process, all the items in a single chunk.
+    """
+
+    def __init__(self, spec: APISpec):
+        self.spec = spec
+
+    def map(
+        self, fn: Callable[..., list[Any]], items: Iterable[Any], *args: Any
+    ) -> list[Any]:
+        _init_worker(self.spec)
+        return fn(list(items), *args)
@@ -0,0 +1,139 @@
+import contextlib
+import json
+import time
+import tracemalloc
+from typing import Any, Iterator
+
+REPORT_VERSION = 1
+
+
+class Measurement:
+    def __init__(self, kind: str, name: str):
+        self.kind = kind
+        self.name = name
+        self.calls = 0
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        # bytes allocated at most at once, above what was allocated when it started
+        self.peak_memory = 0
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "wall_time": round(self.wall_time, 6),
+            "cpu_time": round(self.cpu_time, 6),
+            "peak_memory": self.peak_memory,
+        }
+
+
+class Profiler:
+    """
+    Measures the wall time, cpu time and peak traced memory of the phases of a
+    generation, and of each schema and operation in them. Measurements of the same
+    name add up, so an operation generated in several steps is a single entry.
+    Measurements can be nested, the peak memory of each one includes the ones in it.
+    Everything between start and stop is measured as the total.
+    """
+
+    def __init__(self):
+        self.measurements: dict[tuple[str, str], Measurement] = {}
+        self.total = Measurement("total", "total")
+        # peak traced memory seen by each open measurement, the tracemalloc peak is
+        # reset when a measurement starts so the outer ones keep theirs here
+        self.stack: list[list[int]] = []
+        self.started_tracing = False
+        self.start_wall = 0.0
+        self.start_cpu = 0.0
+        self.start_memory = 0
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        self.start_memory = tracemalloc.get_traced_memory()[0]
+        self.stack = [[self.start_memory]]
+        self.start_wall = time.perf_counter()
+        self.start_cpu = time.process_time()
+
+    def stop(self):
+        self.total.wall_time = time.perf_counter() - self.start_wall
+        self.total.cpu_time = time.process_time() - self.start_cpu
+        peak = max(self.stack[0][0], tracemalloc.get_traced_memory()[1])
+        self.total.peak_memory = peak - self.start_memory
+        self.total.calls = 1
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
+
+    @contextlib.contextmanager
+    def measure(self, kind: str, name: str) -> Iterator[Measurement]:
+        """
+        Measures the code in the context.
+
+        :param kind: Either "phase", "schema" or "operation"
+        :param name: Name of the phase, ref of the schema or operation id
+        :return: Measurement the code is added to
+        """
+        key = (kind, name)
+        if key not in self.measurements:
+            self.measurements[key] = Measurement(kind, name)
+        measurement = self.measurements[key]
+
+        start_memory, peak = tracemalloc.get_traced_memory()
+        if self.stack:
+            self.stack[-1][0] = max(self.stack[-1][0], peak)
+        tracemalloc.reset_peak()
+        peaks = [start_memory]
+        self.stack.append(peaks)
+        start_wall = time.perf_counter()
+        start_cpu = time.process_time()
+        try:
+            yield measurement
+        finally:
+            measurement.cpu_time += time.process_time() - start_cpu
+            measurement.wall_time += time.perf_counter() - start_wall
+            self.stack.pop()
+            _memory, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, peaks[0])
+            measurement.peak_memory = max(measurement.peak_memory, peak - start_memory)
+            measurement.calls += 1
+            if self.stack:
+                self.stack[-1][0] = max(self.stack[-1][0], peak)
+
+    def ranked(self, kind: str) -> list[Measurement]:
+        """
+        :return: Measurements of the kind, the most expensive first
+        """
+        measurements = [m for m in self.measurements.values() if m.kind == kind]
+        return sorted(measurements, key=lambda m: (-m.wall_time, m.name))
+
+    def report(self, **details: Any) -> dict[str, Any]:
+        """
+        :param details: Details of the generation to add to the report
+        :return: Json serializable report of the measurements
+        """
+        phases = [m for m in self.measurements.values() if m.kind == "phase"]
+        total = self.total.to_dict()
+        del total["name"], total["calls"]
+        return {
+            "version": REPORT_VERSION,
+            **details,
+            "total": total,
+            "phases": [m.to_dict() for m in phases],
+            "schemas": [m.to_dict() for m in self.ranked("schema")],
+            "operations": [m.to_dict() for m in self.ranked("operation")],
+        }
+
+    def save(self, path: str, **details: Any):
+        with open(path, "w") as f:
+            json.dump(self.report(**details), f, indent=2)
+
+
+def profile(profiler: Profiler | None, kind: str, name: str):
+    """
+    Measures the code in the context if there is a profiler, see Profiler.measure.
+    """
+    if profiler is None:
+        return contextlib.nullcontext()
+    return profiler.measure(kind, name)
@@ -0,0 +1,179 @@
+import hashlib
+import io
+import json
+import os
+import pickle
+import time
+from typing import Any
+from sdkops.openapi import APISpec, read, reload_documents
+
+SPEC_CACHE_VERSION = 4
+
+
+def default_cache_dir() -> str:
+    """
+    :return: Directory to cache the schemas fetched from urls in, $SDKOPS_CACHE_DIR or
+        sdkops in the user cache directory
+    """
+    if os.environ.get("SDKOPS_CACHE_DIR"):
+        return os.environ["SDKOPS_CACHE_DIR"]
+    root = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(root, "sdkops")
+
+
+def cache_max_age(cache_control: str | None) -> int | None:
+    """
+    :param cache_control: Cache-Control header of a response
+    :return: Seconds the response is fresh for, None if it shouldn't be stored
+    """
+    directives = {}
+    for directive in (cache_control or "").split(","):
+        key, _, value = directive.strip().partition("=")
+        directives[key.lower()] = value.strip('"')
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives:
+        return 0
+    try:
+        return max(int(directives.get("max-age", 0)), 0)
+    except ValueError:
+        return 0
+
+
+class SpecCache:
+    """
+    Keeps the schemas fetched from urls by their url, parsed, along with the
+    validators and freshness of their responses. The spec is pickled, so a schema
+    that hasn't changed isn't parsed again, and its entry is a small json file that
+    is read without unpickling it.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = os.path.join(directory, "specs")
+
+    def entry_paths(self, url: str) -> tuple[str, str]:
+        digest = hashlib.sha256(url.encode()).hexdigest()
+        base = os.path.join(self.directory, digest)
+        return f"{base}.json", f"{base}.pickle"
+
+    def entry(self, url: str) -> dict[str, Any] | None:
+        """
+        :return: Validators and freshness of the cached response of the url, None if
+            it isn't cached
+        """
+        entry_path, _spec_path = self.entry_paths(url)
+        try:
+            with open(entry_path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("version") != SPEC_CACHE_VERSION or entry.get("url") != url:
+            return None
+        return entry
+
+    def spec(self, url: str) -> APISpec | None:
+        """
+        :return: Cached spec of the url, None if it isn't cached or can't be read,
+            written by another version for instance
+        """
+        _entry_path, spec_path = self.entry_paths(url)
+        try:
+            with open(spec_path, "rb") as f:
+                spec = pickle.load(f)
+        except Exception:
+            return None
+        return spec if isinstance(spec, APISpec) else None
+
+    def save_entry(self, url: str, entry: dict[str, Any]):
+        entry_path, _spec_path = self.entry_paths(url)
+        self._write(
+            entry_path,
+            json.dumps({**entry, "version": SPEC_CACHE_VERSION, "url": url}).encode(),
+        )
+
+    def save(self, url: str, entry: dict[str, Any], spec: APISpec):
+        """
+        Saves the spec of the url with the validators and freshness of its response.
+        """
+        _entry_path, spec_path = self.entry_paths(url)
+        self._write(spec_path, pickle.dumps(spec, protocol=pickle.HIGHEST_PROTOCOL))
+        self.save_entry(url, entry)
+
+    def _write(self, path: str, data: bytes):
+        os.makedirs(self.directory, exist_ok=True)
+        # other processes may read the entry meanwhile, it's replaced at once
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+
+
+def fetch_spec(url: str, cache: SpecCache | None = None) -> tuple[APISpec, str]:
+    """
+    Fetches a schema from an http endpoint and parses it in memory. The response is
+    compressed in transfer. With a cache, a fresh response by its Cache-Control
+    max-age is used without a request, and a stale one is revalidated with its ETag
+    or Last-Modified; if the schema hasn't been modified, the cached spec is used
+    without fetching or parsing it again. The documents its refs point to are
+    loaded each time, they may have changed.
+
+    :param cache: Cache of the fetched schemas, None to always fetch them
+    :return: Spec and where it comes from, either "cache", "not modified" or "fetched"
+    """
+    import httpx
+
+    entry = cache.entry(url) if cache is not None else None
+    headers = {}
+    if entry is not None:
+        if time.time() < entry["fetched_at"] + entry["max_age"]:
+            spec = cache.spec(url)
+            if spec is not None:
+                reload_documents(spec, url)
+                return spec, "cache"
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    # httpx asks for gzip and deflate encoded responses and decodes them
+    r = httpx.get(url, headers=headers)
+    max_age = cache_max_age(r.headers.get("Cache-Control"))
+    if r.status_code == 304 and entry is not None:
+        spec = cache.spec(url)
+        if spec is not None:
+            entry["fetched_at"] = time.time()
+            entry["max_age"] = max_age or 0
+            entry["etag"] = r.headers.get("ETag", entry.get("etag"))
+            entry["last_modified"] = r.headers.get(
+                "Last-Modified", entry.get("last_modified")
+            )
+            cache.save_entry(url, entry)
+            reload_documents(spec, url)
+            return spec, "not modified"
+        # the spec is gone, it's fetched without the validators
+        r = httpx.get(url)
+        max_age = cache_max_age(r.headers.get("Cache-Control"))
+    if r.status_code < 200 or r.status_code >= 300:
+        raise Exception(
+            f'couldn\'t fetch the schema from "{url}". http request failed with status code {r.status_code}.'
+        )
+    try:
+        _success, spec = read(io.StringIO(r.text), base=url)
+    except ValueError:
+        raise Exception(f'the schema fetched from "{url}" is not a json.')
+
+    validators = {
+        "etag": r.headers.get("ETag"),
+        "last_modified": r.headers.get("Last-Modified"),
+    }
+    if (
+        cache is not None
+        and max_age is not None
+        and (max_age or any(validators.values()))
+    ):
+        cache.save(
+            url, {**validators, "fetched_at": time.time(), "max_age": max_age}, spec
+        )
+    return spec, "fetched"
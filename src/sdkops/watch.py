@@ -0,0 +1,430 @@
+import json
+import os
+import selectors
+import socket
+import time
+from typing import Any, Callable, Iterable
+import click
+from sdkops.api import (
+    GenerationResult,
+    check_last_generation,
+    generate_modules,
+    read_spec,
+    verify_base_url,
+    verify_sdk_name,
+    write_modules,
+)
+from sdkops.cache import GenerationCache
+from sdkops.documents import DocumentLoader, is_url
+from sdkops.json_schema import ClassRegistry, content_hash
+from sdkops.openapi import APISpec, APISpecPathItem
+from sdkops.parallel import LocalPool
+
+
+def file_stat(path: str) -> tuple[int, int]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return (0, 0)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class MemoPool(LocalPool):
+    """
+    Runs the jobs of a generation in this process and remembers the result of each
+    item by the hash of its inputs. Items of unchanged operations and components are
+    neither generated nor laid out again.
+    """
+
+    def __init__(self, spec: APISpec, inputs: dict[str, Any], memo: dict[str, Any]):
+        super().__init__(spec)
+        self.inputs = inputs
+        self.memo = memo
+        self.used: dict[str, Any] = {}
+        self.hits = 0
+
+    def item_key(self, fn: Callable, item: Any, args_hash: str) -> str:
+        if isinstance(item[0], int):
+            # operations are sent by their position in the spec
+            path_index, operation_index = item
+            operation = self.spec.paths[path_index].operations[operation_index]
+            digest = self.inputs["operations"][operation.operation_id]
+        else:
+            ref, ref_class_names = item
+            digest = content_hash([self.inputs["components"][ref], ref_class_names])
+        return f"{fn.__name__}:{digest}:{args_hash}"
+
+    def map(
+        self, fn: Callable[..., list[Any]], items: Iterable[Any], *args: Any
+    ) -> list[Any]:
+        items = list(items)
+        args_hash = content_hash(list(args))
+        keys = [self.item_key(fn, item, args_hash) for item in items]
+        missing = [item for item, key in zip(items, keys) if key not in self.memo]
+        results = iter(super().map(fn, missing, *args)) if missing else iter(())
+        output = []
+        for key in keys:
+            if key in self.memo:
+                self.hits += 1
+            else:
+                self.memo[key] = next(results)
+            # merging the results of the jobs leaves them as they are, so they're shared
+            self.used[key] = self.memo[key]
+            output.append(self.memo[key])
+        return output
+
+
+class Watcher:
+    """
+    Keeps the cache of an sdk and the generated definitions of its operations and
+    components in memory, and regenerates it when its schema file, or a file its refs
+    point to, changes.
+    """
+
+    def __init__(
+        self,
+        schema: str,
+        name: str,
+        dest: str,
+        base_url: str | None = None,
+        package: bool = False,
+        group_by: str = "tag",
+        asynchronous: bool = False,
+        models: str = "dict",
+    ):
+        verify_sdk_name(name)
+        if not os.path.isdir(dest):
+            raise Exception(f"directory {dest} does not exist.")
+        self.schema = schema
+        self.name = name
+        self.dest = dest
+        self.base_url = base_url
+        self.package = package
+        self.group_by = group_by
+        self.asynchronous = asynchronous
+        self.models = models
+        self.cache: GenerationCache | None = None
+        self.memo: dict[str, Any] = {}
+        self.path_items: dict[tuple[str, str], APISpecPathItem] = {}
+        self.loader = DocumentLoader()
+        # local documents the refs of the schema point to
+        self.documents: list[str] = []
+        # cache, inputs and files of a generation that isn't saved to the file yet
+        self.unsaved: tuple[GenerationCache, dict[str, Any], dict[str, str]] | None = (
+            None
+        )
+        self.stats: dict[str, tuple[int, int]] = {}
+
+    def watched_files(self) -> list[str]:
+        return [self.schema, *self.documents]
+
+    def changed_files(self) -> list[str]:
+        """
+        :return: Watched files that have changed since the last time they're checked
+        """
+        changed = []
+        for path in self.watched_files():
+            current = file_stat(path)
+            if self.stats.get(path) != current:
+                self.stats[path] = current
+                changed.append(path)
+        return changed
+
+    def regenerate(self) -> GenerationResult:
+        """
+        Generates the sdk again if its schema, options or files have changed since the
+        last generation.
+        """
+        spec = read_spec(self.schema, self.path_items, self.loader)
+        self.documents = [
+            self.loader.locations[key]
+            for key in spec.resolver.documents
+            if key and not is_url(self.loader.locations[key])
+        ]
+        for path in self.documents:
+            # documents found by this generation are watched from now on
+            self.stats.setdefault(path, file_stat(path))
+        base_url = verify_base_url(spec, self.base_url)
+        result = GenerationResult(self.name)
+        inputs, cache, result.stale_reasons = check_last_generation(
+            spec,
+            self.name,
+            base_url,
+            self.package,
+            self.group_by,
+            self.dest,
+            self.cache,
+            self.asynchronous,
+            self.models,
+        )
+        self.cache = cache
+        if result.up_to_date:
+            return result
+        class_registry = ClassRegistry()
+        pool = MemoPool(spec, inputs, self.memo)
+        modules = generate_modules(
+            spec,
+            self.name,
+            base_url,
+            self.package,
+            self.group_by,
+            class_registry,
+            pool,
+            asynchronous=self.asynchronous,
+            models=self.models,
+        )
+        result.files, result.written = write_modules(modules, self.dest, cache)
+        result.reused = cache.hits + pool.hits
+        result.merged_classes = len(class_registry.aliases)
+        cache.record(inputs, result.files)
+        self.unsaved = (cache, inputs, result.files)
+        # definitions of the operations and components that no longer exist are dropped
+        self.memo = pool.used
+        return result
+
+    def save(self):
+        """
+        Saves the cache of the last generation, if it isn't saved yet. Saving it takes
+        about as long as a generation of a few changes, so it's left until there's
+        nothing else to do.
+        """
+        if self.unsaved is not None:
+            cache, inputs, files = self.unsaved
+            cache.save(inputs, files)
+            self.unsaved = None
+
+
+def result_to_dict(result: GenerationResult, wall_time: float) -> dict[str, Any]:
+    return {
+        "status": "up to date" if result.up_to_date else "generated",
+        "stale_reasons": result.stale_reasons,
+        "files": len(result.files),
+        "written": result.written,
+        "reused": result.reused,
+        "wall_time": round(wall_time, 6),
+    }
+
+
+class WatchServer:
+    """
+    Regenerates the sdk of a watcher when its files change, and on the requests of a
+    unix socket. Requests and responses are json objects, one per line:
+    {"command": "generate"} regenerates the sdk if it is out of date, {"command":
+    "status"} returns the result of the last generation and {"command": "stop"}
+    stops the server.
+    """
+
+    def __init__(
+        self,
+        watcher: Watcher,
+        socket_path: str | None = None,
+        interval: float = 0.2,
+        echo: Callable[[str], None] = lambda message: None,
+    ):
+        self.watcher = watcher
+        self.socket_path = socket_path
+        self.interval = interval
+        self.echo = echo
+        self.last_result: dict[str, Any] = {}
+        self.running = False
+        self.selector = selectors.DefaultSelector()
+        self.buffers: dict[socket.socket, bytes] = {}
+
+    def regenerate(self) -> dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            result = self.watcher.regenerate()
+        except Exception as e:
+            self.last_result = {"status": "failed", "error": str(e)}
+        else:
+            self.last_result = result_to_dict(result, time.perf_counter() - start)
+        self.echo(self.describe(self.last_result))
+        return self.last_result
+
+    @staticmethod
+    def describe(result: dict[str, Any]) -> str:
+        if result["status"] == "failed":
+            return f"generation failed. {result['error']}"
+        if result["status"] == "up to date":
+            return "the sdk is up to date."
+        return (
+            f"the sdk is generated in {result['wall_time'] * 1000:.0f}ms, "
+            f"{result['written']} of {result['files']} files changed, "
+            f"{result['reused']} definitions reused."
+        )
+
+    def handle(self, request: dict[str, Any]) -> dict[str, Any]:
+        command = request.get("command")
+        if command == "generate":
+            self.watcher.changed_files()
+            return self.regenerate()
+        if command == "status":
+            return self.last_result
+        if command == "stop":
+            self.running = False
+            return {"status": "stopping"}
+        return {"status": "failed", "error": f"unknown command {command!r}."}
+
+    def serve(self):
+        """
+        Generates the sdk, then watches its files and serves the socket until a stop
+        request or an interrupt.
+        """
+        server = None
+        if self.socket_path is not None:
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            server.bind(self.socket_path)
+            server.listen()
+            server.setblocking(False)
+            self.selector.register(server, selectors.EVENT_READ)
+        self.watcher.changed_files()
+        self.regenerate()
+        self.running = True
+        try:
+            while self.running:
+                events = self.selector.select(self.interval)
+                for key, _events in events:
+                    if key.fileobj is server:
+                        connection, _address = server.accept()
+                        connection.setblocking(False)
+                        self.buffers[connection] = b""
+                        self.selector.register(connection, selectors.EVENT_READ)
+                    else:
+                        self.read(key.fileobj)
+                changed = self.watcher.changed_files()
+                if changed and self.running:
+                    self.echo(f"{', '.join(changed)} changed.")
+                    self.regenerate()
+                elif not events:
+                    self.watcher.save()
+        finally:
+            self.watcher.save()
+            for connection in list(self.buffers):
+                self.close(connection)
+            if server is not None:
+                self.selector.unregister(server)
+                server.close()
+                os.remove(self.socket_path)
+
+    def read(self, connection: socket.socket):
+        try:
+            data = connection.recv(65536)
+        except OSError:
+            data = b""
+        if not data:
+            self.close(connection)
+            return
+        self.buffers[connection] += data
+        while b"\n" in self.buffers[connection]:
+            line, self.buffers[connection] = self.buffers[connection].split(b"\n", 1)
+            try:
+                response = self.handle(json.loads(line))
+            except ValueError:
+                response = {"status": "failed", "error": "the request is not a json."}
+            connection.setblocking(True)
+            connection.sendall(json.dumps(response).encode() + b"\n")
+            connection.setblocking(False)
+
+    def close(self, connection: socket.socket):
+        self.selector.unregister(connection)
+        del self.buffers[connection]
+        connection.close()
+
+
+def send_request(socket_path: str, command: str, timeout: float = 60) -> dict[str, Any]:
+    """
+    Sends a request to a watch server and waits for its response.
+
+    :param socket_path: Path of the unix socket of the server
+    :param command: Either "generate", "status" or "stop"
+    :return: Response of the server
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(timeout)
+        client.connect(socket_path)
+        client.sendall(json.dumps({"command": command}).encode() + b"\n")
+        data = b""
+        while not data.endswith(b"\n"):
+            chunk = client.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    return json.loads(data)
+
+
+@click.command("watch", short_help="regenerates a python sdk when its schema changes.")
+@click.argument("file", nargs=1)
+@click.option("-n", "--name", required=True, help="sdk package name.")
+@click.option("-d", "--dest", required=True, help="directory to save the sdk package.")
+@click.option(
+    "-u",
+    "--url",
+    required=False,
+    help="base url for the sdk endpoints. chosen from servers section of the schema by default.",
+)
+@click.option(
+    "-p",
+    "--package",
+    is_flag=True,
+    help="save the sdk as a package with a module per operation group, imported on first access.",
+)
+@click.option(
+    "--group-by",
+    type=click.Choice(["tag", "path"]),
+    default="tag",
+    help="how operations are grouped into modules of the package. tag by default.",
+)
+@click.option(
+    "--async",
+    "asynchronous",
+    is_flag=True,
+    help="generate an sdk on httpx.AsyncClient, with async operation methods.",
+)
+@click.option(
+    "--models",
+    type=click.Choice(["dict", "slots"]),
+    default="dict",
+    help="how model classes are generated, dict subclasses or slotted classes with to_dict. dict by default.",
+)
+@click.option(
+    "--socket",
+    "socket_path",
+    required=False,
+    help="path of a unix socket to accept generate, status and stop requests on.",
+)
+@click.option(
+    "--interval",
+    type=float,
+    default=0.2,
+    help="seconds between the checks of the schema file. 0.2 by default.",
+)
+def watch(
+    file: str,
+    name: str,
+    dest: str,
+    url: str = None,
+    package: bool = False,
+    group_by: str = "tag",
+    asynchronous: bool = False,
+    models: str = "dict",
+    socket_path: str = None,
+    interval: float = 0.2,
+):
+    """
+    FILE is an open api schema file path. The sdk is generated, then generated again
+    each time the file changes, until the process is interrupted.
+    """
+    watcher = Watcher(file, name, dest, url, package, group_by, asynchronous, models)
+    server = WatchServer(watcher, socket_path, interval, click.echo)
+    click.echo(f'watching "{file}"...')
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        pass
+    click.echo(f'watching "{file}"... done.')
+
+
+if __name__ == "__main__":
+    watch()
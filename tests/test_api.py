@@ -0,0 +1,83 @@
+import json
+import os
+import pytest
+from click.testing import CliRunner
+from sdkops.api import generate_sdk, generate_sources
+from sdkops.cli import generate
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), "schema_sample1.json")
+
+
+def load_sample() -> dict:
+    with open(SAMPLE_PATH) as f:
+        return json.load(f)
+
+
+def test_generate_sources_matches_cli(tmp_path):
+    for package in (False, True):
+        dest = tmp_path / f"package_{package}"
+        dest.mkdir()
+        args = [SAMPLE_PATH, "-n", "sample", "-d", str(dest), "-u", "http://x"]
+        result = CliRunner().invoke(generate, args + (["-p"] if package else []))
+        assert result.exit_code == 0, result.output
+
+        sources = generate_sources(
+            load_sample(), "sample", base_url="http://x", package=package
+        )
+        assert sources == {
+            file_name: (dest / file_name).read_text() for file_name in sources
+        }
+        assert not any(name.endswith(".py") for name in os.listdir(tmp_path))
+    assert generate_sources(SAMPLE_PATH, "sample", "http://x") == {
+        "sample.py": (tmp_path / "package_False" / "sample.py").read_text()
+    }
+
+
+def test_generate_sources_errors():
+    with pytest.raises(Exception, match="snake case"):
+        generate_sources(load_sample(), "Sample", "http://x")
+
+
+def test_generate_selected_operations(tmp_path):
+    args = [SAMPLE_PATH, "-n", "sample", "-d", str(tmp_path), "-u", "http://x"]
+    result = CliRunner().invoke(
+        generate, args + ["--tag", "user", "--path-prefix", "/"]
+    )
+    assert result.exit_code == 0, result.output
+    assert "6 operations" in result.output
+    result = CliRunner().invoke(generate, args + ["--tag", "user"])
+    assert result.exit_code == 0, result.output
+    assert "1 operations and 1 component schemas" in result.output
+    sources = generate_sources(SAMPLE_PATH, "sample", "http://x", tags=["user"])
+    assert sources["sample.py"] == (tmp_path / "sample.py").read_text()
+    assert "def user_status(" in sources["sample.py"]
+    assert "def home(" not in sources["sample.py"]
+
+    with pytest.raises(ValueError, match="no operations match"):
+        generate_sources(SAMPLE_PATH, "sample", "http://x", tags=["missing"])
+    with pytest.raises(ValueError, match="no operations with the ids missing"):
+        generate_sources(SAMPLE_PATH, "sample", "http://x", operation_ids=["missing"])
+
+
+def test_generate_sdk(tmp_path):
+    result = generate_sdk(SAMPLE_PATH, "sample", str(tmp_path), "http://x")
+    assert result.stale_reasons and result.written == 1
+    assert list(result.files) == ["sample.py"]
+
+    result = generate_sdk(SAMPLE_PATH, "sample", str(tmp_path), "http://x")
+    assert result.up_to_date and result.written == 0
+
+
+def test_verify_format(tmp_path, monkeypatch):
+    black = pytest.importorskip("black")
+    args = [SAMPLE_PATH, "-n", "sample", "-d", str(tmp_path), "-u", "http://x"]
+    for package in (["-p"], []):
+        result = CliRunner().invoke(generate, args + package + ["--verify-format"])
+        assert result.exit_code == 0, result.output
+
+    source = (tmp_path / "sample.py").read_text()
+    monkeypatch.setattr(black, "format_str", lambda source, mode: source + "\n")
+    result = CliRunner().invoke(generate, args + ["--async", "--verify-format"])
+    assert result.exit_code == 1
+    assert "black formats sample.py differently." in result.output
+    assert (tmp_path / "sample.py").read_text() == source
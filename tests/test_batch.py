@@ -0,0 +1,79 @@
+import json
+import multiprocessing
+import os
+import pytest
+from click.testing import CliRunner
+from sdkops import batch as batch_module
+from sdkops.batch import batch, read_manifest, run_batch
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), "schema_sample1.json")
+
+
+def write_manifest(tmp_path) -> str:
+    (tmp_path / "broken.json").write_text("{")
+    for dest in ("one", "two", "three"):
+        (tmp_path / dest).mkdir()
+    entries = [
+        {"spec": SAMPLE_PATH, "name": "one", "dest": "one", "url": "http://x"},
+        {"spec": "broken.json", "name": "two", "dest": "two", "url": "http://x"},
+        {
+            "spec": SAMPLE_PATH,
+            "name": "three",
+            "dest": "three",
+            "url": "http://x",
+            "package": True,
+        },
+    ]
+    manifest_path = tmp_path / "manifest.json"
+    manifest_path.write_text(json.dumps({"sdks": entries}))
+    return str(manifest_path)
+
+
+def test_batch_keeps_going_after_failures(tmp_path):
+    manifest_path = write_manifest(tmp_path)
+    report_path = tmp_path / "report.json"
+    runner = CliRunner()
+    result = runner.invoke(batch, [manifest_path, "--report", str(report_path)])
+    assert result.exit_code == 1, result.output
+
+    report = json.loads(report_path.read_text())
+    statuses = [(sdk["name"], sdk["status"]) for sdk in report["sdks"]]
+    assert statuses == [("one", "generated"), ("two", "failed"), ("three", "generated")]
+    assert (tmp_path / "one" / "one.py").is_file()
+    assert (tmp_path / "three" / "three" / "__init__.py").is_file()
+    assert all(sdk["wall_time"] > 0 for sdk in report["sdks"])
+
+
+def test_batch_in_worker_processes(tmp_path):
+    entries = read_manifest(write_manifest(tmp_path))
+    serial = [result["status"] for result in run_batch(entries, 1, check=True)]
+    parallel = run_batch(entries, 2)
+    assert serial == ["out of date", "failed", "out of date"]
+    assert [result["status"] for result in parallel] == [
+        "generated",
+        "failed",
+        "generated",
+    ]
+    assert [result["status"] for result in run_batch(entries, 1, check=True)] == [
+        "up to date",
+        "failed",
+        "up to date",
+    ]
+
+
+def test_batch_reports_entries_of_dead_workers(tmp_path, monkeypatch):
+    if multiprocessing.get_start_method() != "fork":
+        pytest.skip("the workers don't inherit the patched generate_sdk.")
+    generate_sdk = batch_module.generate_sdk
+
+    def dying_generate_sdk(schema: str, name: str, *args, **kwargs):
+        if name == "three":
+            os._exit(1)
+        return generate_sdk(schema, name, *args, **kwargs)
+
+    monkeypatch.setattr(batch_module, "generate_sdk", dying_generate_sdk)
+    entries = read_manifest(write_manifest(tmp_path))
+    results = run_batch(entries, 2)
+    assert [result["name"] for result in results] == ["one", "two", "three"]
+    assert results[1]["status"] == results[2]["status"] == "failed"
+    assert "terminated abruptly" in results[2]["error"]
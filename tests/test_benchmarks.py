@@ -0,0 +1,39 @@
+import json
+from benchmarks.__main__ import PHASES, compare, run_scenario
+from benchmarks.decoding import run_decoding
+from benchmarks.synthetic import Scenario, synthetic_spec
+
+
+def test_synthetic_spec_shape():
+    scenario = Scenario("tiny", paths=4, components=3, any_of=3, ref_density=0.5)
+    schema_dict = synthetic_spec(scenario)
+    assert len(schema_dict["paths"]) == 4
+    assert len(schema_dict["components"]["schemas"]) == 3
+    assert synthetic_spec(scenario) == schema_dict
+    assert '"anyOf"' in json.dumps(schema_dict)
+    assert '"$ref"' in json.dumps(schema_dict)
+
+
+def test_run_scenario_and_compare():
+    results = {"tiny": run_scenario(Scenario("tiny", paths=3, components=2), 1)}
+    assert list(results["tiny"]) == PHASES
+    for result in results["tiny"].values():
+        assert result["wall_time"] >= 0 and result["peak_memory"] >= 0
+
+    assert compare(results, results, 0.25, 0.1) == []
+    baselines = {
+        "tiny": {
+            phase: {"wall_time": result["wall_time"] / 2, "peak_memory": 0}
+            for phase, result in results["tiny"].items()
+        }
+    }
+    regressions = compare(results, baselines, 0.25, 0.1)
+    assert any("tiny generate ast: wall_time" in message for message in regressions)
+
+
+def test_run_decoding():
+    results = run_decoding(50, 1)
+    assert "response.json()" in results
+    assert "dict models, json" in results and "slots models, json" in results
+    for result in results.values():
+        assert result["wall_time"] > 0 and result["items_per_second"] > 0
@@ -0,0 +1,105 @@
+import json
+import os
+from click.testing import CliRunner
+from sdkops import cache, emitter, generator
+from sdkops.cli import generate
+from sdkops.openapi import parse
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), "schema_sample1.json")
+
+
+def load_sample() -> dict:
+    with open(SAMPLE_PATH) as f:
+        return json.load(f)
+
+
+def sample_inputs(schema_dict: dict) -> tuple:
+    success, spec = parse(schema_dict)
+    assert success
+    component_refs = list(
+        generator.collect_component_class_names(spec.schema_dict, "sample")
+    )
+    return spec, cache.input_hashes(spec, {"name": "sample"}, component_refs)
+
+
+def test_operation_hashes_follow_refs():
+    schema_dict = load_sample()
+    _spec, inputs = sample_inputs(schema_dict)
+
+    # a component only the project operations refer to
+    schema_dict["components"]["schemas"]["Project"]["properties"]["extra"] = {
+        "type": "string"
+    }
+    _spec, changed_inputs = sample_inputs(schema_dict)
+
+    changed = {
+        operation_id
+        for operation_id, value in inputs["operations"].items()
+        if changed_inputs["operations"][operation_id] != value
+    }
+    assert changed == {"project_get", "project_list"}
+    assert (
+        changed_inputs["components"]["#/components/schemas/Project"]
+        != inputs["components"]["#/components/schemas/Project"]
+    )
+    assert (
+        changed_inputs["components"]["#/components/schemas/ValidationError"]
+        == inputs["components"]["#/components/schemas/ValidationError"]
+    )
+
+
+def test_fragments_are_reused(tmp_path):
+    spec, inputs = sample_inputs(load_sample())
+    root = generator.to_ast(spec, "sample", base_url="http://localhost")
+    path = str(tmp_path / "cache.json")
+
+    first = cache.GenerationCache.load(path, inputs["operations"])
+    source = emitter.format_module(root, first, first.fragment_key)
+    assert source == emitter.format_module(root)
+    assert first.hits == 0
+    first.save(inputs, {})
+
+    second = cache.GenerationCache.load(path, inputs["operations"])
+    assert emitter.format_module(root, second, second.fragment_key) == source
+    assert second.hits == len(first.used)
+    assert set(second.used) == set(first.used)
+
+
+def test_generate_leaves_unchanged_output_untouched(tmp_path):
+    spec_path = tmp_path / "schema.json"
+    spec_path.write_text(json.dumps(load_sample()))
+    dest = tmp_path / "out"
+    dest.mkdir()
+    args = [str(spec_path), "-n", "sample", "-d", str(dest), "-u", "http://localhost"]
+    runner = CliRunner()
+
+    result = runner.invoke(generate, args)
+    assert result.exit_code == 0, result.output
+    output_path = dest / "sample.py"
+    os.utime(output_path, (0, 0))
+
+    result = runner.invoke(generate, [*args, "--check"])
+    assert result.exit_code == 0, result.output
+    result = runner.invoke(generate, args)
+    assert result.exit_code == 0, result.output
+    assert "nothing to regenerate" in result.output
+    assert os.stat(output_path).st_mtime == 0
+
+    schema_dict = load_sample()
+    schema_dict["paths"]["/"]["get"]["operationId"] = "index"
+    spec_path.write_text(json.dumps(schema_dict))
+    result = runner.invoke(generate, [*args, "--check"])
+    assert result.exit_code == 1, result.output
+    assert "operations have changed: home, index" in result.output
+
+    result = runner.invoke(generate, args)
+    assert result.exit_code == 0, result.output
+    assert "def index(" in output_path.read_text()
+
+    # same as a generation without a cache
+    fresh_dest = tmp_path / "fresh"
+    fresh_dest.mkdir()
+    fresh_args = [*args[:4], str(fresh_dest), *args[5:]]
+    result = runner.invoke(generate, fresh_args)
+    assert result.exit_code == 0, result.output
+    assert output_path.read_text() == (fresh_dest / "sample.py").read_text()
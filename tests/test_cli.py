@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+
+# cumulative import time of sdkops.cli in microseconds, httpx alone takes more
+IMPORT_BUDGET = 50_000
+DEFERRED_MODULES = ["httpx", "rich", "sdkops.generator", "sdkops.openapi"]
+
+
+def run_python(code: str) -> subprocess.CompletedProcess:
+    src_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src")
+    env = {**os.environ, "PYTHONPATH": src_path}
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+
+
+def test_cli_defers_heavy_imports():
+    result = run_python(
+        "import sys, sdkops.cli; "
+        f"print([name for name in {DEFERRED_MODULES!r} if name in sys.modules])"
+    )
+    assert result.stdout.strip() == "[]"
+
+
+def test_cli_import_time_budget():
+    # the best of a few runs, a busy machine only makes a run slower
+    timings = []
+    for _ in range(3):
+        result = run_python("import sdkops.cli")
+        for line in result.stderr.splitlines():
+            if line.rstrip().endswith("| sdkops.cli"):
+                timings.append(int(line.split("|")[1]))
+    assert timings and min(timings) < IMPORT_BUDGET
+
+
+def test_help_doesnt_import_the_generator():
+    result = run_python(
+        "import sys\n"
+        "from click.testing import CliRunner\n"
+        "from sdkops.cli import generate\n"
+        "assert CliRunner().invoke(generate, ['--help']).exit_code == 0\n"
+        "print('sdkops.generator' in sys.modules)"
+    )
+    assert result.stdout.strip() == "False"
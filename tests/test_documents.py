@@ -0,0 +1,211 @@
+import functools
+import json
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+import httpx
+import pytest
+from sdkops.api import generate_sources
+from sdkops.documents import DocumentLoader
+from sdkops.openapi import load
+from sdkops.watch import Watcher
+
+
+def response(schema: dict) -> dict:
+    return {
+        "200": {
+            "description": "",
+            "content": {"application/json": {"schema": schema}},
+        }
+    }
+
+
+def write_documents(root, common_ref: str = "common.json") -> str:
+    main = {
+        "openapi": "3.1.0",
+        "info": {"title": "split", "version": "1"},
+        "servers": [{"url": "http://x", "description": ""}],
+        "paths": {
+            "/users/{id}": {
+                "get": {
+                    "operationId": "get_user",
+                    "parameters": [
+                        {
+                            "name": "id",
+                            "in": "path",
+                            "required": True,
+                            "schema": {"$ref": f"{common_ref}#/components/schemas/Id"},
+                        }
+                    ],
+                    "responses": response({"$ref": "#/components/schemas/UserPage"}),
+                }
+            }
+        },
+        "components": {
+            "schemas": {
+                "UserPage": {
+                    "type": "object",
+                    "properties": {
+                        "user": {"$ref": f"{common_ref}#/components/schemas/User"},
+                        "next": {"type": "string"},
+                    },
+                }
+            }
+        },
+    }
+    common = {
+        "components": {
+            "schemas": {
+                "Id": {"type": "string"},
+                "User": {
+                    "type": "object",
+                    "properties": {
+                        "id": {"$ref": "#/components/schemas/Id"},
+                        "address": {"$ref": "nested/extra.json#/Address"},
+                    },
+                    "required": ["id"],
+                },
+            }
+        }
+    }
+    extra = {
+        "Address": {
+            "type": "object",
+            "properties": {
+                "street": {"type": "string"},
+                "page": {"$ref": "../main.json#/components/schemas/UserPage"},
+            },
+        }
+    }
+    (root / "nested").mkdir(exist_ok=True)
+    (root / "main.json").write_text(json.dumps(main))
+    (root / "common.json").write_text(json.dumps(common))
+    (root / "nested" / "extra.json").write_text(json.dumps(extra))
+    return str(root / "main.json")
+
+
+def test_refs_resolve_across_documents(tmp_path):
+    main_path = write_documents(tmp_path, "./common.json")
+    _success, spec = load(main_path)
+    assert sorted(spec.resolver.documents) == ["", "common.json", "nested/extra.json"]
+    user, _trace = spec.resolver.resolve("./common.json#/components/schemas/User")
+    # refs of the other documents are rebased to the keys of the documents
+    assert user["properties"]["id"]["$ref"] == "common.json#/components/schemas/Id"
+    assert user["properties"]["address"]["$ref"] == "nested/extra.json#/Address"
+    address, _trace = spec.resolver.resolve(user["properties"]["address"]["$ref"])
+    assert address["properties"]["page"]["$ref"] == "#/components/schemas/UserPage"
+    # the schema isn't bundled, the other documents are kept apart
+    assert "Address" not in json.dumps(spec.schema_dict)
+
+    source = generate_sources(main_path, "split")["split.py"]
+    assert "class SplitUserPageUser(dict):" in source
+    assert "self.address: SplitUserPageAddress = address" in source
+    assert 'self.page: "SplitUserPage" = page' in source
+    assert "def get_user(self, id=None" in source
+
+
+def test_arrays_of_objects_of_other_documents(tmp_path):
+    main_path = write_documents(tmp_path)
+    with open(main_path) as f:
+        main = json.load(f)
+    main["paths"]["/users"] = {
+        "get": {
+            "operationId": "list_users",
+            "responses": response(
+                {
+                    "type": "array",
+                    "items": {"$ref": "common.json#/components/schemas/User"},
+                }
+            ),
+        }
+    }
+    with open(main_path, "w") as f:
+        json.dump(main, f)
+
+    source = generate_sources(main_path, "split", "http://x")["split.py"]
+    namespace = {}
+    exec(compile(source, "split.py", "exec"), namespace)
+    users = [{"id": "1", "address": {"street": "a"}}]
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, json=users))
+    sdk = namespace["Split"](transport=transport)
+    user_class = namespace["SplitListUsersResponse200"]
+    for user in [*sdk.list_users(), *sdk.iter_list_users()]:
+        assert isinstance(user, user_class)
+        assert isinstance(user.address, namespace["SplitListUsersResponse200Address"])
+        assert user.address.street == "a"
+
+
+def test_loader_reuses_unchanged_documents(tmp_path):
+    main_path = write_documents(tmp_path)
+    loader = DocumentLoader()
+    load(main_path, loader=loader)
+    assert loader.hits == 0
+    load(main_path, loader=loader)
+    assert loader.hits == 2
+
+    extra_path = tmp_path / "nested" / "extra.json"
+    extra = json.loads(extra_path.read_text())
+    extra["Address"]["properties"]["city"] = {"type": "string"}
+    extra_path.write_text(json.dumps(extra))
+    _success, spec = load(main_path, loader=loader)
+    assert loader.hits == 1
+    address, _trace = spec.resolver.resolve("nested/extra.json#/Address")
+    assert "city" in address["properties"]
+
+
+def test_refs_to_urls(tmp_path):
+    write_documents(tmp_path)
+    handler = functools.partial(SimpleHTTPRequestHandler, directory=str(tmp_path))
+    handler.log_message = lambda *args: None
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        base_url = f"http://127.0.0.1:{httpd.server_address[1]}"
+        local = tmp_path / "local"
+        local.mkdir()
+        main_path = write_documents(local, f"{base_url}/common.json")
+        _success, spec = load(main_path)
+        assert sorted(spec.resolver.documents) == [
+            "",
+            f"{base_url}/common.json",
+            f"{base_url}/main.json",
+            f"{base_url}/nested/extra.json",
+        ]
+        source = generate_sources(main_path, "split")["split.py"]
+        assert "self.address: SplitUserPageAddress = address" in source
+
+        (tmp_path / "common.json").unlink()
+        with pytest.raises(Exception, match="status code 404"):
+            load(main_path)
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_missing_document(tmp_path):
+    main_path = write_documents(tmp_path)
+    (tmp_path / "nested" / "extra.json").unlink()
+    with pytest.raises(Exception, match="couldn't read the document"):
+        load(main_path)
+
+
+def test_watcher_watches_documents(tmp_path):
+    main_path = write_documents(tmp_path)
+    dest = tmp_path / "sdk"
+    dest.mkdir()
+    watcher = Watcher(main_path, "split", str(dest))
+    watcher.changed_files()
+    assert not watcher.regenerate().up_to_date
+    assert len(watcher.watched_files()) == 3
+    assert watcher.changed_files() == []
+
+    time.sleep(0.01)
+    common_path = tmp_path / "common.json"
+    common = json.loads(common_path.read_text())
+    common["components"]["schemas"]["User"]["properties"]["name"] = {"type": "string"}
+    common_path.write_text(json.dumps(common))
+    assert watcher.changed_files() == [str(common_path)]
+    result = watcher.regenerate()
+    assert not result.up_to_date and watcher.loader.hits == 1
+    assert "self.name: str = name" in (dest / "split.py").read_text()
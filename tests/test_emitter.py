@@ -0,0 +1,82 @@
+import ast
+import json
+import os
+import black
+from sdkops import emitter, generator
+from sdkops.openapi import parse
+
+SAMPLE_SOURCE = '''
+class Base(dict):
+    """A docstring with "quotes" in it."""
+
+    def __init__(self, name: str, values: list[int] = None, *args, **kwargs):
+        super().__init__(name=name, values=values)
+        self.name: str = name
+
+    def method(self, a, b=1, *, c: int | None = None) -> dict[str, list[int | None]]:
+        return {"a": a, "b": b, **kwargs, "c": [x for x in range(10) if x % 2]}
+
+def very_long_function_name_to_force_a_split(first_argument, second_argument, third_argument):
+    result = first_argument.some_attribute.another_attribute(second_argument)[third_argument]
+    value = first_argument if second_argument is not None and third_argument not in result else None
+    if first_argument and (second_argument or third_argument) and not result and value:
+        raise Exception(f"the {first_argument} failed with {second_argument!r} and {third_argument}")
+    try:
+        return result[1:-1], result[value + 1 :], -(value ** 2), value**2, (3).real
+    except (KeyError, ValueError):
+        pass
+'''
+
+
+def sample_spec():
+    path = os.path.join(os.path.dirname(__file__), "schema_sample1.json")
+    with open(path) as f:
+        success, spec = parse(json.load(f))
+    assert success
+    return spec
+
+
+def unparse_and_format(root: ast.Module) -> str:
+    return black.format_str(ast.unparse(root), mode=black.FileMode())
+
+
+def test_module_matches_black():
+    root = generator.to_ast(sample_spec(), "sample", base_url="http://localhost")
+    assert emitter.format_module(root) == unparse_and_format(root)
+
+
+def test_package_modules_match_black():
+    modules = generator.to_package_ast(
+        sample_spec(), "sample", base_url="http://localhost"
+    )
+    for root in modules.values():
+        assert emitter.format_module(root) == unparse_and_format(root)
+
+
+def test_statements_match_black():
+    root = ast.parse(SAMPLE_SOURCE)
+    assert emitter.format_module(root) == unparse_and_format(root)
+
+
+def test_container_constants_match_black():
+    # the generator uses constants of lists for the defaults of list parameters
+    root = ast.Module(
+        body=[
+            ast.Assign(
+                targets=[ast.Name(id=name, ctx=ast.Store())],
+                value=ast.Constant(value=value),
+                lineno=1,
+            )
+            for name, value in (("a", []), ("b", [1, "x"]), ("c", {"k": [None]}))
+        ],
+        type_ignores=[],
+    )
+    assert emitter.format_module(root) == unparse_and_format(root)
+
+
+def test_write_module(tmp_path):
+    root = generator.to_ast(sample_spec(), "sample", base_url="http://localhost")
+    path = tmp_path / "sample.py"
+    emitter.write_module(root, str(path))
+    assert path.read_text() == emitter.format_module(root)
+    compile(path.read_text(), str(path), "exec")
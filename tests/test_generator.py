@@ -0,0 +1,919 @@
+import ast
+import asyncio
+import importlib
+import json
+import sys
+import typing
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+import pytest
+from sdkops import generator, json_schema
+from sdkops.openapi import parse
+
+
+def create_spec(paths: dict, schemas: dict):
+    success, spec = parse(
+        {
+            "openapi": "3.1.0",
+            "info": {"title": "test", "version": "0.1.0"},
+            "paths": paths,
+            "components": {"schemas": schemas},
+        }
+    )
+    assert success
+    return spec
+
+
+def json_content(schema: dict):
+    return {"content": {"application/json": {"schema": schema}}}
+
+
+def class_names(root: ast.Module) -> list[str]:
+    return [node.name for node in root.body if isinstance(node, ast.ClassDef)]
+
+
+def test_component_classes_are_emitted_once():
+    schemas = {
+        "Page": {
+            "type": "object",
+            "properties": {
+                "items": {
+                    "type": "array",
+                    "items": {"$ref": "#/components/schemas/Item"},
+                },
+                "next": {"type": "string"},
+            },
+            "required": ["items"],
+        },
+        "Item": {
+            "type": "object",
+            "properties": {"id": {"type": "integer"}},
+            "required": ["id"],
+        },
+    }
+    paths = {}
+    for i in range(3):
+        paths[f"/items{i}"] = {
+            "get": {
+                "operationId": f"list_items{i}",
+                "responses": {
+                    "200": {
+                        "description": "",
+                        **json_content({"$ref": "#/components/schemas/Page"}),
+                    }
+                },
+            }
+        }
+    spec = create_spec(paths, schemas)
+
+    root = generator.to_ast(spec, "my_sdk", base_url="http://localhost")
+
+    # dependencies come before the classes that refer to them
+    assert class_names(root) == ["MySdkItem", "MySdkPage"]
+    code = ast.unparse(root)
+    assert "items: list[MySdkItem]" in code
+    assert "MySdkListItems0Response200 = MySdkPage" in code
+    assert "def list_items2(self, headers: dict[str, str]=None) -> MySdkPage:" in code
+
+
+def test_inline_contents_refer_to_component_classes():
+    schemas = {
+        "Error": {
+            "type": "object",
+            "properties": {"code": {"type": "string"}},
+        },
+    }
+    paths = {
+        "/things": {
+            "post": {
+                "operationId": "create_thing",
+                "requestBody": json_content(
+                    {"type": "object", "properties": {"name": {"type": "string"}}}
+                ),
+                "responses": {
+                    "422": {
+                        "description": "",
+                        **json_content(
+                            {
+                                "type": "object",
+                                "properties": {
+                                    "errors": {
+                                        "type": "array",
+                                        "items": {"$ref": "#/components/schemas/Error"},
+                                    }
+                                },
+                            }
+                        ),
+                    }
+                },
+            }
+        }
+    }
+    spec = create_spec(paths, schemas)
+
+    root = generator.to_ast(spec, "my_sdk", base_url="http://localhost")
+
+    assert class_names(root) == [
+        "MySdkError",
+        "MySdkCreateThingRequestBody",
+        "MySdkCreateThingResponse422",
+    ]
+    assert "errors: list[MySdkError]=[]" in ast.unparse(root)
+    # the shared component schema is left untouched
+    assert spec.schema_dict["paths"]["/things"]["post"]["responses"]["422"]["content"][
+        "application/json"
+    ]["schema"]["properties"]["errors"]["items"] == {
+        "$ref": "#/components/schemas/Error"
+    }
+
+
+def test_cyclic_components():
+    schemas = {
+        "Folder": {
+            "type": "object",
+            "properties": {
+                "parent": {
+                    "anyOf": [{"$ref": "#/components/schemas/Folder"}, {"type": "null"}]
+                },
+                "files": {
+                    "type": "array",
+                    "items": {"$ref": "#/components/schemas/File"},
+                },
+            },
+        },
+        "File": {
+            "type": "object",
+            "properties": {"folder": {"$ref": "#/components/schemas/Folder"}},
+        },
+    }
+    paths = {
+        "/folders": {
+            "get": {
+                "operationId": "get_folder",
+                "responses": {
+                    "200": {
+                        "description": "",
+                        **json_content({"$ref": "#/components/schemas/Folder"}),
+                    }
+                },
+            }
+        }
+    }
+    spec = create_spec(paths, schemas)
+
+    root = generator.to_ast(spec, "my_sdk", base_url="http://localhost")
+
+    assert class_names(root) == ["MySdkFile", "MySdkFolder"]
+    code = ast.unparse(root)
+    assert "folder: 'MySdkFolder'=None" in code
+    assert "parent: 'MySdkFolder | None'=None" in code
+    assert "files: list[MySdkFile]=[]" in code
+    # the generated module can be imported even though its classes refer to each other
+    exec(compile(code, "my_sdk.py", "exec"), {})
+
+
+def test_identical_inline_schemas_are_merged():
+    page = {
+        "type": "object",
+        "properties": {
+            "total": {"type": "integer"},
+            "error": {
+                "type": "object",
+                "properties": {"code": {"type": "string"}},
+            },
+        },
+    }
+    paths = {
+        f"/things{i}": {
+            "get": {
+                "operationId": f"list_things{i}",
+                "responses": {"200": {"description": "", **json_content(page)}},
+            }
+        }
+        for i in range(3)
+    }
+    spec = create_spec(paths, {})
+    class_registry = json_schema.ClassRegistry()
+
+    root = generator.to_ast(spec, "my_sdk", None, class_registry)
+
+    assert class_names(root) == [
+        "MySdkListThings0Response200Error",
+        "MySdkListThings0Response200",
+    ]
+    code = ast.unparse(root)
+    assert "MySdkListThings1Response200Error = MySdkListThings0Response200Error" in code
+    assert "MySdkListThings2Response200 = MySdkListThings0Response200" in code
+    assert len(class_registry.aliases) == 4
+
+
+def test_package_modules_are_imported_lazily(tmp_path, monkeypatch):
+    paths = {
+        "/items": {
+            "get": {
+                "tags": ["Item Store"],
+                "operationId": "list_items",
+                "responses": {
+                    "200": {
+                        "description": "",
+                        **json_content({"$ref": "#/components/schemas/Item"}),
+                    }
+                },
+            }
+        },
+        "/health": {
+            "get": {
+                "operationId": "health",
+                "responses": {
+                    "200": {
+                        "description": "",
+                        "content": {"text/plain": {"schema": {"type": "string"}}},
+                    }
+                },
+            }
+        },
+    }
+    schemas = {"Item": {"type": "object", "properties": {"id": {"type": "integer"}}}}
+    spec = create_spec(paths, schemas)
+
+    modules = generator.to_package_ast(spec, "lazy_sdk", "http://localhost")
+
+    assert list(modules) == [
+        "models",
+        "_client",
+        "item_store",
+        "health",
+        "_sdk",
+        "__init__",
+    ]
+    assert "from .models import LazySdkItem" in ast.unparse(modules["item_store"])
+    package_dir = tmp_path / "lazy_sdk"
+    package_dir.mkdir()
+    for module_name, module in modules.items():
+        (package_dir / f"{module_name}.py").write_text(ast.unparse(module))
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    package = importlib.import_module("lazy_sdk")
+    assert "lazy_sdk.models" not in sys.modules
+    assert "lazy_sdk.item_store" not in sys.modules
+
+    assert package.LazySdkItemStoreApi.list_items
+    assert "lazy_sdk.item_store" in sys.modules
+    assert "lazy_sdk.health" not in sys.modules
+    assert package.models.LazySdkItem(id=1) == {"id": 1}
+    assert issubclass(package.LazySdk, package.LazySdkHealthApi)
+    # the instance is served like the one of a single module sdk
+    from lazy_sdk import lazy_sdk
+
+    assert isinstance(lazy_sdk, package.LazySdk)
+
+
+def test_async_sdk_class():
+    paths = {
+        "/items/{id}": {
+            "get": {
+                "operationId": "get_item",
+                "parameters": [
+                    {
+                        "name": "id",
+                        "in": "path",
+                        "required": True,
+                        "schema": {"type": "integer"},
+                    }
+                ],
+                "responses": {
+                    "200": {
+                        "description": "",
+                        **json_content({"$ref": "#/components/schemas/Item"}),
+                    }
+                },
+            }
+        }
+    }
+    schemas = {"Item": {"type": "object", "properties": {"id": {"type": "integer"}}}}
+    spec = create_spec(paths, schemas)
+    root = generator.to_ast(spec, "async_sdk", "http://localhost", asynchronous=True)
+    code = ast.unparse(root)
+    assert "httpx.AsyncClient(" in code
+    assert "async def get_item(self, id=None" in code
+    assert "response = await self._send_request(request)" in code
+
+    namespace = {}
+    exec(compile(code, "async_sdk.py", "exec"), namespace)
+
+    async def handler(request):
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={"id": int(request.url.path.split("/")[-1])})
+
+    async def main():
+        async with namespace["AsyncSdk"](transport=httpx.MockTransport(handler)) as sdk:
+            await sdk.warm_up(connections=0)
+            items = await asyncio.gather(*(sdk.get_item(id) for id in range(50)))
+        assert sdk.client.is_closed
+        return items
+
+    assert asyncio.run(main()) == [{"id": id} for id in range(50)]
+
+
+def test_sdk_client_options():
+    paths = {
+        "/items": {
+            "get": {
+                "operationId": "list_items",
+                "responses": {
+                    "200": {
+                        "description": "",
+                        **json_content({"$ref": "#/components/schemas/Item"}),
+                    }
+                },
+            }
+        }
+    }
+    schemas = {"Item": {"type": "object", "properties": {"id": {"type": "integer"}}}}
+    spec = create_spec(paths, schemas)
+    namespace = {}
+    code = ast.unparse(generator.to_ast(spec, "my_sdk", "http://localhost/api"))
+    exec(compile(code, "my_sdk.py", "exec"), namespace)
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, json={"id": 1})
+
+    transport = httpx.MockTransport(handler)
+    timeout = httpx.Timeout(10, connect=1)
+    sdk = namespace["MySdk"](timeout=timeout, http2=False, transport=transport)
+    assert sdk.client.timeout == timeout
+    sdk.warm_up(connections=3)
+    assert [request.method for request in requests] == ["HEAD"] * 3
+    assert sdk.list_items() == {"id": 1}
+    assert str(requests[-1].url) == "http://localhost/api/items"
+    assert requests[-1].headers["user-agent"] == "my_sdk"
+
+    sdk.warm_up(connections=0)
+    assert len(requests) == 4
+
+    # a client of the caller is used as it is, with its own base url
+    client = httpx.Client(
+        base_url="http://other/v2", transport=transport, headers={"x-tenant": "a"}
+    )
+    sdk = namespace["MySdk"](client=client)
+    assert sdk.client is client
+    sdk.list_items()
+    assert str(requests[-1].url) == "http://other/v2/items"
+    assert requests[-1].headers["x-tenant"] == "a"
+    client = httpx.Client(transport=transport)
+    namespace["MySdk"](client=client)
+    assert client.base_url == ""
+
+
+def test_operations_dont_change_the_client():
+    paths = {
+        "/health": {
+            "get": {
+                "operationId": "health",
+                "responses": {
+                    "200": {
+                        "description": "",
+                        "content": {"text/plain": {"schema": {"type": "string"}}},
+                    }
+                },
+            }
+        },
+        "/items": {
+            "get": {
+                "operationId": "list_items",
+                "responses": {
+                    "200": {
+                        "description": "",
+                        **json_content({"$ref": "#/components/schemas/Item"}),
+                    }
+                },
+            }
+        },
+    }
+    schemas = {"Item": {"type": "object", "properties": {"id": {"type": "integer"}}}}
+    spec = create_spec(paths, schemas)
+    code = ast.unparse(generator.to_ast(spec, "my_sdk", "http://localhost"))
+    assert "self.client.headers[" not in code.split("def health")[1]
+    namespace = {}
+    exec(compile(code, "my_sdk.py", "exec"), namespace)
+
+    def handler(request):
+        if request.url.path == "/health":
+            assert request.headers["accept"] == "text/plain"
+            return httpx.Response(200, text="ok")
+        assert request.headers["accept"] == "application/json"
+        return httpx.Response(200, json={"id": 1})
+
+    sdk = namespace["MySdk"](transport=httpx.MockTransport(handler))
+    client_headers = dict(sdk.client.headers)
+    with ThreadPoolExecutor(8) as executor:
+        results = list(
+            executor.map(
+                lambda i: sdk.health() if i % 2 else sdk.list_items(), range(200)
+            )
+        )
+    assert results == ["ok" if i % 2 else {"id": 1} for i in range(200)]
+    assert dict(sdk.client.headers) == client_headers
+
+    # authorization is kept by each sdk, not by the client they share
+    authorizations = []
+    client = httpx.Client(
+        base_url="http://localhost",
+        transport=httpx.MockTransport(
+            lambda request: authorizations.append(request.headers.get("authorization"))
+            or handler(request)
+        ),
+    )
+    first, second = namespace["MySdk"](client=client), namespace["MySdk"](client=client)
+    first.auth("Bearer", "a")
+    second.auth("Bearer", "b")
+    first.list_items(), second.health(), first.health()
+    assert authorizations == ["Bearer a", "Bearer b", "Bearer a"]
+    assert "authorization" not in client.headers
+    first.deauth()
+    first.list_items(headers={"x-request": "1"})
+    assert authorizations[-1] is None
+    assert namespace["MySdk"]._json_headers == {"accept": "application/json"}
+
+
+def test_responses_are_decoded_into_models():
+    paths = {
+        "/items": {
+            "get": {
+                "operationId": "list_items",
+                "responses": {
+                    "200": {
+                        "description": "",
+                        **json_content(
+                            {
+                                "type": "array",
+                                "items": {"$ref": "#/components/schemas/Item"},
+                            }
+                        ),
+                    }
+                },
+            }
+        },
+        "/items/{id}": {
+            "get": {
+                "operationId": "get_item",
+                "parameters": [
+                    {
+                        "name": "id",
+                        "in": "path",
+                        "required": True,
+                        "schema": {"type": "integer"},
+                    }
+                ],
+                "responses": {
+                    "200": {
+                        "description": "",
+                        **json_content({"$ref": "#/components/schemas/Item"}),
+                    },
+                    "404": {
+                        "description": "",
+                        **json_content(
+                            {
+                                "type": "object",
+                                "properties": {"detail": {"type": "string"}},
+                            }
+                        ),
+                    },
+                },
+            }
+        },
+    }
+    schemas = {
+        "Item": {
+            "type": "object",
+            "properties": {
+                "id": {"type": "integer"},
+                "owner": {"$ref": "#/components/schemas/Owner"},
+                "parts": {
+                    "type": "array",
+                    "items": {"$ref": "#/components/schemas/Owner"},
+                },
+            },
+            "required": ["id"],
+        },
+        "Owner": {"type": "object", "properties": {"name": {"type": "string"}}},
+    }
+    spec = create_spec(paths, schemas)
+    item = {"id": 1, "owner": {"name": "a"}, "parts": [{"name": "b"}], "extra": 1}
+
+    def handler(request):
+        if request.url.path == "/items/2":
+            return httpx.Response(404, json={"detail": "not found"})
+        if request.url.path == "/items/3":
+            return httpx.Response(500, json={"error": "unexpected"})
+        if request.url.path == "/items":
+            return httpx.Response(200, json=[item, item])
+        return httpx.Response(200, json=item)
+
+    for models in ("dict", "slots"):
+        code = ast.unparse(
+            generator.to_ast(spec, "my_sdk", "http://localhost", models=models)
+        )
+        namespace = {}
+        exec(compile(code, "my_sdk.py", "exec"), namespace)
+        decoded = []
+
+        def json_loads(content: bytes):
+            decoded.append(content)
+            return json.loads(content)
+
+        sdk = namespace["MySdk"](
+            transport=httpx.MockTransport(handler), json_loads=json_loads
+        )
+        result = sdk.get_item(1)
+        assert isinstance(result, namespace["MySdkItem"])
+        assert isinstance(result.owner, namespace["MySdkOwner"])
+        assert result.owner.name == "a" and result.parts[0].name == "b"
+        assert [type(item) for item in sdk.list_items()] == [namespace["MySdkItem"]] * 2
+        not_found = sdk.get_item(2)
+        assert type(not_found).__name__ == "MySdkGetItemResponse404"
+        assert not_found.detail == "not found"
+        # other status codes are returned as they are decoded
+        assert sdk.get_item(3) == {"error": "unexpected"}
+        assert len(decoded) == 4
+        if models == "dict":
+            assert result == {k: v for k, v in item.items() if k != "extra"}
+        else:
+            assert result.to_dict() == {k: v for k, v in item.items() if k != "extra"}
+
+
+def test_nullable_models_are_decoded():
+    paths = {
+        "/items/{id}": {
+            "get": {
+                "operationId": "get_item",
+                "parameters": [
+                    {
+                        "name": "id",
+                        "in": "path",
+                        "required": True,
+                        "schema": {"type": "integer"},
+                    }
+                ],
+                "responses": {
+                    "200": {
+                        "description": "",
+                        **json_content(
+                            {
+                                "anyOf": [
+                                    {"$ref": "#/components/schemas/Item"},
+                                    {"type": "null"},
+                                ]
+                            }
+                        ),
+                    }
+                },
+            }
+        },
+    }
+    schemas = {
+        "Item": {
+            "type": "object",
+            "properties": {
+                "owner": {
+                    "anyOf": [
+                        {"$ref": "#/components/schemas/Owner"},
+                        {"type": "null"},
+                    ]
+                },
+                "contact": {
+                    "anyOf": [
+                        {"$ref": "#/components/schemas/Owner"},
+                        {"type": "string"},
+                    ]
+                },
+            },
+        },
+        "Owner": {"type": "object", "properties": {"name": {"type": "string"}}},
+    }
+    spec = create_spec(paths, schemas)
+    items = {
+        "/items/1": {"owner": {"name": "a"}, "contact": {"name": "b"}},
+        "/items/2": {"owner": None, "contact": "c"},
+        "/items/3": None,
+    }
+    transport = httpx.MockTransport(
+        lambda request: httpx.Response(
+            200, content=json.dumps(items[request.url.path]).encode()
+        )
+    )
+
+    for models in ("dict", "slots"):
+        code = ast.unparse(
+            generator.to_ast(spec, "my_sdk", "http://localhost", models=models)
+        )
+        namespace = {}
+        exec(compile(code, "my_sdk.py", "exec"), namespace)
+        sdk = namespace["MySdk"](transport=transport)
+        result = sdk.get_item(1)
+        assert isinstance(result, namespace["MySdkItem"])
+        assert isinstance(result.owner, namespace["MySdkOwner"])
+        assert isinstance(result.contact, namespace["MySdkOwner"])
+        assert result.owner.name == "a" and result.contact.name == "b"
+        result = sdk.get_item(2)
+        assert result.owner is None and result.contact == "c"
+        assert sdk.get_item(3) is None
+
+
+def test_inline_objects_of_responses_are_decoded():
+    pair = {"type": "object", "properties": {"key": {"type": "string"}}}
+    paths = {
+        "/ref_pairs": {
+            "get": {
+                "operationId": "list_ref_pairs",
+                "responses": {
+                    "200": {
+                        "description": "",
+                        **json_content(
+                            {
+                                "type": "array",
+                                # a pointer into a schema that isn't a class
+                                "items": {"$ref": "#/components/schemas/Pairs/items"},
+                            }
+                        ),
+                    }
+                },
+            }
+        },
+        "/pairs": {
+            "get": {
+                "operationId": "list_pairs",
+                "responses": {
+                    "200": {
+                        "description": "",
+                        **json_content({"type": "array", "items": pair}),
+                    }
+                },
+            }
+        },
+        "/either": {
+            "get": {
+                "operationId": "get_either",
+                "responses": {
+                    "200": {
+                        "description": "",
+                        **json_content(
+                            {
+                                "anyOf": [
+                                    {
+                                        "type": "object",
+                                        "properties": {"id": {"type": "integer"}},
+                                    },
+                                    {"type": "null"},
+                                ]
+                            }
+                        ),
+                    }
+                },
+            }
+        },
+    }
+    spec = create_spec(paths, {"Pairs": {"type": "array", "items": pair}})
+    responses = {"/pairs": [{"key": "a"}, {"key": "b"}], "/either": {"id": 1}}
+    responses["/ref_pairs"] = responses["/pairs"]
+    transport = httpx.MockTransport(
+        lambda request: httpx.Response(200, json=responses[request.url.path])
+    )
+
+    for models in ("dict", "slots"):
+        code = ast.unparse(
+            generator.to_ast(spec, "my_sdk", "http://localhost", models=models)
+        )
+        namespace = {}
+        exec(compile(code, "my_sdk.py", "exec"), namespace)
+        sdk = namespace["MySdk"](transport=transport)
+        pair_class = namespace["MySdkListPairsResponse200"]
+        pairs = sdk.list_pairs()
+        assert [type(pair) for pair in pairs] == [pair_class] * 2
+        assert [pair.key for pair in pairs] == ["a", "b"]
+        assert [pair.key for pair in sdk.iter_list_pairs()] == ["a", "b"]
+        hints = typing.get_type_hints(namespace["MySdk"].iter_list_pairs)
+        assert hints["return"] == typing.Iterator[pair_class]
+        ref_pair_class = namespace["MySdkListRefPairsResponse200"]
+        assert [type(pair) for pair in sdk.iter_list_ref_pairs()] == [
+            ref_pair_class
+        ] * 2
+        assert sdk.list_ref_pairs()[1].key == "b"
+        either = sdk.get_either()
+        assert isinstance(either, namespace["MySdkGetEitherResponse200"])
+        assert either.id == 1
+
+
+def test_request_bodies_are_encoded_by_the_sdk():
+    paths = {
+        "/items": {
+            "post": {
+                "operationId": "create_item",
+                "requestBody": {
+                    "required": True,
+                    **json_content({"$ref": "#/components/schemas/Item"}),
+                },
+                "responses": {
+                    "200": {
+                        "description": "",
+                        **json_content({"$ref": "#/components/schemas/Item"}),
+                    }
+                },
+            }
+        },
+    }
+    schemas = {
+        "Item": {
+            "type": "object",
+            "properties": {
+                "id": {"type": "integer"},
+                "owner": {"$ref": "#/components/schemas/Owner"},
+            },
+            "required": ["id"],
+        },
+        "Owner": {"type": "object", "properties": {"name": {"type": "string"}}},
+    }
+    spec = create_spec(paths, schemas)
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        return httpx.Response(200, content=request.content)
+
+    for models in ("dict", "slots"):
+        code = ast.unparse(
+            generator.to_ast(spec, "my_sdk", "http://localhost", models=models)
+        )
+        namespace = {}
+        exec(compile(code, "my_sdk.py", "exec"), namespace)
+        encoded = []
+
+        def json_dumps(value) -> bytes:
+            encoded.append(value)
+            return json.dumps(value, separators=(",", ":")).encode()
+
+        sdk = namespace["MySdk"](
+            transport=httpx.MockTransport(handler), json_dumps=json_dumps
+        )
+        item = namespace["MySdkItem"](id=1, owner=namespace["MySdkOwner"](name="a"))
+        result = sdk.create_item(item)
+        assert requests[-1].content == b'{"id":1,"owner":{"name":"a"}}'
+        assert requests[-1].headers["content-type"] == "application/json"
+        assert result.id == 1 and result.owner.name == "a"
+        # dict models are sent as they are, without converting them first
+        assert (encoded[0] is item) == (models == "dict")
+        # the default encoder is orjson if it's installed, the json module otherwise
+        sdk = namespace["MySdk"](transport=httpx.MockTransport(handler))
+        assert sdk.create_item(item).owner.name == "a"
+        assert json.loads(requests[-1].content) == {"id": 1, "owner": {"name": "a"}}
+
+
+def test_array_responses_are_streamed():
+    paths = {
+        "/items": {
+            "get": {
+                "operationId": "list_items",
+                "responses": {
+                    "200": {
+                        "description": "",
+                        **json_content(
+                            {
+                                "type": "array",
+                                "items": {"$ref": "#/components/schemas/Item"},
+                            }
+                        ),
+                    }
+                },
+            }
+        },
+        "/numbers": {
+            "get": {
+                "operationId": "list_numbers",
+                "responses": {
+                    "200": {
+                        "description": "",
+                        **json_content({"type": "array", "items": {"type": "number"}}),
+                    }
+                },
+            }
+        },
+        "/items/{id}": {
+            "get": {
+                "operationId": "get_item",
+                "parameters": [
+                    {
+                        "name": "id",
+                        "in": "path",
+                        "required": True,
+                        "schema": {"type": "integer"},
+                    }
+                ],
+                "responses": {
+                    "200": {
+                        "description": "",
+                        **json_content({"$ref": "#/components/schemas/Item"}),
+                    }
+                },
+            }
+        },
+    }
+    schemas = {
+        "Item": {
+            "type": "object",
+            "properties": {
+                "id": {"type": "integer"},
+                "name": {"type": "string"},
+                "tags": {"type": "array", "items": {"type": "string"}},
+            },
+        }
+    }
+    spec = create_spec(paths, schemas)
+    items = [{"id": i, "name": f"[item, {i}]", "tags": ["a", "]"]} for i in range(100)]
+    body = json.dumps(items, indent=1).encode()
+    numbers = b" [ 1, 22.5 ,-3e2,4444 ] "
+    sent_chunks = []
+
+    def chunks(content: bytes, size: int):
+        for i in range(0, len(content), size):
+            sent_chunks.append(i)
+            yield content[i : i + size]
+
+    def handler(request):
+        if request.url.path == "/numbers":
+            return httpx.Response(200, content=chunks(numbers, 1))
+        if request.url.path == "/items":
+            return httpx.Response(200, content=chunks(body, 7))
+        return httpx.Response(404, json={"detail": "not found"})
+
+    code = ast.unparse(generator.to_ast(spec, "my_sdk", "http://localhost"))
+    assert "def iter_list_items(" in code and "def iter_list_numbers(" in code
+    assert "def iter_get_item(" not in code
+    namespace = {}
+    exec(compile(code, "my_sdk.py", "exec"), namespace)
+    sdk = namespace["MySdk"](transport=httpx.MockTransport(handler))
+
+    streamed = sdk.iter_list_items()
+    first = next(streamed)
+    assert isinstance(first, namespace["MySdkItem"]) and first.name == "[item, 0]"
+    # the first item is decoded before the rest of the response is read
+    assert len(sent_chunks) < len(body) // 7
+    assert [first, *streamed] == items
+    assert list(sdk.iter_list_numbers()) == [1, 22.5, -300.0, 4444]
+    hints = typing.get_type_hints(namespace["MySdk"].iter_list_items)
+    assert hints["return"] == typing.Iterator[namespace["MySdkItem"]]
+    assert typing.get_type_hints(namespace["MySdk"].iter_list_numbers)
+    stream = namespace["_JSONArrayStream"]()
+    assert stream.feed("[ ]") == [] and stream.close() == []
+
+    stream = namespace["_JSONArrayStream"]()
+    assert stream.feed("[1, 2") == [1] and stream.feed("3]") == [23]
+    with pytest.raises(ValueError):
+        namespace["_JSONArrayStream"]().feed('{"id": 1}')
+    with pytest.raises(ValueError):
+        stream = namespace["_JSONArrayStream"]()
+        stream.feed('[{"id": 1}, {"id"')
+        stream.close()
+
+    async_code = ast.unparse(
+        generator.to_ast(spec, "my_sdk", "http://localhost", asynchronous=True)
+    )
+    async_namespace = {}
+    exec(compile(async_code, "my_sdk.py", "exec"), async_namespace)
+
+    async def async_handler(request):
+        async def async_chunks():
+            for chunk in chunks(body, 64):
+                yield chunk
+
+        if request.url.path == "/items":
+            return httpx.Response(200, content=async_chunks())
+        return httpx.Response(500, json={"error": "unexpected"})
+
+    async def main():
+        transport = httpx.MockTransport(async_handler)
+        async with async_namespace["MySdk"](transport=transport) as sdk:
+            streamed = [item async for item in sdk.iter_list_items()]
+            with pytest.raises(httpx.HTTPStatusError):
+                async for _item in sdk.iter_list_numbers():
+                    pass
+        return streamed
+
+    streamed = asyncio.run(main())
+    assert all(isinstance(item, async_namespace["MySdkItem"]) for item in streamed)
+    assert streamed == items
+    hints = typing.get_type_hints(async_namespace["MySdk"].iter_list_items)
+    assert hints["return"] == typing.AsyncIterator[async_namespace["MySdkItem"]]
+
+    modules = generator.to_package_ast(spec, "my_sdk", "http://localhost")
+    for module in modules.values():
+        source = ast.unparse(module)
+        if "def iter_" in source:
+            assert "from typing import Any, Iterator" in source
+
+    # the streaming helpers are left out of sdks without iter_ methods
+    spec = create_spec({"/items/{id}": paths["/items/{id}"]}, schemas)
+    code = ast.unparse(generator.to_ast(spec, "my_sdk", "http://localhost"))
+    assert "_JSONArrayStream" not in code and "_iter_json_array" not in code
+    assert "import json\n" not in code and "from typing" not in code
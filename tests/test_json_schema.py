@@ -1,5 +1,7 @@
 import pytest
 import ast
+import tracemalloc
+import typing
 import black
 from sdkops import json_schema
 
@@ -477,3 +479,291 @@ class Me(dict):
         self.point: MePoint | None | int = point
 """
     )
+
+
+def test_ref_resolver():
+    schema1 = {
+        "type": "object",
+        "properties": {
+            "customer": {
+                "type": "object",
+                "properties": {
+                    "billing_address": {
+                        "type": "object",
+                        "properties": {"city": {"type": "string"}},
+                    },
+                },
+            },
+        },
+        "components": {
+            "schemas": {
+                "Order/Item": {"type": "object", "properties": {}},
+            }
+        },
+    }
+    resolver1 = json_schema.RefResolver(schema1)
+    ref1 = "#/properties/customer/properties/billing_address"
+    node1, _trace = resolver1.resolve(ref1)
+    assert node1 is schema1["properties"]["customer"]["properties"]["billing_address"]
+    assert resolver1.generate_name(ref1) == "customer_billing_address"
+    ref2 = "#/components/schemas/Order~1Item"
+    assert resolver1.resolve(ref2)[0] is schema1["components"]["schemas"]["Order/Item"]
+    assert resolver1.generate_name(ref2) == "Order/Item"
+    assert resolver1.resolve("#/components/schemas/Missing") == (
+        None,
+        ["root", "components", "schemas", "invalid ref path: Missing (key not found)"],
+    )
+
+    # names and nodes are scoped to the document the resolver is built for
+    schema2 = {
+        "type": "object",
+        "properties": {
+            "customer": {"type": "object", "properties": {"id": {"type": "integer"}}}
+        },
+    }
+    resolver2 = json_schema.RefResolver(schema2)
+    node2, _trace = resolver2.resolve("#/properties/customer")
+    assert node2 is schema2["properties"]["customer"]
+    assert resolver1.resolve("#/properties/customer")[0] is not node2
+    assert resolver2.resolve(ref1)[0] is None
+
+
+def test_recursive_schemas():
+    schema1 = {
+        "type": "object",
+        "properties": {
+            "root": {"$ref": "#/components/schemas/Node"},
+            "other": {"$ref": "#/components/schemas/Node"},
+        },
+        "required": ["root"],
+        "components": {
+            "schemas": {
+                "Node": {
+                    "type": "object",
+                    "properties": {
+                        "name": {"type": "string"},
+                        "children": {
+                            "type": "array",
+                            "items": {"$ref": "#/components/schemas/Node"},
+                        },
+                    },
+                    "required": ["name"],
+                }
+            }
+        },
+    }
+    ast1 = json_schema.to_ast("tree", schema1)
+    assert (
+        black.format_str(ast.unparse(ast1), mode=black.FileMode(line_length=160))
+        == """\
+class TreeNode(dict):
+
+    def __init__(self, name: str, children: "list[TreeNode]" = []):
+        super().__init__(name=name, children=children)
+        self.name: str = name
+        self.children: "list[TreeNode]" = children
+
+
+class Tree(dict):
+
+    def __init__(self, root: TreeNode, other: TreeNode = None):
+        super().__init__(root=root, other=other)
+        self.root: TreeNode = root
+        self.other: TreeNode = other
+"""
+    )
+
+    schema2 = {
+        "type": "object",
+        "properties": {
+            "employee": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "manager": {"$ref": "#/properties/employee"},
+                },
+                "required": ["name"],
+            },
+        },
+    }
+    ast2 = json_schema.to_ast("org", schema2)
+    assert (
+        black.format_str(ast.unparse(ast2), mode=black.FileMode(line_length=160))
+        == """\
+class OrgEmployee(dict):
+
+    def __init__(self, name: str, manager: "OrgEmployee" = None):
+        super().__init__(name=name, manager=manager)
+        self.name: str = name
+        self.manager: "OrgEmployee" = manager
+
+
+class Org(dict):
+
+    def __init__(self, employee: OrgEmployee = None):
+        super().__init__(employee=employee)
+        self.employee: OrgEmployee = employee
+"""
+    )
+
+
+def test_class_registry():
+    schema1 = {
+        "type": "object",
+        "properties": {
+            "billing_address": {
+                "type": "object",
+                "properties": {"city": {"type": "string"}},
+            },
+            "shipping_address": {
+                "type": "object",
+                "properties": {"city": {"type": "string"}},
+            },
+            "location": {
+                "type": "object",
+                "properties": {"city": {"type": "integer"}},
+            },
+        },
+    }
+    class_registry = json_schema.ClassRegistry()
+    ast1 = json_schema.to_ast("customer", schema1, class_registry=class_registry)
+    assert (
+        black.format_str(ast.unparse(ast1), mode=black.FileMode(line_length=160))
+        == """\
+class CustomerBillingAddress(dict):
+
+    def __init__(self, city: str = ""):
+        super().__init__(city=city)
+        self.city: str = city
+
+
+CustomerShippingAddress = CustomerBillingAddress
+
+
+class CustomerLocation(dict):
+
+    def __init__(self, city: int = 0):
+        super().__init__(city=city)
+        self.city: int = city
+
+
+class Customer(dict):
+
+    def __init__(self, billing_address: CustomerBillingAddress = None, shipping_address: CustomerBillingAddress = None, location: CustomerLocation = None):
+        super().__init__(billing_address=billing_address, shipping_address=shipping_address, location=location)
+        self.billing_address: CustomerBillingAddress = billing_address
+        self.shipping_address: CustomerBillingAddress = shipping_address
+        self.location: CustomerLocation = location
+"""
+    )
+    assert class_registry.aliases == {
+        "CustomerShippingAddress": "CustomerBillingAddress"
+    }
+
+
+def test_class_names_are_unique():
+    # the nested classes of anyOf members are named after the same property chain
+    schema = {
+        "type": "object",
+        "properties": {
+            "payment": {
+                "anyOf": [
+                    {
+                        "type": "object",
+                        "properties": {
+                            "detail": {
+                                "type": "object",
+                                "properties": {"iban": {"type": "string"}},
+                            }
+                        },
+                    },
+                    {
+                        "type": "object",
+                        "properties": {
+                            "detail": {
+                                "type": "object",
+                                "properties": {"card": {"type": "integer"}},
+                            }
+                        },
+                    },
+                ]
+            }
+        },
+    }
+    class_registry = json_schema.ClassRegistry()
+    root = ast.Module(
+        body=json_schema.to_ast("order", schema, class_registry=class_registry),
+        type_ignores=[],
+    )
+    class_defs = {node.name: node for node in root.body}
+    assert list(class_defs) == [
+        "OrderPaymentDetail",
+        "OrderPayment",
+        "OrderPaymentDetail2",
+        "OrderPayment2",
+        "Order",
+    ]
+    assert "iban: str" in ast.unparse(class_defs["OrderPaymentDetail"])
+    assert "card: int" in ast.unparse(class_defs["OrderPaymentDetail2"])
+    assert "detail: OrderPaymentDetail2" in ast.unparse(class_defs["OrderPayment2"])
+
+    # classes of other schemas can't take a name with another structure
+    with pytest.raises(ValueError):
+        class_registry.register(class_defs["OrderPaymentDetail2"], "another key")
+
+
+def test_slots_classes():
+    schema = {
+        "type": "object",
+        "properties": {
+            "name": {"type": "string"},
+            "tags": {"type": "array", "items": {"type": "string"}},
+            "owner": {"type": "object", "properties": {"id": {"type": "integer"}}},
+            "parts": {
+                "type": "array",
+                "items": {"type": "object", "properties": {"id": {"type": "integer"}}},
+            },
+        },
+        "required": ["name"],
+    }
+    namespace = {}
+    for models in ("dict", "slots"):
+        class_defs = json_schema.to_ast("item", schema, models=models)
+        code = ast.unparse(ast.Module(body=class_defs, type_ignores=[]))
+        namespace[models] = {}
+        exec(compile(code, "models.py", "exec"), namespace[models])
+    Item = namespace["slots"]["Item"]
+    ItemOwner = namespace["slots"]["ItemOwner"]
+    ItemParts = namespace["slots"]["ItemParts"]
+
+    item = Item("a", owner=ItemOwner(1), parts=[ItemParts(2)])
+    assert not hasattr(item, "__dict__")
+    assert item.to_dict() == {
+        "name": "a",
+        "tags": [],
+        "owner": {"id": 1},
+        "parts": [{"id": 2}],
+    }
+    # list defaults aren't shared between instances
+    assert Item("b").tags is not Item("c").tags
+    assert Item("b").to_dict()["owner"] is None
+    # fields that default to None are annotated as optional
+    hints = typing.get_type_hints(Item.__init__)
+    assert hints["tags"] == list[str] | None
+    assert hints["parts"] == list[ItemParts] | None
+    annotation = ast.parse("list[ItemParts] | None", mode="eval").body
+    to_dict = json_schema.ast_field_to_dict("parts", annotation)
+    assert eval(to_dict, {"self": item}) == [{"id": 2}]
+    item.parts = None
+    assert eval(to_dict, {"self": item}) is None
+
+    def traced_size(models: str) -> int:
+        cls = namespace[models]["Item"]
+        tracemalloc.start()
+        items = [cls(f"item {i}", tags=[]) for i in range(1000)]
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        assert len(items) == 1000
+        return size
+
+    assert traced_size("slots") * 2 < traced_size("dict")
@@ -0,0 +1,173 @@
+import json
+import os
+import pytest
+from sdkops import emitter, generator
+from sdkops.cache import input_hashes
+from sdkops.json_stream import JSONStream
+from sdkops.openapi import load, parse
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), "schema_sample1.json")
+
+
+def generate_source(spec) -> str:
+    return emitter.format_module(generator.to_ast(spec, "sample", "http://localhost"))
+
+
+def operation_hashes(spec) -> dict:
+    refs = list(generator.collect_component_class_names(spec.schema_dict, "sample"))
+    return input_hashes(spec, {}, refs)
+
+
+def test_load_matches_parse():
+    with open(SAMPLE_PATH) as f:
+        success, parsed = parse(json.load(f))
+    assert success
+    # a small chunk size makes values span many reads
+    for chunk_size in (1 << 20, 64):
+        success, loaded = load(SAMPLE_PATH, chunk_size)
+        assert success
+        assert "paths" not in loaded.schema_dict
+        assert loaded.version_openapi == parsed.version_openapi
+        assert [p.pattern for p in loaded.paths] == [p.pattern for p in parsed.paths]
+        assert generate_source(loaded) == generate_source(parsed)
+        assert operation_hashes(loaded) == operation_hashes(parsed)
+
+
+def test_load_keeps_paths_with_refs(tmp_path):
+    item = {"type": "object", "properties": {"id": {"type": "string"}}}
+    schema_dict = {
+        "openapi": "3.1.0",
+        "info": {"title": "refs", "version": "1"},
+        "paths": {
+            "/items": {
+                "get": {
+                    "operationId": "list_items",
+                    "responses": {
+                        "200": {
+                            "description": "",
+                            "content": {"application/json": {"schema": item}},
+                        }
+                    },
+                }
+            },
+            "/items/{id}": {
+                "get": {
+                    "operationId": "get_item",
+                    "responses": {
+                        "200": {
+                            "$ref": "#/paths/~1items/get/responses/200",
+                            "description": "",
+                        }
+                    },
+                }
+            },
+        },
+    }
+    path = tmp_path / "schema.json"
+    path.write_text(json.dumps(schema_dict))
+    success, spec = load(str(path))
+    assert success
+    assert list(spec.schema_dict["paths"]) == ["/items"]
+    resolved, _trace = spec.resolver.resolve("#/paths/~1items/get/responses/200")
+    assert resolved["content"]["application/json"]["schema"] == item
+
+
+def test_json_stream_reads_values_across_chunks(tmp_path):
+    path = tmp_path / "values.json"
+    path.write_text(json.dumps({"a": [1, 2.5, "x" * 40], "b": {"c": None}, "d": 12345}))
+    with open(path) as f:
+        stream = JSONStream(f, 4)
+        values = {}
+        for key in stream.iter_object():
+            if key == "b":
+                values[key] = {k: stream.read_value() for k in stream.iter_object()}
+            else:
+                values[key] = stream.read_value()
+    assert values == {"a": [1, 2.5, "x" * 40], "b": {"c": None}, "d": 12345}
+
+
+def test_load_reuses_unchanged_path_items(tmp_path):
+    with open(SAMPLE_PATH) as f:
+        schema_dict = json.load(f)
+    path = tmp_path / "schema.json"
+    path.write_text(json.dumps(schema_dict))
+    path_items = {}
+    _success, first = load(str(path), 64, path_items)
+    assert len(path_items) == len(first.paths)
+
+    pattern = next(iter(schema_dict["paths"]))
+    for operation_dict in schema_dict["paths"][pattern].values():
+        operation_dict["operationId"] = "renamed"
+    path.write_text(json.dumps(schema_dict))
+    _success, second = load(str(path), 64, path_items)
+    assert len(path_items) == len(second.paths)
+    assert second.paths[0] is not first.paths[0]
+    assert second.paths[0].operations[0].operation_id == "renamed"
+    assert all(a is b for a, b in zip(first.paths[1:], second.paths[1:]))
+
+
+def test_spec_model_is_compact():
+    _success, spec = load(SAMPLE_PATH)
+    operations = [op for path_item in spec.paths for op in path_item.operations]
+    contents = [
+        content
+        for op in operations
+        for response in op.responses
+        for content in response.contents
+    ]
+    assert not hasattr(operations[0], "__dict__")
+    assert not hasattr(contents[0], "__dict__")
+    # media types and parameter kinds of every operation are the same objects
+    media_types = {id(content.media_type) for content in contents}
+    assert len(media_types) == len({content.media_type for content in contents})
+
+    content = contents[0]
+    content_id = content.get_id()
+    assert content.extensions == {"x-id": content_id}
+    content.extensions["x-internal"] = True
+    assert content.set_id("renamed").get_id() == "renamed"
+    assert content.extensions == {"x-id": "renamed", "x-internal": True}
+
+
+def test_spec_index_and_subset():
+    _success, spec = load(SAMPLE_PATH)
+    assert spec.find_operation("project_get")[0].pattern == "/project/{name}"
+    assert spec.find_operation("missing") is None
+    assert spec.find_operation_ids(tags=["otp"]) == {"otp_email", "otp_email_verify"}
+    # prefixes match whole path segments
+    assert spec.find_operation_ids(path_prefixes=["/otp/email/"]) == {
+        "otp_email",
+        "otp_email_verify",
+    }
+    assert spec.find_operation_ids(path_prefixes=["/otp/em"]) == set()
+    assert spec.find_operation_ids(["home"], path_prefixes=["/user"]) == {
+        "home",
+        "user_status",
+    }
+    project = "#/components/schemas/Project"
+    assert spec.ref_closure(["#/components/schemas/ProjectListResponseBody"]) == {
+        "#/components/schemas/ProjectListResponseBody",
+        project,
+    }
+    assert spec.dependent_operation_ids(project) == {"project_list", "project_get"}
+
+    subset = spec.subset(spec.find_operation_ids(tags=["project"]))
+    assert [p.pattern for p in subset.paths] == ["/project/list", "/project/{name}"]
+    assert sorted(subset.schema_dict["components"]["schemas"]) == [
+        "HTTPValidationError",
+        "Project",
+        "ProjectGetResponseBody",
+        "ProjectListResponseBody",
+    ]
+    assert subset.resolver is spec.resolver
+    assert len(spec.schema_dict["components"]["schemas"]) == 10
+    source = generate_source(subset)
+    assert "def project_list(" in source and "def otp_email(" not in source
+    assert "class SampleOtpEmailRequestBody" not in source
+
+
+def test_load_invalid_json(tmp_path):
+    path = tmp_path / "schema.json"
+    path.write_text('{"openapi": "3.1.0", "paths": {"/a": {')
+    with pytest.raises(ValueError):
+        load(str(path))
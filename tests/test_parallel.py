@@ -0,0 +1,160 @@
+import json
+import os
+from click.testing import CliRunner
+from sdkops import emitter, generator
+from sdkops.cli import generate
+from sdkops.json_schema import ClassRegistry
+from sdkops.openapi import parse
+from sdkops.parallel import WorkerPool
+from benchmarks.synthetic import Scenario, synthetic_spec
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), "schema_sample1.json")
+
+
+def object_schema(properties: dict) -> dict:
+    return {"type": "object", "properties": properties, "required": list(properties)}
+
+
+def synthetic_schema(count: int) -> dict:
+    # identical schemas in different components and operations, so that classes
+    # generated by different workers merge, and classes referring to them are renamed
+    address = object_schema({"street": {"type": "string"}, "city": {"type": "string"}})
+    schemas = {
+        "Address": address,
+        "Location": address,
+        "Node": object_schema(
+            {
+                "name": {"type": "string"},
+                "children": {
+                    "type": "array",
+                    "items": {"$ref": "#/components/schemas/Node"},
+                },
+            }
+        ),
+    }
+    paths = {}
+    for i in range(count):
+        schemas[f"Item{i}"] = object_schema(
+            {
+                "id": {"type": "string"},
+                "location": {"$ref": "#/components/schemas/Location"},
+                "owner": object_schema({"name": {"type": "string"}}),
+                "previous": {"$ref": f"#/components/schemas/Item{max(i - 1, 0)}"},
+            }
+        )
+        response = object_schema(
+            {
+                "address": address,
+                "status": object_schema({"code": {"type": "integer"}}),
+                "tree": {"$ref": "#/components/schemas/Node"},
+            }
+        )
+        paths[f"/items{i}/{{item_id}}"] = {
+            "get": {
+                "operationId": f"get_item_{i}",
+                "tags": [f"group{i % 3}"],
+                "parameters": [
+                    {
+                        "name": "item_id",
+                        "in": "path",
+                        "required": True,
+                        "schema": {"type": "string"},
+                    }
+                ],
+                "responses": {
+                    "200": {
+                        "description": "",
+                        "content": {
+                            "application/json": {
+                                "schema": {"$ref": f"#/components/schemas/Item{i}"}
+                            }
+                        },
+                    }
+                },
+            },
+            "post": {
+                "operationId": f"update_item_{i}",
+                "tags": [f"group{i % 3}"],
+                "requestBody": {"content": {"application/json": {"schema": response}}},
+                "responses": {
+                    "200": {
+                        "description": "",
+                        "content": {"application/json": {"schema": response}},
+                    }
+                },
+            },
+        }
+    return {
+        "openapi": "3.1.0",
+        "info": {"title": "synthetic", "version": "1"},
+        "paths": paths,
+        "components": {"schemas": schemas},
+    }
+
+
+def load_sample() -> dict:
+    with open(SAMPLE_PATH) as f:
+        return json.load(f)
+
+
+def generate_sources(spec, package: bool, pool: WorkerPool | None) -> tuple:
+    class_registry = ClassRegistry()
+    if package:
+        modules = generator.to_package_ast(
+            spec, "sample", "http://localhost", class_registry=class_registry, pool=pool
+        )
+    else:
+        modules = {
+            "sample": generator.to_ast(
+                spec,
+                "sample",
+                "http://localhost",
+                class_registry=class_registry,
+                pool=pool,
+            )
+        }
+    sources = {name: emitter.format_module(root) for name, root in modules.items()}
+    return sources, class_registry.aliases
+
+
+def test_pool_output_matches_serial():
+    for schema_dict in (load_sample(), synthetic_schema(12)):
+        success, spec = parse(schema_dict)
+        assert success
+        with WorkerPool(spec, 3) as pool:
+            for package in (False, True):
+                serial = generate_sources(spec, package, None)
+                assert serial[1], "the schema should have merged classes"
+                assert generate_sources(spec, package, pool) == serial
+
+
+def test_pool_output_matches_serial_on_any_of():
+    # the nested classes of anyOf members share names, which get suffixes, and many
+    # of them merge into classes of other operations
+    scenario = Scenario("any_of", paths=25, components=15, any_of=6, seed=8)
+    success, spec = parse(synthetic_spec(scenario))
+    assert success
+    with WorkerPool(spec, 4) as pool:
+        serial = generate_sources(spec, False, None)
+        assert serial[1], "the schema should have merged classes"
+        assert generate_sources(spec, False, pool) == serial
+
+
+def test_generate_with_jobs(tmp_path):
+    spec_path = tmp_path / "schema.json"
+    spec_path.write_text(json.dumps(synthetic_schema(6)))
+    runner = CliRunner()
+    for models in ("dict", "slots"):
+        outputs = []
+        for jobs in ("1", "2"):
+            dest = tmp_path / f"out{jobs}_{models}"
+            dest.mkdir()
+            args = [str(spec_path), "-n", "sample", "-d", str(dest), "-u", "http://x"]
+            result = runner.invoke(
+                generate, [*args, "-p", "--jobs", jobs, "--models", models]
+            )
+            assert result.exit_code == 0, result.output
+            outputs.append(
+                {path.name: path.read_text() for path in (dest / "sample").iterdir()}
+            )
+        assert outputs[0] == outputs[1]
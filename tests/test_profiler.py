@@ -0,0 +1,53 @@
+import json
+import os
+from click.testing import CliRunner
+from sdkops.cli import generate
+from sdkops.profiler import Profiler
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), "schema_sample1.json")
+
+
+def test_nested_measurements():
+    profiler = Profiler()
+    profiler.start()
+    with profiler.measure("phase", "generate"):
+        for _ in range(2):
+            with profiler.measure("operation", "small"):
+                data = [0] * 1000
+        with profiler.measure("operation", "large"):
+            data = [0] * 100_000
+        del data
+    profiler.stop()
+
+    small = profiler.measurements[("operation", "small")]
+    large = profiler.measurements[("operation", "large")]
+    phase = profiler.measurements[("phase", "generate")]
+    assert small.calls == 2
+    assert 8000 <= small.peak_memory < large.peak_memory
+    assert large.peak_memory <= phase.peak_memory <= profiler.total.peak_memory
+    assert phase.wall_time >= small.wall_time + large.wall_time
+    assert [m.name for m in profiler.ranked("operation")][0] == "large"
+
+
+def test_generate_with_profile(tmp_path):
+    report_path = tmp_path / "profile.json"
+    args = [SAMPLE_PATH, "-n", "sample", "-d", str(tmp_path), "-u", "http://x"]
+    result = CliRunner().invoke(generate, [*args, "--profile", str(report_path)])
+    assert result.exit_code == 0, result.output
+
+    report = json.loads(report_path.read_text())
+    assert report["schema"] == SAMPLE_PATH
+    phases = [phase["name"] for phase in report["phases"]]
+    assert phases == [
+        "load schema",
+        "print spec tree",
+        "check last generation",
+        "generate ast",
+        "format and save",
+    ]
+    assert report["schemas"] and report["operations"]
+    wall_times = [operation["wall_time"] for operation in report["operations"]]
+    assert wall_times == sorted(wall_times, reverse=True)
+    assert report["total"]["wall_time"] >= sum(
+        phase["wall_time"] for phase in report["phases"]
+    )
@@ -0,0 +1,109 @@
+import gzip
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from sdkops.api import generate_sources
+from sdkops.remote import SpecCache, cache_max_age, fetch_spec
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), "schema_sample1.json")
+
+
+class SpecHandler(BaseHTTPRequestHandler):
+    # class attributes set by the server fixture
+    body = b""
+    etag = '"1"'
+    cache_control = "no-cache"
+    requests: list = []
+
+    def do_GET(self):
+        type(self).requests.append(dict(self.headers))
+        if self.path != "/openapi.json":
+            self.send_response(404)
+            self.end_headers()
+            return
+        if self.headers.get("If-None-Match") == self.etag:
+            self.send_response(304)
+            self.send_header("ETag", self.etag)
+            self.send_header("Cache-Control", self.cache_control)
+            self.end_headers()
+            return
+        body = self.body
+        self.send_response(200)
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = gzip.compress(body)
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", self.etag)
+        self.send_header("Cache-Control", self.cache_control)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    with open(SAMPLE_PATH, "rb") as f:
+        SpecHandler.body = f.read()
+    SpecHandler.etag = '"1"'
+    SpecHandler.cache_control = "no-cache"
+    SpecHandler.requests = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), SpecHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_fetch_spec_revalidates_cached_schema(server, tmp_path):
+    url = f"{server}/openapi.json"
+    cache = SpecCache(str(tmp_path))
+    expected = generate_sources(SAMPLE_PATH, "sample", "http://x")
+
+    spec, source = fetch_spec(url, cache)
+    assert source == "fetched"
+    assert "gzip" in SpecHandler.requests[-1]["Accept-Encoding"]
+    assert "If-None-Match" not in SpecHandler.requests[-1]
+    assert generate_sources(spec, "sample", "http://x") == expected
+
+    spec, source = fetch_spec(url, cache)
+    assert source == "not modified"
+    assert SpecHandler.requests[-1]["If-None-Match"] == '"1"'
+    assert generate_sources(spec, "sample", "http://x") == expected
+
+    # a fresh response isn't requested again until it's stale
+    SpecHandler.cache_control = "max-age=3600"
+    SpecHandler.etag = '"2"'
+    assert fetch_spec(url, cache)[1] == "fetched"
+    assert fetch_spec(url, cache)[1] == "cache"
+    assert len(SpecHandler.requests) == 3
+    assert fetch_spec(url)[1] == "fetched"
+
+
+def test_fetch_spec_errors(server, tmp_path):
+    cache = SpecCache(str(tmp_path))
+    with pytest.raises(Exception, match="status code 404"):
+        fetch_spec(f"{server}/missing.json", cache)
+    SpecHandler.body = b"<html></html>"
+    with pytest.raises(Exception, match="is not a json"):
+        fetch_spec(f"{server}/openapi.json", cache)
+    # a cached spec that can't be read is fetched again
+    SpecHandler.body = open(SAMPLE_PATH, "rb").read()
+    url = f"{server}/openapi.json"
+    fetch_spec(url, cache)
+    _entry_path, spec_path = cache.entry_paths(url)
+    with open(spec_path, "wb") as f:
+        f.write(b"broken")
+    assert fetch_spec(url, cache)[1] == "fetched"
+    assert "If-None-Match" not in SpecHandler.requests[-1]
+
+
+def test_cache_max_age():
+    assert cache_max_age(None) == 0
+    assert cache_max_age("public, max-age=60") == 60
+    assert cache_max_age("max-age=60, no-cache") == 0
+    assert cache_max_age("no-store") is None
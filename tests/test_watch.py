@@ -0,0 +1,75 @@
+import json
+import os
+import threading
+import time
+from sdkops.api import generate_sources
+from sdkops.watch import Watcher, WatchServer, send_request
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), "schema_sample1.json")
+
+
+def rename_first_operation(path):
+    with open(path) as f:
+        schema_dict = json.load(f)
+    operation_dict = next(iter(next(iter(schema_dict["paths"].values())).values()))
+    operation_dict["operationId"] = "renamed_operation"
+    with open(path, "w") as f:
+        json.dump(schema_dict, f)
+
+
+def test_watcher_regenerates_changed_schema(tmp_path):
+    schema_path = tmp_path / "schema.json"
+    schema_path.write_text(open(SAMPLE_PATH).read())
+    dest = tmp_path / "sdk"
+    dest.mkdir()
+    for package in (False, True):
+        watcher = Watcher(str(schema_path), "sample", str(dest), "http://x", package)
+        assert watcher.changed_files() == [str(schema_path)]
+        first = watcher.regenerate()
+        assert not first.up_to_date
+        assert watcher.regenerate().up_to_date
+        assert watcher.changed_files() == []
+
+        # a sleep makes sure the modification time changes on coarse file systems
+        time.sleep(0.01)
+        rename_first_operation(schema_path)
+        assert watcher.changed_files() == [str(schema_path)]
+        result = watcher.regenerate()
+        assert result.stale_reasons and result.written >= 1 and result.reused > 0
+        sources = generate_sources(str(schema_path), "sample", "http://x", package)
+        assert sources == {name: (dest / name).read_text() for name in sources}
+        assert "def renamed_operation(" in "".join(sources.values())
+
+        # the cache is saved when the watcher is idle, a new one picks it up
+        watcher.save()
+        assert (
+            Watcher(str(schema_path), "sample", str(dest), "http://x", package)
+            .regenerate()
+            .up_to_date
+        )
+        schema_path.write_text(open(SAMPLE_PATH).read())
+
+
+def test_watch_server_requests(tmp_path):
+    dest = tmp_path / "sdk"
+    dest.mkdir()
+    socket_path = str(tmp_path / "watch.sock")
+    watcher = Watcher(SAMPLE_PATH, "sample", str(dest), "http://x")
+    server = WatchServer(watcher, socket_path, interval=0.01)
+    thread = threading.Thread(target=server.serve)
+    thread.start()
+    try:
+        for _ in range(500):
+            if os.path.exists(socket_path) and server.running:
+                break
+            time.sleep(0.01)
+        assert send_request(socket_path, "generate")["status"] == "up to date"
+        assert send_request(socket_path, "status")["status"] == "up to date"
+        assert send_request(socket_path, "build")["status"] == "failed"
+        assert send_request(socket_path, "stop") == {"status": "stopping"}
+    finally:
+        server.running = False
+        thread.join()
+    assert not os.path.exists(socket_path)
+    assert (dest / "sample.py").is_file()
+    assert watcher.unsaved is None